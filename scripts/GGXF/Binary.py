@@ -0,0 +1,277 @@
+#!/usr/bin/python3
+#
+# Native binary format for GGXF.  This is not a GGXF exchange format - it is
+# intended as a fast loading local copy of a GGXF file.  Grid data is memory
+# mapped so that loading requires no copying of the data, and multiple processes
+# using the same file share the operating system cached copy of it.
+#
+# File layout:
+#   8 bytes    Magic string "GGXFBIN1"
+#   8 bytes    Length of the JSON header (little endian unsigned int)
+#   n bytes    JSON header, padded with spaces so that the data section starts
+#              at a multiple of BINARY_ALIGNMENT from the start of the file
+#   data       Grid data arrays, each starting at a multiple of BINARY_ALIGNMENT
+#              from the start of the file.
+#
+# The header holds the GGXF metadata, and the group and grid metadata with the
+# location, shape, and type of the grid data.  Grid data is stored in C order
+# with dimensions (ni,nj,nparam) matching the Grid data array.  If a grid has
+# missing values the mask is stored as a boolean array of the same shape.
+
+import json
+import logging
+import os.path
+import struct
+
+import numpy as np
+
+from .GGXF import *
+
+BINARY_MAGIC = b"GGXFBIN1"
+BINARY_ALIGNMENT = 64
+
+BINARY_HEADER_METADATA = "metadata"
+BINARY_HEADER_GROUPS = "groups"
+BINARY_HEADER_NAME = "name"
+BINARY_HEADER_GRIDS = "grids"
+BINARY_HEADER_DATA = "data"
+BINARY_HEADER_MASK = "mask"
+BINARY_HEADER_OFFSET = "offset"
+BINARY_HEADER_SHAPE = "shape"
+BINARY_HEADER_DTYPE = "dtype"
+
+BINARY_OPTION_GRID_DTYPE = "grid_dtype"
+BINARY_OPTION_MEMORY_MAP = "memory-map"
+
+BINARY_DTYPE_FLOAT32 = "float32"
+BINARY_DTYPE_FLOAT64 = "float64"
+BINARY_VALID_DTYPE_MAP = {
+    BINARY_DTYPE_FLOAT64: np.dtype("<f8"),
+    BINARY_DTYPE_FLOAT32: np.dtype("<f4"),
+}
+BINARY_DEFAULT_WRITE_DTYPE = BINARY_DTYPE_FLOAT64
+
+BINARY_ALL_OPTIONS = {
+    BINARY_OPTION_GRID_DTYPE,
+    BINARY_OPTION_MEMORY_MAP,
+}
+
+BINARY_READ_OPTIONS = f"""
+  "{BINARY_OPTION_MEMORY_MAP}" Memory map the grid data rather than reading it into memory (true or false, default true)
+"""
+
+BINARY_WRITE_OPTIONS = f"""
+  "{BINARY_OPTION_GRID_DTYPE}" Specifies the data type in the binary file ({", ".join(BINARY_VALID_DTYPE_MAP.keys())}, default {BINARY_DEFAULT_WRITE_DTYPE})
+"""
+
+
+def _alignedSize(size):
+    return ((size + BINARY_ALIGNMENT - 1) // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+
+def _dataStart(headerlen):
+    # Offset of the data section from the start of the file
+    return _alignedSize(len(BINARY_MAGIC) + 8 + headerlen)
+
+
+def _jsonValue(value):
+    # Convert values not handled by the json module (eg numpy arrays and scalars)
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return str(value)
+
+
+class Reader(BaseReader):
+    @staticmethod
+    def Read(ggxf_file: str, options: dict = None) -> GGXF:
+        if not os.path.exists(ggxf_file):
+            raise Error(f"GGXF file {ggxf_file} does not exist")
+        reader = Reader(options)
+        ggxf = reader.read(ggxf_file)
+        return ggxf
+
+    def __init__(self, options=None):
+        BaseReader.__init__(self, options)
+        invalid = [
+            option for option in self._options if option not in BINARY_ALL_OPTIONS
+        ]
+        if invalid:
+            raise Error(f"Invalid binary GGXF option {','.join(invalid)}")
+        self._logger = logging.getLogger("GGXF.BinaryReader")
+
+    def read(self, ggxf_file):
+        self._logger.debug(f"Loading binary GGXF file {ggxf_file}")
+        self.setSource(ggxf_file)
+        try:
+            with open(ggxf_file, "rb") as binh:
+                magic = binh.read(len(BINARY_MAGIC))
+                if magic != BINARY_MAGIC:
+                    raise Error(f"{ggxf_file} is not a binary GGXF file")
+                (headerlen,) = struct.unpack("<Q", binh.read(8))
+                header = json.loads(binh.read(headerlen).decode("utf8"))
+            datastart = _dataStart(headerlen)
+            if self.getBoolOption(BINARY_OPTION_MEMORY_MAP, True):
+                self._filedata = np.memmap(ggxf_file, dtype=np.uint8, mode="r")
+            else:
+                self._filedata = np.fromfile(ggxf_file, dtype=np.uint8)
+            self._filedata = self._filedata[datastart:]
+
+            metadata = header[BINARY_HEADER_METADATA]
+            ggxf = None
+            if self.validator().validateRootAttributes(metadata, context="GGXF"):
+                ggxf = GGXF(metadata)
+                for groupdef in header[BINARY_HEADER_GROUPS]:
+                    group = self.loadGroup(ggxf, groupdef)
+                    if group is not None:
+                        ggxf.addGroup(group)
+                ggxf.configure(errorhandler=self.error)
+            if not self._loadok:
+                ggxf = None
+            return ggxf
+
+        except Exception as ex:
+            self._logger.error(f"Failed to load GGXF file {ggxf_file}: {ex}")
+            ggxf = None
+        return ggxf
+
+    def loadGroup(self, ggxf, groupdef):
+        groupname = groupdef[BINARY_HEADER_NAME]
+        self._logger.debug(f"Loading group {groupname}")
+        metadata = groupdef[BINARY_HEADER_METADATA]
+        if not self.validator().validateGroupAttributes(
+            metadata, context=f"Group {groupname}"
+        ):
+            return
+        group = Group(ggxf, groupname, metadata)
+        group.configureParameters(self.error)
+        for griddef in groupdef[BINARY_HEADER_GRIDS]:
+            grid = self.loadGrid(group, griddef)
+            if grid is not None:
+                group.addGrid(grid)
+        return group
+
+    def loadGrid(self, group, griddef):
+        gridname = griddef[BINARY_HEADER_NAME]
+        self._logger.debug(f"Loading grid {gridname}")
+        metadata = griddef[BINARY_HEADER_METADATA]
+        if not self.validator().validateGridAttributes(
+            metadata, context=f"{group.name()} {gridname}"
+        ):
+            return
+        data = self.gridArray(griddef[BINARY_HEADER_DATA])
+        if BINARY_HEADER_MASK in griddef:
+            mask = self.gridArray(griddef[BINARY_HEADER_MASK])
+            data = np.ma.masked_array(data, mask=mask, copy=False)
+        grid = Grid(group, gridname, metadata, data)
+        for childdef in griddef[BINARY_HEADER_GRIDS]:
+            child = self.loadGrid(group, childdef)
+            if child is not None:
+                grid.addGrid(child)
+        return grid
+
+    def gridArray(self, arraydef):
+        # Returns a view of the array in the file data
+        dtype = np.dtype(arraydef[BINARY_HEADER_DTYPE])
+        shape = tuple(arraydef[BINARY_HEADER_SHAPE])
+        offset = arraydef[BINARY_HEADER_OFFSET]
+        size = int(np.prod(shape)) * dtype.itemsize
+        return self._filedata[offset : offset + size].view(dtype).reshape(shape)
+
+
+class Writer(BaseWriter):
+    @staticmethod
+    def Write(ggxf, ggxf_file, options=None):
+        writer = Writer(options)
+        writer.write(ggxf, ggxf_file)
+
+    def __init__(self, options=None):
+        BaseWriter.__init__(self, options)
+        invalid = [
+            option for option in self._options if option not in BINARY_ALL_OPTIONS
+        ]
+        if invalid:
+            raise Error(f"Invalid binary GGXF option {','.join(invalid)}")
+        self._logger = logging.getLogger("GGXF.BinaryWriter")
+
+    def write(self, ggxf, ggxf_file):
+        dtypestr = self.getOption(BINARY_OPTION_GRID_DTYPE, BINARY_DEFAULT_WRITE_DTYPE)
+        self._dtype = BINARY_VALID_DTYPE_MAP.get(dtypestr)
+        if self._dtype is None:
+            raise Error(f"Invalid {BINARY_OPTION_GRID_DTYPE} option {dtypestr}")
+
+        self._logger.debug(f"Saving binary GGXF file {ggxf_file}")
+        ggxf.setFilename(os.path.basename(ggxf_file))
+
+        # Compile the header and the list of arrays to write
+        self._arrays = []
+        self._dataSize = 0
+        header = {
+            BINARY_HEADER_METADATA: ggxf.metadata(),
+            BINARY_HEADER_GROUPS: [self.groupHeader(group) for group in ggxf.groups()],
+        }
+        headerdata = json.dumps(header, default=_jsonValue).encode("utf8")
+        headerlen = len(headerdata)
+        datastart = _dataStart(headerlen)
+        headerdata += b" " * (datastart - len(BINARY_MAGIC) - 8 - headerlen)
+
+        with open(ggxf_file, "wb") as binh:
+            binh.write(BINARY_MAGIC)
+            binh.write(struct.pack("<Q", headerlen))
+            binh.write(headerdata)
+            for offset, dtype, getdata in self._arrays:
+                binh.seek(datastart + offset)
+                np.ascontiguousarray(getdata(), dtype=dtype).tofile(binh)
+
+    def groupHeader(self, group):
+        metadata = group.metadata().copy()
+        metadata.pop(GROUP_ATTR_GGXF_GROUP_NAME, None)
+        metadata.pop(GROUP_ATTR_GRIDS, None)
+        return {
+            BINARY_HEADER_NAME: group.name(),
+            BINARY_HEADER_METADATA: metadata,
+            BINARY_HEADER_GRIDS: [self.gridHeader(grid) for grid in group.grids()],
+        }
+
+    def gridHeader(self, grid):
+        metadata = grid.metadata().copy()
+        for key in (
+            GRID_ATTR_GRID_NAME,
+            GRID_ATTR_CHILD_GRIDS,
+            GRID_ATTR_DATA,
+            GRID_ATTR_DATA_SOURCE,
+        ):
+            metadata.pop(key, None)
+        griddef = {
+            BINARY_HEADER_NAME: grid.name(),
+            BINARY_HEADER_METADATA: metadata,
+        }
+        # Arrays are retrieved from the grid when they are written in case the
+        # grid data is loaded on demand.
+        data = grid.data()
+        shape = data.shape
+        if isinstance(data, np.ma.masked_array) and np.count_nonzero(data.mask) > 0:
+            griddef[BINARY_HEADER_MASK] = self.addArray(
+                shape,
+                np.dtype(np.bool_),
+                lambda grid=grid: np.ma.getmaskarray(grid.data()),
+            )
+        griddef[BINARY_HEADER_DATA] = self.addArray(
+            shape, self._dtype, lambda grid=grid: np.ma.getdata(grid.data())
+        )
+        griddef[BINARY_HEADER_GRIDS] = [
+            self.gridHeader(child) for child in grid.grids()
+        ]
+        return griddef
+
+    def addArray(self, shape, dtype, getdata):
+        # Add an array to the list to write and return its definition for the header.
+        # getdata is a function returning the array so that it is only converted
+        # to the output type when it is written.
+        offset = self._dataSize
+        self._arrays.append((offset, dtype, getdata))
+        self._dataSize = _alignedSize(offset + int(np.prod(shape)) * dtype.itemsize)
+        return {
+            BINARY_HEADER_OFFSET: offset,
+            BINARY_HEADER_SHAPE: list(shape),
+            BINARY_HEADER_DTYPE: dtype.str,
+        }
@@ -4,9 +4,16 @@ from __future__ import annotations
 import csv
 import json
 import logging
+import math
 import os.path
 import re
+import struct
 import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from time import perf_counter
 
 import numpy as np
 
@@ -15,8 +22,14 @@ from .Constants import *
 from .GGXF_Types import CommonAttributes, ContentTypes
 from .TimeFunction import BaseTimeFunction, CompoundTimeFunction
 
+_MaskedArray = np.ma.MaskedArray
+
 JSON_METADATA_ATTR = "metadata"
 
+# Grid data types read directly by the single point interpolation methods (see
+# Grid.stencilValues).  Other data types are converted to float64.
+GRID_POINT_DATA_TYPES = "bBhHiIlLqQefd"
+
 # Minimal mapping from CRSWKT direction to node coordinate. Mapping used
 # is the first entry for which the key is contained in the CRS type (eg GEOGCRS)
 
@@ -42,6 +55,8 @@ class GGXF:
         self._singleGroup = False
         self._source = source
         self._debug = False
+        self._stats = None
+        self._threadPool = None
         self._logger = logging.getLogger("GGXF")
         self._valueat = lambda xy, epoch, refepoch: None
         if debug:
@@ -56,6 +71,57 @@ class GGXF:
         for group in self._groups:
             group.setDebug(debug)
 
+    def setProfile(self, profile: bool = True):
+        # Enable or disable collection of evaluation statistics (see stats()).
+        # Enabling profiling resets the statistics.  When disabled the only
+        # overhead is a test of whether statistics are being collected.
+        self._stats = {"points": 0, "evaluateTime": 0.0} if profile else None
+        for group in self._groups:
+            group.setProfile(profile)
+
+    def setThreads(self, threads: int = None):
+        # Use a pool of threads to evaluate the groups in valuesAt and
+        # valuesAtEpochs.  numpy releases the GIL in array operations so groups
+        # can be evaluated concurrently.  The group values are summed in group
+        # order so the results are identical to serial evaluation.  If threads
+        # is None or 1 the groups are evaluated serially.
+        if self._threadPool is not None:
+            self._threadPool.shutdown()
+            self._threadPool = None
+        if threads is not None and threads > 1:
+            self._threadPool = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="GGXF"
+            )
+
+    def _mapGroups(self, function, groups):
+        # Returns a list of function(group) for each group, in the order of groups
+        if self._threadPool is None or len(groups) < 2:
+            return [function(group) for group in groups]
+        return list(self._threadPool.map(function, groups))
+
+    def stats(self):
+        # Returns a dictionary of evaluation statistics, or None if profiling
+        # is not enabled.  Times are cumulative in seconds.
+        if self._stats is None:
+            return None
+        groups = {group.name(): group.stats() for group in self.groups()}
+        times = {"evaluate": self._stats["evaluateTime"]}
+        for stage in ("search", "interpolate", "timeFunction"):
+            times[stage] = sum(g["time"][stage] for g in groups.values())
+        times["load"] = sum(
+            grid["loadTime"] for g in groups.values() for grid in g["grids"].values()
+        )
+        return {
+            "points": self._stats["points"],
+            "bytesLoaded": sum(
+                grid["bytesLoaded"]
+                for g in groups.values()
+                for grid in g["grids"].values()
+            ),
+            "time": times,
+            "groups": groups,
+        }
+
     def configure(self, errorhandler=None):
         self._singleGroup = len(self._groups) == 1
         ggxfParamSets = ContentTypes[self._content][ATTRDEF_PARAMSET_MAP]
@@ -71,6 +137,12 @@ class GGXF:
         # Cached values for groups to use in calculation at epoch
         self._calcEpoch = None
         self._calcGroups = list(self.groups())
+        self._calcGroupSet = set(self._calcGroups)
+        # Spatial index used to find the groups which may contain a point
+        self._groupIndex = None
+        indexGroups = [group for group in self._groups if group.grids()]
+        if len(self._groups) > 1 and indexGroups:
+            self._groupIndex = GridIndex(indexGroups)
         self._zero = np.zeros((len(self._parameters),))
         self._configured = True
 
@@ -94,6 +166,12 @@ class GGXF:
     def addGroup(self, group):
         self._configured = False
         self._groups.append(group)
+        if self._stats is not None:
+            group.setProfile()
+
+    def removeGroup(self, group):
+        self._configured = False
+        self._groups.remove(group)
 
     def groups(self):
         for group in self._groups:
@@ -108,6 +186,15 @@ class GGXF:
         self._metadata["filename"] = filename
 
     def valueAt(self, xy, epoch=None, refepoch=None):
+        if self._stats is not None:
+            starttime = perf_counter()
+            value = self._valueAt(xy, epoch, refepoch)
+            self._stats["points"] += 1
+            self._stats["evaluateTime"] += perf_counter() - starttime
+            return value
+        return self._valueAt(xy, epoch, refepoch)
+
+    def _valueAt(self, xy, epoch, refepoch):
         if not self._configured:
             self.configure()
         if self._debug:
@@ -122,15 +209,7 @@ class GGXF:
             return self._groups[0].valueAt(xy, epoch, refepoch)
 
         if self._needEpoch:
-            calcEpoch = (epoch, refepoch)
-            if calcEpoch != self._calcEpoch:
-                calcGroups = []
-                for group in self.groups():
-                    factor = group.timeFactorAt(epoch, refepoch)
-                    if factor is not None and factor != 0.0:
-                        calcGroups.append(group)
-                self._calcEpoch = calcEpoch
-                self._calcGroups = calcGroups
+            self._setCalcEpoch(epoch, refepoch)
         if self._debug:
             self._logger.debug(
                 f"Evaluating {len(self._calcGroups)} groups with non-zero time functions"
@@ -138,7 +217,14 @@ class GGXF:
         result = self._zero.copy()
         if len(self._calcGroups) == 0:
             return result
-        for group in self._calcGroups:
+        calcGroups = self._calcGroups
+        if self._groupIndex is not None:
+            calcGroups = [
+                group
+                for group in self._groupIndex.gridsNear(xy)
+                if group in self._calcGroupSet and group.contains(xy)
+            ]
+        for group in calcGroups:
             value = group.valueAt(xy, epoch, refepoch)
             if self._debug:
                 self._logger.debug(f"{group.name()}: {value}")
@@ -146,6 +232,162 @@ class GGXF:
                 result += value
         return result
 
+    def valuesAt(self, xy, epoch=None, refepoch=None):
+        # Vectorised version of valueAt.  xy is an (N,2) array of points.  Returns
+        # an (N,nparam) array of values and an (N,) boolean array which is False
+        # for points at which valueAt would return None.  epoch and refepoch
+        # may be arrays of N epochs, one for each point.
+        if self._stats is not None:
+            starttime = perf_counter()
+            values, valid = self._valuesAt(xy, epoch, refepoch)
+            self._stats["points"] += values.shape[0]
+            self._stats["evaluateTime"] += perf_counter() - starttime
+            return values, valid
+        return self._valuesAt(xy, epoch, refepoch)
+
+    def _valuesAt(self, xy, epoch, refepoch):
+        xy = self._checkPoints(xy)
+        if self._debug:
+            self._logger.debug(
+                f"Evaluating {xy.shape[0]} points, epochs {epoch} {refepoch}"
+            )
+        if self._needEpoch:
+            if epoch is None:
+                raise Error(
+                    f"Cannot evaluate {self._content} without providing an epoch"
+                )
+            if np.ndim(epoch) > 0 or np.ndim(refepoch) > 0:
+                epochs = self._checkEpochs(epoch, xy.shape[0], "epoch")
+                if refepoch is not None:
+                    refepoch = self._checkEpochs(refepoch, xy.shape[0], "refepoch")
+                return self._epochValuesAt(xy, epochs, refepoch, False)
+
+        if self._singleGroup:
+            return self._groups[0].valuesAt(xy, epoch, refepoch)
+
+        if self._needEpoch:
+            self._setCalcEpoch(epoch, refepoch)
+
+        def groupValues(group):
+            inside = group.containsPoints(xy)
+            if not inside.any():
+                return None
+            value, _ = group.valuesAt(xy[inside], epoch, refepoch)
+            return inside, value
+
+        result = np.zeros((xy.shape[0], len(self._parameters)))
+        valid = np.ones((xy.shape[0],), dtype=bool)
+        for groupresult in self._mapGroups(groupValues, self._calcGroups):
+            if groupresult is not None:
+                inside, value = groupresult
+                result[inside] += value
+        return result, valid
+
+    def valuesAtEpochs(self, xy, epochs, refepochs=None):
+        # Evaluate an (N,2) array of points at each of an array of M epochs.
+        # refepochs may be a single epoch or an array of M epochs.  The grids are
+        # interpolated once for each point and scaled by the time factor for
+        # each epoch.  Returns an (N,M,nparam) array of values and an (N,)
+        # boolean array which is False for points at which valueAt would
+        # return None.
+        if self._stats is not None:
+            starttime = perf_counter()
+            values, valid = self._valuesAtEpochs(xy, epochs, refepochs)
+            self._stats["points"] += values.shape[0] * values.shape[1]
+            self._stats["evaluateTime"] += perf_counter() - starttime
+            return values, valid
+        return self._valuesAtEpochs(xy, epochs, refepochs)
+
+    def _valuesAtEpochs(self, xy, epochs, refepochs):
+        xy = self._checkPoints(xy)
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if len(epochs.shape) != 1:
+            raise Error(f"Epochs must be a one dimensional array - got {epochs}")
+        if refepochs is not None:
+            refepochs = self._checkEpochs(refepochs, epochs.size, "refepochs")
+        if self._debug:
+            self._logger.debug(
+                f"Evaluating {xy.shape[0]} points at {epochs.size} epochs"
+            )
+        if not self._needEpoch:
+            values, valid = self._valuesAt(xy, None, None)
+            values = np.repeat(values[:, None, :], epochs.size, axis=1)
+            return values, valid
+        return self._epochValuesAt(xy, epochs, refepochs, True)
+
+    def _checkPoints(self, xy):
+        if not self._configured:
+            self.configure()
+        xy = np.asarray(xy, dtype=np.float64)
+        if len(xy.shape) != 2 or xy.shape[1] != 2:
+            raise Error(f"Points must be an (N,2) array - got shape {xy.shape}")
+        return xy
+
+    def _checkEpochs(self, epochs, nepoch, name):
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if epochs.shape not in ((), (nepoch,)):
+            raise Error(
+                f"{name} must be a single epoch or an array of {nepoch} epochs - got shape {epochs.shape}"
+            )
+        return epochs
+
+    def _epochValuesAt(self, xy, epochs, refepochs, matrix):
+        # Evaluate points at an array of epochs.  If matrix is True every point
+        # is evaluated at every epoch, otherwise each point is evaluated at its
+        # own epoch.  The grid values of each group are calculated once and
+        # multiplied by the time factors for the epochs.
+        def groupValues(group):
+            # Returns the points within the extents of the group, the group
+            # values at those points, and whether they are within a grid.
+            if self._singleGroup:
+                inside = np.ones((xy.shape[0],), dtype=bool)
+            else:
+                inside = group.containsPoints(xy)
+                if not inside.any():
+                    return None
+            groupepochs, grouprefepochs = epochs, refepochs
+            if not matrix:
+                if groupepochs.ndim > 0:
+                    groupepochs = groupepochs[inside]
+                if grouprefepochs is not None and grouprefepochs.ndim > 0:
+                    grouprefepochs = grouprefepochs[inside]
+            factors = group.timeFactorsAt(groupepochs, grouprefepochs)
+            if not self._singleGroup and not factors.any():
+                return None
+            value, groupvalid = group.gridValuesAt(xy[inside])
+            if matrix:
+                value = value[:, None, :] * factors[None, :, None]
+            else:
+                value = value * factors[:, None]
+            return inside, value, groupvalid
+
+        npoint = xy.shape[0]
+        nparam = len(self._parameters)
+        shape = (npoint, epochs.size, nparam) if matrix else (npoint, nparam)
+        result = np.zeros(shape)
+        valid = np.ones((npoint,), dtype=bool)
+        for groupresult in self._mapGroups(groupValues, self._groups):
+            if groupresult is None:
+                continue
+            inside, value, groupvalid = groupresult
+            if self._singleGroup:
+                valid = groupvalid
+            result[inside] += value
+        return result, valid
+
+    def _setCalcEpoch(self, epoch, refepoch):
+        # Select the groups with a non-zero time function at the epoch
+        calcEpoch = (epoch, refepoch)
+        if calcEpoch != self._calcEpoch:
+            calcGroups = []
+            for group in self.groups():
+                factor = group.timeFactorAt(epoch, refepoch)
+                if factor is not None and factor != 0.0:
+                    calcGroups.append(group)
+            self._calcEpoch = calcEpoch
+            self._calcGroups = calcGroups
+            self._calcGroupSet = set(calcGroups)
+
     def extents(self):
         grpext = np.array([g.extents() for g in self.groups()])
         return [
@@ -219,7 +461,9 @@ class GridList:
         self._metadata = metadata
         self._configured = False
         self._searchOrder = None
+        self._index = None
         self._grids = []
+        self._stats = None
 
     def name(self):
         return self._name
@@ -235,6 +479,23 @@ class GridList:
         for grid in self._grids:
             grid.setDebug(debug)
 
+    def setProfile(self, profile: bool = True):
+        self._stats = self._newStats() if profile else None
+        for grid in self._grids:
+            grid.setProfile(profile)
+
+    def _newStats(self):
+        raise NotImplementedError()
+
+    def stats(self):
+        # Returns a copy of the evaluation statistics if profiling is enabled
+        if self._stats is None:
+            return None
+        return {
+            key: value.copy() if isinstance(value, dict) else value
+            for key, value in self._stats.items()
+        }
+
     def addGrid(self, grid: Grid):
         gridPriority = grid.priority()
         for sibling in self._grids:
@@ -250,6 +511,8 @@ class GridList:
                     )
         self._grids.append(grid)
         self._configured = False
+        if self._stats is not None:
+            grid.setProfile()
 
     def configure(self, id=None, errorhandler=None):
         if id:
@@ -260,17 +523,101 @@ class GridList:
                 grid.setId(f"{self._id}:{igrid}")
         self._searchOrder = self._grids.copy()
         self._searchOrder.sort(key=lambda g: g.priority() or 0, reverse=True)
+        self._index = None
+        if len(self._searchOrder) > GridIndex.MIN_GRIDS:
+            self._index = GridIndex(self._searchOrder)
         self._configured = True
 
+    def contains(self, xy):
+        # Test whether xy is within the extents (_xmin, _xmax, _ymin, _ymax)
+        return (
+            xy[0] >= self._xmin
+            and xy[0] <= self._xmax
+            and xy[1] >= self._ymin
+            and xy[1] <= self._ymax
+        )
+
+    def containsPoints(self, xy):
+        # Vectorised version of contains for an (N,2) array of points
+        return (
+            (xy[:, 0] >= self._xmin)
+            & (xy[:, 0] <= self._xmax)
+            & (xy[:, 1] >= self._ymin)
+            & (xy[:, 1] <= self._ymax)
+        )
+
     def gridAt(self, xy):
         if not self._configured:
             raise Error("GGXF not configured")
-        for grid in self._searchOrder:
+        searchOrder = self._searchOrder
+        if self._index is not None:
+            searchOrder = self._index.gridsNear(xy)
+        for grid in searchOrder:
             if grid.contains(xy):
                 cgrid = grid.gridAt(xy) or grid
                 return cgrid
         return None
 
+    def gridsAt(self, xy):
+        # Vectorised version of gridAt for an (N,2) array of points.  Returns
+        # a list of (grid, indices) where indices are the rows of xy for which
+        # gridAt would return grid.  Points not in any grid are not included.
+        if not self._configured:
+            raise Error("GGXF not configured")
+        gridpoints, _ = self._gridsAt(xy, np.arange(xy.shape[0]))
+        return gridpoints
+
+    def _gridsAt(self, xy, indices):
+        # Returns the grids for the points xy[indices] and the indices
+        # not contained in any grid
+        if self._index is not None and indices.size >= self._index.nbucket():
+            return self._indexedGridsAt(xy, indices)
+        gridpoints = []
+        for grid in self._searchOrder:
+            if indices.size == 0:
+                break
+            inside = grid.containsPoints(xy[indices])
+            if not inside.any():
+                continue
+            childpoints, gridindices = grid._gridsAt(xy, indices[inside])
+            gridpoints.extend(childpoints)
+            if gridindices.size > 0:
+                gridpoints.append((grid, gridindices))
+            indices = indices[~inside]
+        return gridpoints, indices
+
+    def _indexedGridsAt(self, xy, indices):
+        # As for _gridsAt but using the spatial index.  Points are sorted by
+        # index bucket so that the points in the buckets overlapping a grid are
+        # a few contiguous slices, and each grid is tested once against the
+        # points in those slices not already matched by an earlier grid.
+        index = self._index
+        xy = xy[indices]
+        buckets = index.bucketsOf(xy)
+        order = np.argsort(buckets, kind="stable")
+        bounds = np.searchsorted(buckets[order], np.arange(index.nbucket() + 1))
+        unmatched = np.ones(indices.size, dtype=bool)
+        gridpoints = []
+        for grid, slices in zip(self._searchOrder, index.gridBucketSlices()):
+            candidates = [order[bounds[start] : bounds[end]] for start, end in slices]
+            candidates = (
+                candidates[0] if len(candidates) == 1 else np.concatenate(candidates)
+            )
+            candidates = candidates[unmatched[candidates]]
+            if candidates.size == 0:
+                continue
+            candidates = candidates[grid.containsPoints(xy[candidates])]
+            if candidates.size == 0:
+                continue
+            unmatched[candidates] = False
+            childpoints, gindices = grid._gridsAt(xy, np.sort(candidates))
+            gridpoints.extend(
+                (cgrid, indices[cindices]) for cgrid, cindices in childpoints
+            )
+            if gindices.size > 0:
+                gridpoints.append((grid, indices[gindices]))
+        return gridpoints, indices[unmatched]
+
     def grids(self):
         return self._grids
 
@@ -281,6 +628,84 @@ class GridList:
                 yield grid
 
 
+class GridIndex:
+    # Spatial index of a list of grids used by GridList to find the grids which
+    # may contain a point.  The combined extents of the grids are divided into a
+    # uniform array of buckets, each of which holds the grids overlapping it in
+    # the order of the list (ie search order).  GGXF also uses this to index
+    # its groups, which provide extents() in the same way as grids.
+
+    # Minimum number of grids for which an index is built
+    MIN_GRIDS = 8
+    # Number of buckets along each axis per square root of the number of grids
+    BUCKET_RATIO = 2
+
+    def __init__(self, grids):
+        extents = np.array([grid.extents() for grid in grids])
+        self._xymin = extents[:, 0, :].min(axis=0)
+        self._xymax = extents[:, 1, :].max(axis=0)
+        nbucket = int(np.ceil(np.sqrt(len(grids)))) * self.BUCKET_RATIO
+        self._nbucket = nbucket
+        bucketsize = (self._xymax - self._xymin) / nbucket
+        self._bucketsize = np.where(bucketsize > 0.0, bucketsize, 1.0)
+        # Python copies of the limits for the single point lookup in gridsNear
+        self._xmin, self._ymin = self._xymin.tolist()
+        self._xmax, self._ymax = self._xymax.tolist()
+        self._xsize, self._ysize = self._bucketsize.tolist()
+        self._buckets = [[] for i in range(nbucket * nbucket)]
+        # For each grid the ranges of bucket numbers it overlaps, one for each
+        # row of buckets, as (start, end) with end exclusive
+        self._gridBucketSlices = []
+        for grid, (gmin, gmax) in zip(grids, extents):
+            bmin = self._bucketij(gmin)
+            bmax = self._bucketij(gmax)
+            slices = []
+            for bi in range(bmin[0], bmax[0] + 1):
+                start = bi * nbucket + bmin[1]
+                slices.append((start, start + bmax[1] - bmin[1] + 1))
+                for bucket in range(*slices[-1]):
+                    self._buckets[bucket].append(grid)
+            self._gridBucketSlices.append(slices)
+        self._empty = []
+
+    def _bucketij(self, xy):
+        bij = np.floor((np.asarray(xy) - self._xymin) / self._bucketsize).astype(int)
+        return np.minimum(np.maximum(bij, 0), self._nbucket - 1)
+
+    def nbucket(self):
+        # Total number of buckets in the index
+        return self._nbucket * self._nbucket
+
+    def gridBucketSlices(self):
+        # The (start, end) bucket number ranges overlapped by each grid in the
+        # order of the list of grids used to build the index
+        return self._gridBucketSlices
+
+    def gridsNear(self, xy):
+        # Returns the grids which may contain xy in search order.  This uses
+        # the same calculation as _bucketij with Python floats, which is much
+        # faster than numpy for a single point.  The test is written so that
+        # NaN coordinates, for which every comparison is false, are outside.
+        x, y = xy[0], xy[1]
+        if not (self._xmin <= x <= self._xmax and self._ymin <= y <= self._ymax):
+            return self._empty
+        nbucket = self._nbucket
+        bi = min(int((x - self._xmin) / self._xsize), nbucket - 1)
+        bj = min(int((y - self._ymin) / self._ysize), nbucket - 1)
+        return self._buckets[bi * nbucket + bj]
+
+    def bucketsOf(self, xy):
+        # Returns the bucket number of each of an (N,2) array of points,
+        # or -1 for points outside the extents of the grids or with NaN
+        # coordinates.  These are replaced by the minimum extents before
+        # calculating buckets so that they are not converted to integers.
+        inside = ((xy >= self._xymin) & (xy <= self._xymax)).all(axis=1)
+        bij = self._bucketij(np.where(inside[:, np.newaxis], xy, self._xymin))
+        buckets = bij[:, 0] * self._nbucket + bij[:, 1]
+        buckets[~inside] = -1
+        return buckets
+
+
 class Group(GridList):
     def __init__(self, ggxf, groupname, metadata):
         super().__init__(groupname, metadata)
@@ -293,6 +718,8 @@ class Group(GridList):
         self._zero = None
         method = metadata.get(GROUP_ATTR_INTERPOLATION_METHOD)
         self._interpolator = GridInterpolator.getMethod(method)
+        self._arrayInterpolator = GridInterpolator.getArrayMethod(method)
+        self._stencilMargins = GridInterpolator.StencilMargins[method]
         self._grids = []
         self._timeFunction = None
         funcdeflist = metadata.get(GROUP_ATTR_TIME_FUNCTIONS)
@@ -308,6 +735,11 @@ class Group(GridList):
     def parameterNames(self):
         return self._parameterNames
 
+    def stencilMargins(self):
+        # Number of grid nodes either side of a set of points used to interpolate
+        # them (see GridInterpolator.StencilMargins)
+        return self._stencilMargins
+
     def nparam(self):
         return len(self._parameterNames)
 
@@ -369,8 +801,34 @@ class Group(GridList):
     def parameterMap(self):
         return self._parameterMap
 
+    def _newStats(self):
+        return {
+            "points": 0,
+            "searchMisses": 0,
+            "timeFactorCacheHits": 0,
+            "timeFactorCacheMisses": 0,
+            "time": {"search": 0.0, "interpolate": 0.0, "timeFunction": 0.0},
+        }
+
+    def stats(self):
+        stats = super().stats()
+        if stats is not None:
+            stats["grids"] = {grid.name(): grid.stats() for grid in self.allgrids()}
+            if self._timeFunction is not None:
+                stats["timeFunctionCache"] = self._timeFunction.cacheStats()
+        return stats
+
     def valueAt(self, xy, epoch=None, refepoch=None):
+        stats = self._stats
+        if stats is not None:
+            starttime = perf_counter()
         grid = self.gridAt(xy)
+        if stats is not None:
+            searchtime = perf_counter()
+            stats["points"] += 1
+            stats["time"]["search"] += searchtime - starttime
+            if grid is None:
+                stats["searchMisses"] += 1
         if grid is None:
             return None
         if self._debug:
@@ -378,6 +836,9 @@ class Group(GridList):
                 f"{self._name}: grid at {xy}: {grid.id()} {grid.name()}"
             )
         value = self._interpolator(grid, xy)
+        if stats is not None:
+            stats["time"]["interpolate"] += perf_counter() - searchtime
+            grid._stats["points"] += 1
         if self._debug:
             self._ggxf._logger.debug(f"{self._name}: value at {xy}: {value}")
         if self._needEpoch:
@@ -386,27 +847,121 @@ class Group(GridList):
                 self._ggxf._logger._debug(
                     f"{self.name}: time factor at {epoch} {refepoch}: {timeFactor:.4f}"
                 )
-            value *= timeFactor
+            value = [v * timeFactor for v in value]
         result = self._zero.copy()
         result[self._parameterMap] = value
         return result
 
+    def valuesAt(self, xy, epoch=None, refepoch=None):
+        # Vectorised version of valueAt for an (N,2) array of points.  Returns
+        # an (N,nparam) array of values and a boolean array of the points
+        # which are within the grids of the group.
+        result, valid = self.gridValuesAt(xy)
+        if self._needEpoch:
+            timeFactor = self.timeFactorAt(epoch, refepoch)
+            result *= timeFactor
+        return result, valid
+
+    def gridValuesAt(self, xy):
+        # Interpolated grid values at an (N,2) array of points before applying
+        # the time function.  Returns an (N,nparam) array of values and a boolean
+        # array of the points which are within the grids of the group.
+        stats = self._stats
+        if stats is not None:
+            starttime = perf_counter()
+        result = np.zeros((xy.shape[0], len(self._zero)))
+        valid = np.zeros((xy.shape[0],), dtype=bool)
+        gridpoints = self.gridsAt(xy)
+        if stats is not None:
+            searchtime = perf_counter()
+            stats["time"]["search"] += searchtime - starttime
+        for grid, indices in gridpoints:
+            if self._debug:
+                self._ggxf._logger.debug(
+                    f"{self._name}: {indices.size} points in grid {grid.id()} {grid.name()}"
+                )
+            value = self._arrayInterpolator(grid, xy[indices])
+            result[np.ix_(indices, self._parameterMap)] = value
+            valid[indices] = True
+            if stats is not None:
+                grid._stats["points"] += indices.size
+        if stats is not None:
+            stats["time"]["interpolate"] += perf_counter() - searchtime
+            stats["points"] += xy.shape[0]
+            stats["searchMisses"] += xy.shape[0] - int(np.count_nonzero(valid))
+        return result, valid
+
     def timeFactorAt(self, epoch: float, refepoch: float = None):
         if not self._timeFunction:
             raise Error(f"Cannot evaluate {self.name()} - time function not defined")
         if epoch is None:
             raise Error(f"Cannot evaluate {self.name()} - epoch not defined")
         calcepoch = (epoch, refepoch)
+        stats = self._stats
         if calcepoch == self._cacheEpoch:
+            if stats is not None:
+                stats["timeFactorCacheHits"] += 1
             return self._cacheFactor
+        if stats is not None:
+            starttime = perf_counter()
         if refepoch is None:
             factor = self._timeFunction.valueAt(epoch)
         else:
             factor = self._timeFunction.valueChange(epoch, refepoch)
+        if stats is not None:
+            stats["timeFactorCacheMisses"] += 1
+            stats["time"]["timeFunction"] += perf_counter() - starttime
         self._cacheEpoch = calcepoch
         self._cacheFactor = factor
         return factor
 
+    def isZeroBetween(self, epoch0: float, epoch1: float):
+        # Test whether the group contributes nothing to the GGXF values at
+        # epochs from epoch0 to epoch1, ie the time function is zero or not
+        # defined throughout.  A group without a time function is never zero.
+        if not self._timeFunction:
+            return False
+        return self._timeFunction.isZeroBetween(epoch0, epoch1)
+
+    def timeFactorsAt(self, epochs, refepochs=None):
+        # Time factors for an array of epochs.  refepochs may be a single epoch
+        # or an array matching epochs.  The time function is evaluated once for
+        # each distinct pair of epochs.  Epochs at which the time function is not
+        # defined have a factor of 0.0, matching the GGXF evaluation which omits
+        # the group at those epochs.
+        if not self._timeFunction:
+            raise Error(f"Cannot evaluate {self.name()} - time function not defined")
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if refepochs is None:
+            calcepochs = epochs.reshape((-1, 1))
+        else:
+            epochs, refepochs = np.broadcast_arrays(
+                epochs, np.asarray(refepochs, dtype=np.float64)
+            )
+            calcepochs = np.column_stack((epochs.ravel(), refepochs.ravel()))
+        stats = self._stats
+        if stats is not None:
+            starttime = perf_counter()
+        unique, inverse = np.unique(calcepochs, axis=0, return_inverse=True)
+        if refepochs is None:
+            factors = self._timeFunction.valuesAt(unique[:, 0])
+        else:
+            factors = self._timeFunction.valuesChange(unique[:, 0], unique[:, 1])
+        factors[np.isnan(factors)] = 0.0
+        if stats is not None:
+            stats["timeFactorCacheMisses"] += unique.shape[0]
+            stats["time"]["timeFunction"] += perf_counter() - starttime
+        return factors[inverse.reshape(-1)].reshape(epochs.shape)
+
+    def configure(self, id=None, errorhandler=None):
+        super().configure(id, errorhandler)
+        # Extents of the group used by contains and containsPoints.  A group
+        # without grids contains no points.
+        self._xmin = self._ymin = math.inf
+        self._xmax = self._ymax = -math.inf
+        if self._grids:
+            (self._xmin, self._ymin), (self._xmax, self._ymax) = self.extents()
+
     def extents(self):
         grdext = np.array([g.extents() for g in self.grids()])
         return [
@@ -452,6 +1007,27 @@ class Grid(GridList):
         self._jmax = int(metadata[GRID_ATTR_J_NODE_COUNT] - 1)
         self._nparam = group.nparam()
         self._cellmax = np.array([self._imax - 1, self._jmax - 1])
+        # Python copies of the cell limits and the affine transformation used by
+        # the single point interpolation methods (see GridInterpolator).  The
+        # python calculation of the cell position matches numpy only if each row
+        # of the inverse transformation has one non-zero term, as numpy may use
+        # fused multiply-add when both are non-zero.
+        t00, t01, t10, t11 = self._inv.ravel().tolist()
+        self._pointTransform = None
+        if (t00 == 0.0 or t01 == 0.0) and (t10 == 0.0 or t11 == 0.0):
+            self._pointTransform = (
+                *self._xy0.tolist(),
+                t00,
+                t01,
+                t10,
+                t11,
+                *self._cellmax.tolist(),
+            )
+        self._rowStride = (self._jmax + 1) * self._nparam
+        # Data used by stencilValues, and the structs reading the stencils for
+        # each data type
+        self._pointData = None
+        self._pointStencils = {}
         range = np.array(
             [
                 self.calcxy([0.0, 0.0]),
@@ -467,6 +1043,10 @@ class Grid(GridList):
         self._debug = False
 
         self._data = None
+        self._dataLoader = None
+        self._dataCache = None
+        self._scale = None
+        self._offset = None
         if data is not None:
             self.setData(data)
 
@@ -480,8 +1060,80 @@ class Grid(GridList):
         return self._group.logger()
 
     def data(self):
+        # Returns the grid parameter values.  For a packed grid these are
+        # calculated from the stored integer data.
+        data = self.storedData()
+        if self._scale is not None and data is not None:
+            data = self.unpack(data)
+        return data
+
+    def storedData(self):
+        # Returns the grid data as held in memory, which for a packed grid is
+        # the integer array.  Interpolation uses this and unpacks the result.
+        if self._dataLoader is not None:
+            return self._dataCache.get(self, self._loadData)
         return self._data
 
+    def isPacked(self):
+        return self._scale is not None
+
+    def unpack(self, values):
+        # Convert packed values to parameter values.  The last dimension of
+        # values is the grid parameters.
+        if self._scale is None:
+            return values
+        return values * self._scale + self._offset
+
+    def _setPacking(self, scale, offset):
+        # Packed grids hold integer data which is converted to parameter values
+        # as value = data * scale + offset, where scale and offset are single
+        # values or arrays with a value for each parameter.
+        if scale is None and offset is None:
+            self._scale = None
+            self._offset = None
+            return
+        shape = (self._nparam,)
+        scale = 1.0 if scale is None else scale
+        offset = 0.0 if offset is None else offset
+        self._scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), shape).copy()
+        self._offset = np.broadcast_to(
+            np.asarray(offset, dtype=np.float64), shape
+        ).copy()
+        self._scaleValues = self._scale.tolist()
+        self._offsetValues = self._offset.tolist()
+
+    def setDataLoader(self, loader, cache: GridDataCache, scale=None, offset=None):
+        # Defer loading the grid data until it is first used.  loader is a function
+        # returning the grid data.  The loaded data is held in the cache.  scale and
+        # offset are used if the loaded data is packed (see setData).
+        self._data = None
+        self._dataLoader = loader
+        self._dataCache = cache
+        self._pointData = None
+        self._setPacking(scale, offset)
+
+    def _loadData(self):
+        if self._stats is not None:
+            starttime = perf_counter()
+        data = self._dataLoader()
+        if not isinstance(data, np.ndarray):
+            data = np.array(data)
+        shape = (self._imax + 1, self._jmax + 1, self._nparam)
+        if data.shape != shape:
+            raise Error(
+                f"Grid {self.name()} data dimensions {data.shape} don't match expected {shape}"
+            )
+        if self._stats is not None:
+            self._stats["loads"] += 1
+            self._stats["bytesLoaded"] += data.nbytes
+            self._stats["loadTime"] += perf_counter() - starttime
+        return data
+
+    def _newStats(self):
+        # Data already held in memory is counted as loaded
+        nbytes = self._data.nbytes if self._data is not None else 0
+        return {"points": 0, "loads": 0, "bytesLoaded": nbytes, "loadTime": 0.0}
+
     def priority(self):
         return self._priority
 
@@ -508,8 +1160,12 @@ class Grid(GridList):
         grid._parent = self
         super().addGrid(grid)
 
-    def setData(self, data):
-        if type(data) not in (np.array, np.ma.masked_array):
+    def setData(self, data, scale=None, offset=None):
+        # Set the grid data, an (ni,nj,nparam) array.  If scale or offset are
+        # specified then data is an integer array of packed values, and the
+        # parameter values are data * scale + offset.  Packed data is kept in
+        # memory as integers and interpolated values are unpacked.
+        if not isinstance(data, np.ndarray):
             data = np.array(data)
         shape = (self._imax + 1, self._jmax + 1, self._nparam)
         if data.shape == shape[:2]:
@@ -519,6 +1175,14 @@ class Grid(GridList):
                 f"Grid {self.name()} data dimensions {data.shape} don't match expected {shape}"
             )
         self._data = data
+        self._pointData = None
+        if self._stats is not None:
+            self._stats["bytesLoaded"] += data.nbytes
+        if self._dataLoader is not None:
+            self._dataCache.remove(self)
+            self._dataLoader = None
+            self._dataCache = None
+        self._setPacking(scale, offset)
 
     def get(self, key: str):
         return self._metadata.get(key)
@@ -529,14 +1193,6 @@ class Grid(GridList):
     def calcij(self, xy):
         return self._inv.dot(xy - self._xy0)
 
-    def contains(self, xy):
-        return (
-            xy[0] >= self._xmin
-            and xy[0] <= self._xmax
-            and xy[1] >= self._ymin
-            and xy[1] <= self._ymax
-        )
-
     def overlaps(self, grid: Grid):
         dtol = min(self._tolerance, grid._tolerance)
         if (
@@ -557,6 +1213,88 @@ class Grid(GridList):
         cxy = rij - cij
         return cij, cxy
 
+    def cellPosition(self, xy):
+        # Scalar version of cellij using python floats.  Returns the indices of
+        # the cell containing the point and the position of the point in the cell
+        # as (i, j, x, y)
+        transform = self._pointTransform
+        if transform is None:
+            cij, cxy = self.cellij(np.asarray(xy, dtype=np.float64))
+            return (*cij.tolist(), *cxy.tolist())
+        x, y = xy.tolist() if isinstance(xy, np.ndarray) else xy
+        x0, y0, t00, t01, t10, t11, cimax, cjmax = transform
+        dx = x - x0
+        dy = y - y0
+        ri = t00 * dx + t01 * dy
+        rj = t10 * dx + t11 * dy
+        ci = math.floor(ri)
+        ci = 0 if ci < 0 else cimax if ci > cimax else ci
+        cj = math.floor(rj)
+        cj = 0 if cj < 0 else cjmax if cj > cjmax else cj
+        return ci, cj, ri - ci, rj - cj
+
+    def stencilValues(self, i0, j0, method):
+        # Values of the size x size nodes of the stencil of an interpolation method
+        # (see GridInterpolator.StencilSizes) starting at node (i0,j0).  Returns a
+        # tuple of python values ordered by i, j, and parameter as they are stored,
+        # or None if the data is masked.
+        pointdata = self._pointData or self._loadPointData()
+        if pointdata is None:
+            return None
+        view, stencils, rowbytes, nodebytes = pointdata
+        return stencils[method].unpack_from(view, i0 * rowbytes + j0 * nodebytes)
+
+    def _loadPointData(self):
+        # Get the stored data as a flat memoryview and the structs unpacking each
+        # stencil from it.  These are kept for data held in memory, but not for
+        # data loaded on demand so that they do not retain data discarded from the
+        # cache.
+        data = self.storedData()
+        if isinstance(data, _MaskedArray):
+            return None
+        if not data.dtype.isnative or data.dtype.char not in GRID_POINT_DATA_TYPES:
+            data = data.astype(np.float64)
+        data = np.ascontiguousarray(data)
+        code = data.dtype.char
+        itemsize = data.dtype.itemsize
+        stencils = self._pointStencils.get(code)
+        if stencils is None:
+            stencils = {}
+            nodes = (self._jmax + 1) * self._nparam
+            for method, size in GridInterpolator.StencilSizes.items():
+                if size > self._imax + 1 or size > self._jmax + 1:
+                    continue
+                row = f"{size * self._nparam}{code}"
+                skip = f"{(nodes - size * self._nparam) * itemsize}x"
+                stencils[method] = struct.Struct("@" + row + (skip + row) * (size - 1))
+            self._pointStencils[code] = stencils
+        pointdata = (
+            memoryview(data.reshape(-1)),
+            stencils,
+            self._rowStride * itemsize,
+            self._nparam * itemsize,
+        )
+        if self._dataLoader is None:
+            self._pointData = pointdata
+        return pointdata
+
+    def unpackValues(self, values):
+        # Version of unpack for a list of values from the single point
+        # interpolation methods
+        if self._scale is None:
+            return values
+        return [
+            v * scale + offset
+            for v, scale, offset in zip(values, self._scaleValues, self._offsetValues)
+        ]
+
+    def cellsij(self, xy):
+        # Vectorised version of cellij for an (N,2) array of points
+        rij = (xy - self._xy0).dot(self._inv.T)
+        cij = np.maximum(0, np.minimum(self._cellmax, np.floor(rij).astype(int)))
+        cxy = rij - cij
+        return cij, cxy
+
     def summary(self):
         "Returns a somewhat arbitrary summary of the grid contents"
         size = {"ngridi": self._imax + 1, "ngridj": self._jmax + 1}
@@ -567,8 +1305,9 @@ class Grid(GridList):
             "ymax": float(self._ymax),
         }
         params = self.group().parameterNames()
-        pmin = self._data.min(axis=(0, 1))
-        pmax = self._data.max(axis=(0, 1))
+        data = self.data()
+        pmin = data.min(axis=(0, 1))
+        pmax = data.max(axis=(0, 1))
         pdata = {
             parami: {"min": float(pmini), "max": float(pmaxi)}
             for parami, pmini, pmaxi in zip(params, pmin, pmax)
@@ -584,143 +1323,395 @@ class Grid(GridList):
         return summary
 
 
+class GridDataCache:
+    # Least recently used cache of grid data loaded on demand (see Grid.setDataLoader).
+    # Data is discarded when the total size of the cached arrays exceeds maxbytes.
+    # The most recently loaded grid is always retained.  Access is serialised
+    # with a lock as groups may be evaluated in separate threads (see
+    # GGXF.setThreads), and loaders such as NetCDF reads are not thread safe.
+
+    def __init__(self, maxbytes: int):
+        self._maxbytes = maxbytes
+        self._nbytes = 0
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self._lock:
+            data = self._arrays.get(key)
+            if data is not None:
+                self._arrays.move_to_end(key)
+                return data
+            data = loader()
+            self._arrays[key] = data
+            self._nbytes += data.nbytes
+            while self._nbytes > self._maxbytes and len(self._arrays) > 1:
+                _, discarded = self._arrays.popitem(last=False)
+                self._nbytes -= discarded.nbytes
+            return data
+
+    def remove(self, key):
+        with self._lock:
+            data = self._arrays.pop(key, None)
+            if data is not None:
+                self._nbytes -= data.nbytes
+
+    def nbytes(self):
+        return self._nbytes
+
+
 class GridInterpolator:
-    # Note: Somewhat cryptic implementations using numpy arrays!
-    # Note: Could be more efficiently implemented with numpy/scipy interpolation functions
+    # The single point interpolation methods are evaluated with python floats
+    # rather than numpy as numpy has a large overhead for operations on small
+    # arrays.  For each method the node weights are calculated in closed form
+    # from the position in the cell, and the node values are read from the grid
+    # data with a struct precomputed for each grid (see Grid.stencilValues).
+    # The methods return a list of parameter values.
+    #
+    # The calculations replicate the order of operations of the numpy
+    # implementations they replaced, so that the results are unchanged.  In
+    # particular the weighted node values are summed in the order used by numpy
+    # sum over the nodes: pairwise (in blocks of 8 values) for a single
+    # parameter, otherwise sequentially.  The sums are written out for each
+    # number of nodes as python loops over the nodes are much slower.  Masked
+    # grid data is handled by the vectorised methods.
+
+    # Number of nodes along each axis of the stencil used by each method
+    StencilSizes = {
+        INTERPOLATION_METHOD_BILINEAR: 2,
+        INTERPOLATION_METHOD_BIQUADRATIC: 3,
+        INTERPOLATION_METHOD_BICUBIC: 4,
+    }
+
+    @staticmethod
+    def _maskedValue(grid, arrayMethod, xy):
+        # Value at a point in a grid with masked data using the vectorised method
+        value = arrayMethod(grid, np.array([xy], dtype=np.float64))[0]
+        return np.ma.getdata(value).tolist()
+
+    # The weighted sums take the factors for the nodes along each axis, the
+    # weight of node (i,j) being fx[i] * fy[j], and the node values from
+    # Grid.stencilValues.  They return a list of the sums for each parameter.
+
+    @staticmethod
+    def _weightedSum4(fx, fy, nodevalues, nparam):
+        # Nodes (0,0), (0,1), (1,0), (1,1) are summed in the order (0,0), (0,1),
+        # (1,1), (1,0)
+        fx0, fx1 = fx
+        fy0, fy1 = fy
+        w0 = fx0 * fy0
+        w1 = fx0 * fy1
+        w2 = fx1 * fy0
+        w3 = fx1 * fy1
+        if nparam == 1:
+            v0, v1, v2, v3 = nodevalues
+            return [0.0 + w0 * v0 + w1 * v1 + w3 * v3 + w2 * v2]
+        result = []
+        for p in range(nparam):
+            v0, v1, v2, v3 = nodevalues[p::nparam]
+            result.append(0.0 + w0 * v0 + w1 * v1 + w3 * v3 + w2 * v2)
+        return result
+
+    @staticmethod
+    def _weightedSum9(fx, fy, nodevalues, nparam):
+        fx0, fx1, fx2 = fx
+        fy0, fy1, fy2 = fy
+        w0 = fx0 * fy0
+        w1 = fx0 * fy1
+        w2 = fx0 * fy2
+        w3 = fx1 * fy0
+        w4 = fx1 * fy1
+        w5 = fx1 * fy2
+        w6 = fx2 * fy0
+        w7 = fx2 * fy1
+        w8 = fx2 * fy2
+        if nparam == 1:
+            v0, v1, v2, v3, v4, v5, v6, v7, v8 = nodevalues
+            return [
+                0.0
+                + (
+                    (
+                        ((w0 * v0 + w1 * v1) + (w2 * v2 + w3 * v3))
+                        + ((w4 * v4 + w5 * v5) + (w6 * v6 + w7 * v7))
+                    )
+                    + w8 * v8
+                )
+            ]
+        result = []
+        for p in range(nparam):
+            v0, v1, v2, v3, v4, v5, v6, v7, v8 = nodevalues[p::nparam]
+            result.append(
+                0.0
+                + w0 * v0
+                + w1 * v1
+                + w2 * v2
+                + w3 * v3
+                + w4 * v4
+                + w5 * v5
+                + w6 * v6
+                + w7 * v7
+                + w8 * v8
+            )
+        return result
+
+    @staticmethod
+    def _weightedSum16(fx, fy, nodevalues, nparam):
+        fx0, fx1, fx2, fx3 = fx
+        fy0, fy1, fy2, fy3 = fy
+        w0 = fx0 * fy0
+        w1 = fx0 * fy1
+        w2 = fx0 * fy2
+        w3 = fx0 * fy3
+        w4 = fx1 * fy0
+        w5 = fx1 * fy1
+        w6 = fx1 * fy2
+        w7 = fx1 * fy3
+        w8 = fx2 * fy0
+        w9 = fx2 * fy1
+        w10 = fx2 * fy2
+        w11 = fx2 * fy3
+        w12 = fx3 * fy0
+        w13 = fx3 * fy1
+        w14 = fx3 * fy2
+        w15 = fx3 * fy3
+        if nparam == 1:
+            v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15 = (
+                nodevalues
+            )
+            return [
+                0.0
+                + (
+                    (
+                        ((w0 * v0 + w8 * v8) + (w1 * v1 + w9 * v9))
+                        + ((w2 * v2 + w10 * v10) + (w3 * v3 + w11 * v11))
+                    )
+                    + (
+                        ((w4 * v4 + w12 * v12) + (w5 * v5 + w13 * v13))
+                        + ((w6 * v6 + w14 * v14) + (w7 * v7 + w15 * v15))
+                    )
+                )
+            ]
+        result = []
+        for p in range(nparam):
+            v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15 = (
+                nodevalues[p::nparam]
+            )
+            result.append(
+                0.0
+                + w0 * v0
+                + w1 * v1
+                + w2 * v2
+                + w3 * v3
+                + w4 * v4
+                + w5 * v5
+                + w6 * v6
+                + w7 * v7
+                + w8 * v8
+                + w9 * v9
+                + w10 * v10
+                + w11 * v11
+                + w12 * v12
+                + w13 * v13
+                + w14 * v14
+                + w15 * v15
+            )
+        return result
+
+    @staticmethod
+    def _debugPosition(grid, ci, cj, cx, cy):
+        grid._group._ggxf._logger.debug(f"{grid._name}: i,j={ci+cx:.02f},{cj+cy:.02f}")
+
     @staticmethod
     def bilinear(grid: Grid, xy):
         # Evaluate the value of parameters at a point from grid nodes using bilinear interpolation.
-        # - determine which cell the point is in and the position cellxy of the point in the cell
+        # - determine which cell the point is in and the position cx,cy of the point in the cell
         # (x,y coordinates ranging from 0 to 1)
-        cellij, cellxy = grid.cellij(xy)
+        ci, cj, cx, cy = grid.cellPosition(xy)
         if grid._debug:
-            grid._group._ggxf._logger.debug(
-                f"{grid._name}: i,j={cellij[0]+cellxy[0]:.02f},{cellij[1]+cellxy[1]:.02f}"
+            GridInterpolator._debugPosition(grid, ci, cj, cx, cy)
+        nodevalues = grid.stencilValues(ci, cj, INTERPOLATION_METHOD_BILINEAR)
+        if nodevalues is None:
+            return GridInterpolator._maskedValue(
+                grid, GridInterpolator.bilinearArray, xy
             )
-        data = grid.data()
-        crnr = np.array([[0, 0], [0, 1], [1, 1], [1, 0]])
-        # Determine the interpolation factors to multiply each node values by
-        nodef = (
-            (crnr[:, 0] * cellxy[0] + (1 - crnr[:, 0]) * (1 - cellxy[0]))
-            * (crnr[:, 1] * cellxy[1] + (1 - crnr[:, 1]) * (1 - cellxy[1]))
-        ).reshape((4, 1))
-        # Get the node indices of the corner cells
-        nodes = crnr + cellij
-        # Multiply the values at the nodes by the interpolation factor
-        nodeprm = data[nodes[:, 0], nodes[:, 1]]
-        # Sum the scaled values to get the value at the evaluation point.
-        val = (nodef * nodeprm).sum(axis=0)
-        return val
+        value = GridInterpolator._weightedSum4(
+            (1.0 - cx, cx), (1.0 - cy, cy), nodevalues, grid._nparam
+        )
+        return value if grid._scale is None else grid.unpackValues(value)
 
     @staticmethod
     def biquadratic(grid: Grid, xy):
         # Evaluate the value of parameters at a point from grid nodes using biquadratic interpolation.
-        # - determine which cell the point is in and the position cellxy of the point in the cell
-        # (x,y coordinates ranging from 0 to 1)
-        cellij, cellxy = grid.cellij(xy)
+        # - determine which cell the point is in and the position cx,cy of the point in the cell
+        # (x,y coordinates ranging from 0 to 1), then select the 3x3 nodes centred on
+        # the node nearest to the point.
+        ci, cj, cx, cy = grid.cellPosition(xy)
+        if grid._debug:
+            GridInterpolator._debugPosition(grid, ci, cj, cx, cy)
+        imax = grid._imax
+        jmax = grid._jmax
+        if imax < 2 or jmax < 2:
+            raise Error(
+                f"Grid {grid.name()} not big enough for biquadratic interpolation"
+            )
+        if (cx > 0.5 and ci < imax - 1) or ci == 0:
+            cx -= 1.0
+            ci += 1
+        if (cy > 0.5 and cj < jmax - 1) or cj == 0:
+            cy -= 1.0
+            cj += 1
+        nodevalues = grid.stencilValues(
+            ci - 1, cj - 1, INTERPOLATION_METHOD_BIQUADRATIC
+        )
+        if nodevalues is None:
+            return GridInterpolator._maskedValue(
+                grid, GridInterpolator.biquadraticArray, xy
+            )
+        value = GridInterpolator._weightedSum9(
+            GridInterpolator._quadraticFactors(cx),
+            GridInterpolator._quadraticFactors(cy),
+            nodevalues,
+            grid._nparam,
+        )
+        return value if grid._scale is None else grid.unpackValues(value)
+
+    @staticmethod
+    def _quadraticFactors(x):
+        # Weights of nodes at offsets -1, 0, 1 for position x relative to node 0
+        x2 = x * x
+        return (
+            x2 * 0.5 + x * -0.5 + 0.0,
+            x2 * -1.0 + x * 0.0 + 1.0,
+            x2 * 0.5 + x * 0.5 + 0.0,
+        )
+
+    @staticmethod
+    def bicubic(grid: Grid, xy):
+        # Evaluate the value of parameters at a point from grid nodes using bicubic interpolation.
+        # - determine which cell the point is in and the position cx,cy of the point in the cell
+        # (x,y coordinates ranging from 0 to 1), then select the 4x4 nodes around the
+        # cell, shifted away from the edges of the grid.
+        ci, cj, cx, cy = grid.cellPosition(xy)
         if grid._debug:
-            grid._group._ggxf._logger.debug(
-                f"{grid._name}: i,j={cellij[0]+cellxy[0]:.02f},{cellij[1]+cellxy[1]:.02f}"
+            GridInterpolator._debugPosition(grid, ci, cj, cx, cy)
+        imax = grid._imax
+        jmax = grid._jmax
+        if imax < 3 or jmax < 3:
+            raise Error(f"Grid {grid.name()} not big enough for bicubic interpolation")
+        if ci == 0:
+            cx -= 1.0
+            ci += 1
+        elif ci >= imax - 1:
+            cx += 1.0
+            ci -= 1
+        if cj == 0:
+            cy -= 1.0
+            cj += 1
+        elif cj >= jmax - 1:
+            cy += 1.0
+            cj -= 1
+        nodevalues = grid.stencilValues(ci - 1, cj - 1, INTERPOLATION_METHOD_BICUBIC)
+        if nodevalues is None:
+            return GridInterpolator._maskedValue(
+                grid, GridInterpolator.bicubicArray, xy
             )
+        value = GridInterpolator._weightedSum16(
+            GridInterpolator._cubicFactors(cx),
+            GridInterpolator._cubicFactors(cy),
+            nodevalues,
+            grid._nparam,
+        )
+        return value if grid._scale is None else grid.unpackValues(value)
+
+    @staticmethod
+    def _cubicFactors(x):
+        # Weights of nodes at offsets -1, 0, 1, 2 for position x relative to node 0
+        x2 = x * x
+        x3 = x2 * x
+        return (
+            x3 * (-1.0 / 6.0) + x2 * 0.5 + x * (-1.0 / 3.0) + 0.0,
+            x3 * 0.5 + x2 * -1.0 + x * -0.5 + 1.0,
+            x3 * -0.5 + x2 * 0.5 + x * 1.0 + 0.0,
+            x3 * (1.0 / 6.0) + x2 * 0.0 + x * (-1.0 / 6.0) + 0.0,
+        )
+
+    # Vectorised versions of the interpolation methods.  These take an (N,2) array
+    # of points all of which are in the grid and return an (N,nparam) array of values.
+    # The node factors for each point are calculated as for the single point methods
+    # and applied to an (N,nnode,nparam) array of node values.
+    #
+    # For packed grids the methods interpolate the stored integer values and
+    # unpack the result.  As the node weights sum to 1 this is equivalent to
+    # interpolating the unpacked values, within rounding error.
+
+    @staticmethod
+    def bilinearArray(grid: Grid, xy):
+        cellij, cellxy = grid.cellsij(xy)
+        data = grid.storedData()
+        crnr = np.array([[0, 0], [0, 1], [1, 1], [1, 0]])
+        nodef = (
+            (crnr[:, 0] * cellxy[:, :1] + (1 - crnr[:, 0]) * (1 - cellxy[:, :1]))
+            * (crnr[:, 1] * cellxy[:, 1:] + (1 - crnr[:, 1]) * (1 - cellxy[:, 1:]))
+        ).reshape((-1, 4, 1))
+        nodes = crnr + cellij.reshape((-1, 1, 2))
+        nodeprm = data[nodes[:, :, 0], nodes[:, :, 1]]
+        return grid.unpack((nodef * nodeprm).sum(axis=1))
+
+    @staticmethod
+    def biquadraticArray(grid: Grid, xy):
+        cellij, cellxy = grid.cellsij(xy)
         gridsize = grid.size()
-        data = grid.data()
+        data = grid.storedData()
         if gridsize[0] < 3 or gridsize[1] < 3:
             raise Error(
                 f"Grid {grid.name()} not big enough for biquadratic interpolation"
             )
-        if (cellxy[0] > 0.5 and cellij[0] < gridsize[0] - 2) or cellij[0] == 0:
-            cellxy[0] -= 1.0
-            cellij[0] += 1
-        if (cellxy[1] > 0.5 and cellij[1] < gridsize[1] - 2) or cellij[1] == 0:
-            cellxy[1] -= 1.0
-            cellij[1] += 1
-        cellxy = cellxy.reshape((2, 1))
+        for axis in (0, 1):
+            shift = (
+                (cellxy[:, axis] > 0.5) & (cellij[:, axis] < gridsize[axis] - 2)
+            ) | (cellij[:, axis] == 0)
+            cellxy[shift, axis] -= 1.0
+            cellij[shift, axis] += 1
+        cellxy = cellxy.reshape((-1, 2, 1))
         cellf = (
-            (cellxy * cellxy).dot([[0.5, -1.0, 0.5]])
-            + cellxy.dot([[-0.5, 0, 0.5]])
+            (cellxy * cellxy) * [0.5, -1.0, 0.5]
+            + cellxy * [-0.5, 0, 0.5]
             + [0.0, 1.0, 0.0]
         )
-        nodef = cellf[:1, :].T.dot(cellf[1:, :]).reshape((9, 1))
-        crnr = np.array(
-            [
-                [-1, -1],
-                [-1, 0],
-                [-1, 1],
-                [0, -1],
-                [0, 0],
-                [0, 1],
-                [1, -1],
-                [1, 0],
-                [1, 1],
-            ]
-        )
-        nodes = crnr + cellij
-        # Multiply the values at the nodes by the interpolation factor
-        nodeprm = data[nodes[:, 0], nodes[:, 1]]
-        # Sum the scaled values to get the value at the evaluation point.
-        val = (nodef * nodeprm).sum(axis=0)
-        return val
+        nodef = (cellf[:, 0, :, None] * cellf[:, 1, None, :]).reshape((-1, 9, 1))
+        offset = np.array([-1, 0, 1])
+        nodei = (cellij[:, :1] + offset)[:, :, None]
+        nodej = (cellij[:, 1:] + offset)[:, None, :]
+        nodeprm = data[nodei, nodej].reshape((nodef.shape[0], 9, -1))
+        return grid.unpack((nodef * nodeprm).sum(axis=1))
 
     @staticmethod
-    def bicubic(grid: Grid, xy):
-        # Evaluate the value of parameters at a point from grid nodes using biquadratic interpolation.
-        # - determine which cell the point is in and the position cellxy of the point in the cell
-        # (x,y coordinates ranging from 0 to 1)
-        cellij, cellxy = grid.cellij(xy)
-        if grid._debug:
-            grid._group._ggxf._logger.debug(
-                f"{grid._name}: i,j={cellij[0]+cellxy[0]:.02f},{cellij[1]+cellxy[1]:.02f}"
-            )
+    def bicubicArray(grid: Grid, xy):
+        cellij, cellxy = grid.cellsij(xy)
         gridsize = grid.size()
-        data = grid.data()
+        data = grid.storedData()
         if gridsize[0] < 4 or gridsize[1] < 4:
             raise Error(f"Grid {grid.name()} not big enough for bicubic interpolation")
-        if cellij[0] == 0:
-            cellxy[0] -= 1.0
-            cellij[0] += 1
-        elif cellij[0] >= gridsize[0] - 2:
-            cellxy[0] += 1.0
-            cellij[0] -= 1
-        if cellij[1] == 0:
-            cellxy[1] -= 1.0
-            cellij[1] += 1
-        elif cellij[1] >= gridsize[1] - 2:
-            cellxy[1] += 1.0
-            cellij[1] -= 1
-        cellxy = cellxy.reshape((2, 1))
+        for axis in (0, 1):
+            low = cellij[:, axis] == 0
+            high = ~low & (cellij[:, axis] >= gridsize[axis] - 2)
+            cellxy[low, axis] -= 1.0
+            cellij[low, axis] += 1
+            cellxy[high, axis] += 1.0
+            cellij[high, axis] -= 1
+        cellxy = cellxy.reshape((-1, 2, 1))
         cellf = (
-            (cellxy * cellxy * cellxy).dot([[-1.0 / 6.0, 0.5, -0.5, 1.0 / 6.0]])
-            + (cellxy * cellxy).dot([[0.5, -1.0, 0.5, 0.0]])
-            + cellxy.dot([[-1.0 / 3.0, -0.5, 1.0, -1.0 / 6.0]])
+            (cellxy * cellxy * cellxy) * [-1.0 / 6.0, 0.5, -0.5, 1.0 / 6.0]
+            + (cellxy * cellxy) * [0.5, -1.0, 0.5, 0.0]
+            + cellxy * [-1.0 / 3.0, -0.5, 1.0, -1.0 / 6.0]
             + [0.0, 1.0, 0.0, 0.0]
         )
-        nodef = cellf[:1, :].T.dot(cellf[1:, :]).reshape(16, 1)
-        crnr = np.array(
-            [
-                [-1, -1],
-                [-1, 0],
-                [-1, 1],
-                [-1, 2],
-                [0, -1],
-                [0, 0],
-                [0, 1],
-                [0, 2],
-                [1, -1],
-                [1, 0],
-                [1, 1],
-                [1, 2],
-                [2, -1],
-                [2, 0],
-                [2, 1],
-                [2, 2],
-            ]
-        )
-        nodes = crnr + cellij
-        # Multiply the values at the nodes by the interpolation factor
-        nodeprm = data[nodes[:, 0], nodes[:, 1]]
-        # Sum the scaled values to get the value at the evaluation point.
-        val = (nodef * nodeprm).sum(axis=0)
-        return val
+        nodef = (cellf[:, 0, :, None] * cellf[:, 1, None, :]).reshape((-1, 16, 1))
+        offset = np.array([-1, 0, 1, 2])
+        nodei = (cellij[:, :1] + offset)[:, :, None]
+        nodej = (cellij[:, 1:] + offset)[:, None, :]
+        nodeprm = data[nodei, nodej].reshape((nodef.shape[0], 16, -1))
+        return grid.unpack((nodef * nodeprm).sum(axis=1))
 
     Methods = {
         INTERPOLATION_METHOD_BILINEAR: bilinear.__func__,
@@ -728,6 +1719,22 @@ class GridInterpolator:
         INTERPOLATION_METHOD_BICUBIC: bicubic.__func__,
     }
 
+    ArrayMethods = {
+        INTERPOLATION_METHOD_BILINEAR: bilinearArray.__func__,
+        INTERPOLATION_METHOD_BIQUADRATIC: biquadraticArray.__func__,
+        INTERPOLATION_METHOD_BICUBIC: bicubicArray.__func__,
+    }
+
+    # Number of nodes before the first node and after the last node of the cells
+    # containing a set of points used to interpolate them.  A point on the last
+    # node may be in the cell after it, which bicubic interpolation shifts back
+    # from the edge of the grid, so needs two nodes after it.
+    StencilMargins = {
+        INTERPOLATION_METHOD_BILINEAR: (0, 0),
+        INTERPOLATION_METHOD_BIQUADRATIC: (1, 1),
+        INTERPOLATION_METHOD_BICUBIC: (1, 2),
+    }
+
     def getMethod(methodName):
         if methodName not in GridInterpolator.Methods:
             raise Error(
@@ -735,6 +1742,13 @@ class GridInterpolator:
             )
         return GridInterpolator.Methods[methodName]
 
+    def getArrayMethod(methodName):
+        if methodName not in GridInterpolator.ArrayMethods:
+            raise Error(
+                f"{GROUP_ATTR_INTERPOLATION_METHOD} {methodName} is not supported"
+            )
+        return GridInterpolator.ArrayMethods[methodName]
+
 
 class Parameter:
     def __init__(self, metadata: dict):
@@ -56,7 +56,7 @@ Datasource attributes:
 """
 
 
-def LoadGrid(group, datasource, logger):
+def LoadGrid(group, datasource, logger, griddir=None):
     for attr in (
         CSV_FILENAME_ATTR,
         CSV_INTERPOLATION_COORD_ATTR,
@@ -66,6 +66,8 @@ def LoadGrid(group, datasource, logger):
             raise CsvLoaderError(f"CSV data source missing {attr} attribute")
 
     filename = datasource.get(CSV_FILENAME_ATTR)
+    if griddir is not None:
+        filename = os.path.join(griddir, filename)
     if not os.path.isfile(filename):
         raise CsvLoaderError(f"CSV file {filename} not found")
 
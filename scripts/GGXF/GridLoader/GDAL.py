@@ -1,19 +1,23 @@
 #!/usr/bin/python3
 
 import logging
+import os.path
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 try:
-    from osgeo import gdal
+    from osgeo import gdal, gdal_array
 except ImportError:
     gdal=None
+    gdal_array=None
 
 from ..Constants import *
 
 GDAL_SOURCE_LIST_ATTR = "gdalSourceList"
 GDAL_SOURCE_ATTR = "gdalSource"
 GDAL_BANDS_ATTR = "selectBands"
+GDAL_WINDOW_ATTR = "sourceWindow"
 
 HELP = f"""
 GDAL grid loader for YAML GGXF files.
@@ -37,17 +41,30 @@ Datasource attributes:
     (Optional) Array defining the 0 based integer indices of bands
     to select from the data source.  Default is all bands.
 
+{GDAL_WINDOW_ATTR}: [xoffset, yoffset, xsize, ysize]
+    (Optional) Window of the raster to load.  xoffset and yoffset are the
+    0 based column and row of the first pixel, xsize and ysize are the
+    number of columns and rows.  Default is the whole raster.
+
+{GDAL_BANDS_ATTR} and {GDAL_WINDOW_ATTR} may be defined for each source in
+{GDAL_SOURCE_LIST_ATTR}, otherwise the values defined for the data source
+are used.
+
 """
 
 # Arbitrary tolerance
 GDAL_AFFINE_TOLERANCE = 1.0e-10
 
+# Approximate number of raster cells read from a band at a time.  Reads are
+# aligned with the raster blocks.
+GDAL_READ_BLOCK_NODES = 1048576
+
 
 class GdalLoaderError(RuntimeError):
     pass
 
 
-def LoadGrid(group, datasource, logger):
+def LoadGrid(group, datasource, logger, griddir=None):
     if gdal is None:
         raise GdalLoaderError("Python gdal module is not available: try \"pip install gdal\"")
     if logger is None:
@@ -57,22 +74,32 @@ def LoadGrid(group, datasource, logger):
         logger.debug("Loading grid from list of GDAL data sources")
     else:
         sources = [datasource]
+    if not sources:
+        raise GdalLoaderError("No GDAL grid source specified")
 
     gridaffine = None
     gridsize = None
-    griddata = []
+    readers = []
+    nparam = 0
+    dtypes = []
 
     for source in sources:
-        gdalsource = datasource.get(GDAL_SOURCE_ATTR)
+        gdalsource = source.get(GDAL_SOURCE_ATTR)
         if gdalsource is None:
             raise GdalLoaderError(f"{GDAL_SOURCE_ATTR} attribute is missing")
+        # Source definitions which are not files relative to griddir are used as is
+        if griddir is not None and os.path.exists(os.path.join(griddir, gdalsource)):
+            gdalsource = os.path.join(griddir, gdalsource)
         logger.debug(f"Loading GDAL data from {gdalsource}")
         dataset = gdal.Open(gdalsource)
 
         if not dataset:
             raise GdalLoaderError(f"Failed to load GDAL data source {gdalsource}")
 
-        size, affine = GdalDatasetMapping(dataset)
+        window = _sourceWindow(
+            dataset, source.get(GDAL_WINDOW_ATTR, datasource.get(GDAL_WINDOW_ATTR))
+        )
+        size, affine = GdalDatasetMapping(dataset, window)
 
         if gridsize is None:
             gridsize = size
@@ -84,49 +111,109 @@ def LoadGrid(group, datasource, logger):
         if gridaffine is None:
             gridaffine = affine
         else:
-            error = np.max(np.abs(np.array(affine), np.array(gridaffine)))
+            error = np.max(np.abs(np.array(affine) - np.array(gridaffine)))
             if error > GDAL_AFFINE_TOLERANCE:
                 raise GdalLoaderError(
                     f"Listed grid data sources have different affine coefficents"
                 )
 
-        # NOTE: GDAL ReadAsArray returns elements in order p,j,i relative t multipliers
-        #  1,i,j used GetGeoTransform.  T.
+        bands = _sourceBands(
+            dataset, source.get(GDAL_BANDS_ATTR, datasource.get(GDAL_BANDS_ATTR))
+        )
+        for band in bands:
+            datatype = dataset.GetRasterBand(band + 1).DataType
+            dtypes.append(gdal_array.GDALTypeCodeToNumericTypeCode(datatype))
+        readers.append((gdalsource, dataset, window, bands, nparam))
+        nparam += len(bands)
 
-        data = dataset.ReadAsArray()
-        if len(data.shape) == 2:
-            shape = (1, *data.shape)
-            data = data.reshape(shape)
+    # NOTE: GDAL raster bands are arrays of rows (j) of columns (i).  The bands are
+    # read directly into the GGXF (i,j,param) ordered array.
 
-        # Handle potential reordering of parameters (?)
-        if GDAL_BANDS_ATTR in datasource:
-            try:
-                bands = [int(b) for b in datasource[GDAL_BANDS_ATTR]]
-                data = data[:, :, bands]
-            except Exception as ex:
-                raise GdalLoaderError(f"Error using {GDAL_BANDS_ATTR}: {ex}")
-        griddata.append(data)
+    data = np.empty((gridsize[0], gridsize[1], nparam), dtype=np.result_type(*dtypes))
 
-    if len(griddata) == 0:
-        raise GdalLoaderError("No GDAL grid source specified")
-    elif len(griddata) == 1:
-        data = np.vstack(griddata)
-    # Convert from GDAL ordering to GGXF ordering
-    data = np.swapaxes(data, 0, 2)
+    def readSource(reader):
+        gdalsource, dataset, window, bands, iparam = reader
+        _readBands(dataset, window, bands, data, iparam)
+        logger.debug(f"GdalLoader: Loaded {gdalsource}")
+
+    if len(readers) > 1:
+        with ThreadPoolExecutor(max_workers=len(readers)) as pool:
+            list(pool.map(readSource, readers))
+    else:
+        readSource(readers[0])
 
-    logger.debug(f"GdalLoader: Loaded {gdalsource}")
     logger.debug(f"GdalLoader: size {gridsize}")
     logger.debug(f"GdalLoader: affine coeffs {gridaffine}")
     logger.debug(f"GdalLoader: Grid loaded with shape {data.shape}")
     return (data, gridsize, gridaffine)
 
 
-def GdalDatasetMapping(dataset):
+def _sourceWindow(dataset, window):
+    # Returns the window (xoffset, yoffset, xsize, ysize) of the raster to load
+    nx = int(dataset.RasterXSize)
+    ny = int(dataset.RasterYSize)
+    if window is None:
+        return (0, 0, nx, ny)
+    try:
+        xoff, yoff, xsize, ysize = (int(v) for v in window)
+    except Exception:
+        raise GdalLoaderError(f"{GDAL_WINDOW_ATTR} must be a list of four integers")
+    if xoff < 0 or yoff < 0 or xsize < 1 or ysize < 1 or xoff + xsize > nx or yoff + ysize > ny:
+        raise GdalLoaderError(
+            f"{GDAL_WINDOW_ATTR} {window} is not within the {nx}x{ny} raster"
+        )
+    return (xoff, yoff, xsize, ysize)
+
+
+def _sourceBands(dataset, bands):
+    # Returns the 0 based indices of the bands to load
+    nband = int(dataset.RasterCount)
+    if bands is None:
+        return list(range(nband))
+    try:
+        bands = [int(b) for b in bands]
+    except Exception as ex:
+        raise GdalLoaderError(f"Error using {GDAL_BANDS_ATTR}: {ex}")
+    for band in bands:
+        if band < 0 or band >= nband:
+            raise GdalLoaderError(
+                f"Error using {GDAL_BANDS_ATTR}: band {band} is not in the range 0 to {nband-1}"
+            )
+    return bands
+
+
+def _readBands(dataset, window, bands, data, iparam):
+    # Read the bands of the raster window into data[:, :, iparam:].  Each band is
+    # read in strips of whole raster blocks.  GDAL writes each strip directly into
+    # the transposed (row, column) view of data, so no intermediate array is used.
+    xoff, yoff, xsize, ysize = window
+    for band in bands:
+        rband = dataset.GetRasterBand(band + 1)
+        blockrows = max(1, int(rband.GetBlockSize()[1]))
+        striprows = max(1, GDAL_READ_BLOCK_NODES // (xsize * blockrows)) * blockrows
+        row = yoff
+        while row < yoff + ysize:
+            # End the strip on a block boundary
+            endrow = min(yoff + ysize, (row // striprows + 1) * striprows)
+            strip = data[:, row - yoff : endrow - yoff, iparam].T
+            if rband.ReadAsArray(xoff, row, xsize, endrow - row, buf_obj=strip) is None:
+                raise GdalLoaderError(f"Failed to read band {band} rows {row} to {endrow-1}")
+            row = endrow
+        iparam += 1
+
+
+def GdalDatasetMapping(dataset, window=None):
     # Get grid size
     size = (int(dataset.RasterXSize), int(dataset.RasterYSize))
 
     # Get transformation affine coefficients
     affine = [float(c) for c in dataset.GetGeoTransform()]
+    # Offset the origin to the window (xoffset, yoffset, xsize, ysize)
+    if window is not None:
+        xoff, yoff, xsize, ysize = window
+        size = (int(xsize), int(ysize))
+        affine[0] += xoff * affine[1] + yoff * affine[2]
+        affine[3] += xoff * affine[4] + yoff * affine[5]
     # Convert raster to point georeferencing
     affine[0] += (affine[1] + affine[2]) / 2.0
     affine[3] += (affine[4] + affine[5]) / 2.0
@@ -4,8 +4,10 @@
 # (ie (rows,cols, params))
 
 import csv
+import itertools
 import logging
 import os.path
+import warnings
 
 import numpy as np
 
@@ -29,6 +31,9 @@ GGXF_CSV_SEPARATORS_TEXT = (
 
 GGXF_CSV_GRID_TOLERANCE_FACTOR = 0.00001
 
+# Number of lines of a CSV file parsed at a time
+GGXF_CSV_CHUNK_LINES = 65536
+
 HELP = f"""
 ggxf-csv grid loader for GGXF YAML format.  Assumes a comma separated ggxf-csv file
 with a header line containing the field names. 
@@ -69,7 +74,7 @@ class SpaceDelimitedFile:
         return data.split()
 
 
-def LoadGrid(group, datasource, logger):
+def LoadGrid(group, datasource, logger, griddir=None):
 
     for attr in (GGXF_CSV_FILENAME_ATTR,):
         if attr not in datasource:
@@ -83,6 +88,8 @@ def LoadGrid(group, datasource, logger):
 
     delimiter = GGXF_CSV_SEPARATORS[separator]
     filename = datasource.get(GGXF_CSV_FILENAME_ATTR)
+    if griddir is not None:
+        filename = os.path.join(griddir, filename)
 
     xyfields = group.ggxf().nodeCoordinateParameters()
     datafields = group.parameterNames()
@@ -96,6 +103,62 @@ def LoadGrid(group, datasource, logger):
     )
 
 
+def _countLines(filename):
+    # Number of lines in a file, used to preallocate the grid data
+    nlines = 0
+    lastchar = b"\n"
+    with open(filename, "rb") as fh:
+        while block := fh.read(1024 * 1024):
+            nlines += block.count(b"\n")
+            lastchar = block[-1:]
+    if lastchar != b"\n":
+        nlines += 1
+    return nlines
+
+
+def _parseCsvLines(lines, fldids, delimiter, nrow0, filename):
+    # Parse a block of lines of a CSV file to an array of the fields fldids.
+    # numpy.loadtxt is used to parse the block.  If that fails (or skips blank
+    # lines) the lines are parsed one row at a time to identify the error.
+    # nrow0 is the number of data rows before the block.
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            data = np.loadtxt(
+                lines,
+                dtype=np.float64,
+                delimiter=None if delimiter == " " else delimiter,
+                quotechar=None if delimiter == " " else '"',
+                comments=None,
+                usecols=fldids,
+                ndmin=2,
+            )
+        if data.shape[0] == len(lines):
+            return data
+    except (ValueError, IndexError):
+        pass
+
+    if delimiter == " ":
+        rows = SpaceDelimitedFile(iter(lines))
+    else:
+        rows = csv.reader(lines, delimiter=delimiter)
+    data = []
+    ni = nrow0
+    for row in rows:
+        ni += 1
+        try:
+            data.append([float(row[fld]) for fld in fldids])
+        except IndexError:
+            raise CsvLoaderError(
+                f"Not enough columns at line {ni} of CSV file {filename}"
+            )
+        except ValueError:
+            raise CsvLoaderError(
+                f"Non numeric value at line {ni} of CSV file {filename}"
+            )
+    return np.array(data).reshape((len(data), len(fldids)))
+
+
 def LoadCsvGrid(
     filename,
     datafields,
@@ -145,26 +208,20 @@ def LoadCsvGrid(
                     )
                 fldids.append(fields.index(field))
 
-            data = []
-            ni = 0
-            for row in csvr:
-                ni += 1
-                try:
-                    data.append([float(row[fld]) for fld in fldids])
-                except IndexError:
-                    raise CsvLoaderError(
-                        f"Not enough columns at line {ni} of CSV file {filename}"
-                    )
-                except ValueError:
-                    raise CsvLoaderError(
-                        f"Non numeric value at line {ni} of CSV file {filename}"
-                    )
+            # Parse the remaining lines in blocks into a preallocated array.  The
+            # number of lines in the file is an upper limit on the number of rows.
+            data = np.empty((_countLines(filename), len(fldids)))
+            nrow = 0
+            while lines := list(itertools.islice(csvh, GGXF_CSV_CHUNK_LINES)):
+                block = _parseCsvLines(lines, fldids, delimiter, nrow, filename)
+                data[nrow : nrow + block.shape[0]] = block
+                nrow += block.shape[0]
     except CsvLoaderError:
         raise
     except:
         raise CsvLoaderError(f"Cannot open CSV grid file {filename}")
 
-    data = np.array(data)
+    data = data[:nrow]
 
     # If we don't have xyfields then all we can do is return the data
 
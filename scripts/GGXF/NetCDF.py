@@ -10,6 +10,7 @@
 import logging
 import os.path
 import subprocess
+import time
 
 import netCDF4
 import numpy as np
@@ -32,6 +33,44 @@ NETCDF_DEFAULT_READ_DTYPE = NETCDF_DTYPE_FLOAT64
 
 NETCDF_OPTION_WRITE_CDL = "write-cdl"
 NETCDF_OPTION_PACK_PRECISION = "packing-precision"
+NETCDF_OPTION_LAZY_LOAD = "lazy-load"
+NETCDF_OPTION_GRID_CACHE_MB = "grid-cache-mb"
+NETCDF_OPTION_PACKED_GRIDS = "packed-grids"
+NETCDF_OPTION_BOUNDING_BOX = "bounding-box"
+NETCDF_OPTION_CHUNK_SIZE = "chunk-size"
+NETCDF_OPTION_COMPRESSION = "compression"
+NETCDF_OPTION_COMPRESSION_LEVEL = "compression-level"
+NETCDF_OPTION_SHUFFLE = "shuffle"
+NETCDF_OPTION_SIGNIFICANT_DIGITS = "significant-digits"
+NETCDF_OPTION_QUANTIZE_MODE = "quantize-mode"
+
+NETCDF_CHUNK_AUTO = "auto"
+NETCDF_CHUNK_CONTIGUOUS = "contiguous"
+# Maximum number of nodes along each grid axis in an automatically sized chunk
+# of a compressed grid.  Chunks hold all parameters of a square block of nodes so
+# that reading a small area of a grid only decompresses the chunks around it.
+NETCDF_AUTO_CHUNK_NODES = 256
+
+NETCDF_COMPRESSION_NONE = "none"
+NETCDF_COMPRESSION_TYPES = (
+    NETCDF_COMPRESSION_NONE,
+    "zlib",
+    "zstd",
+    "bzip2",
+    "blosc_lz",
+    "blosc_lz4",
+    "blosc_lz4hc",
+    "blosc_zlib",
+    "blosc_zstd",
+)
+NETCDF_DEFAULT_COMPRESSION_LEVEL = 4
+NETCDF_QUANTIZE_MODES = ("BitGroom", "GranularBitRound", "BitRound")
+
+NETCDF_DEFAULT_GRID_CACHE_MB = 1024
+
+# Tolerance in grid node units used when selecting the nodes of a grid within
+# a bounding box, to allow for rounding in the affine transformation.
+NETCDF_WINDOW_NODE_TOLERANCE = 1.0e-6
 
 NETCDF_CDL_OPTION_FULL = "full"
 NETCDF_CDL_OPTION_HEADER = "header"
@@ -54,12 +93,28 @@ NETCDF_ALL_OPTIONS = {
     NETCDF_OPTION_GRID_DTYPE,
     NETCDF_OPTION_PACK_PRECISION,
     NETCDF_OPTION_WRITE_CDL,
+    NETCDF_OPTION_LAZY_LOAD,
+    NETCDF_OPTION_GRID_CACHE_MB,
+    NETCDF_OPTION_PACKED_GRIDS,
+    NETCDF_OPTION_BOUNDING_BOX,
+    NETCDF_OPTION_CHUNK_SIZE,
+    NETCDF_OPTION_COMPRESSION,
+    NETCDF_OPTION_COMPRESSION_LEVEL,
+    NETCDF_OPTION_SHUFFLE,
+    NETCDF_OPTION_SIGNIFICANT_DIGITS,
+    NETCDF_OPTION_QUANTIZE_MODE,
 }
 
 NETCDF_READ_OPTIONS = f"""
   "{NETCDF_OPTION_GRID_DTYPE}" Specifies the data type used for the grid ({", ".join(NETCDF_VALID_DTYPE_MAP.keys())})
+  "{NETCDF_OPTION_LAZY_LOAD}" Only load grid data when it is first used (true or false, default false)
+  "{NETCDF_OPTION_GRID_CACHE_MB}" Memory limit in MB for grid data loaded by {NETCDF_OPTION_LAZY_LOAD} (default {NETCDF_DEFAULT_GRID_CACHE_MB})
+  "{NETCDF_OPTION_PACKED_GRIDS}" Keep integer packed grids as integers in memory and unpack interpolated values (true or false, default false)
+  "{NETCDF_OPTION_BOUNDING_BOX}" Only load the part of each grid within a bounding box "xmin,ymin,xmax,ymax" in interpolation CRS coordinates
 
   When reading a NetCDF file the default floating point is {NETCDF_DEFAULT_READ_DTYPE} to avoid rounding issues.
+  With {NETCDF_OPTION_BOUNDING_BOX} grids are trimmed to the nodes covering the box and grids outside the box are
+  not loaded.  x and y are the first and second interpolation CRS coordinates (eg latitude and longitude).
 """
 
 NETCDF_WRITE_OPTIONS = f"""
@@ -70,6 +125,18 @@ NETCDF_WRITE_OPTIONS = f"""
   If {NETCDF_OPTION_PACK_PRECISION} is specified then {NETCDF_OPTION_GRID_DTYPE} is ignored and integer packing
   is attempted.  If an integer data type is specified then the data will be scaled to fill the range available
   with the integer type.  If neither is specified {NETCDF_DEFAULT_WRITE_DTYPE} is used.
+
+  "{NETCDF_OPTION_CHUNK_SIZE}" Grid chunk size as "ni,nj" nodes, "{NETCDF_CHUNK_AUTO}", or "{NETCDF_CHUNK_CONTIGUOUS}" (default {NETCDF_CHUNK_AUTO})
+  "{NETCDF_OPTION_COMPRESSION}" Compression of grid data ({", ".join(NETCDF_COMPRESSION_TYPES)}, default {NETCDF_COMPRESSION_NONE})
+  "{NETCDF_OPTION_COMPRESSION_LEVEL}" Compression level 1-9 (default {NETCDF_DEFAULT_COMPRESSION_LEVEL})
+  "{NETCDF_OPTION_SHUFFLE}" Apply the byte shuffle filter before compression (true or false, default true)
+  "{NETCDF_OPTION_SIGNIFICANT_DIGITS}" Quantize floating point grid data to the number of significant digits to improve compression
+  "{NETCDF_OPTION_QUANTIZE_MODE}" Quantization algorithm ({", ".join(NETCDF_QUANTIZE_MODES)}, default {NETCDF_QUANTIZE_MODES[0]})
+
+  The {NETCDF_CHUNK_AUTO} chunk size stores uncompressed grids contiguously and compressed grids in blocks of up to
+  {NETCDF_AUTO_CHUNK_NODES}x{NETCDF_AUTO_CHUNK_NODES} nodes.  Smaller chunks make reading part of a compressed grid faster at the cost
+  of a larger file.  zstd and blosc compression may
+  not be supported by other NetCDF software.
 """
 #  "{NETCDF_OPTION_SIMPLIFY_1PARAM_GRIDS}" (O) Grids with just one parameter are created with just 2 dimensions (default false)
 
@@ -142,6 +209,36 @@ class Reader(BaseReader):
                 raise RuntimeError(
                     f"Data type {dtypestr} not a floating point type: invalid for reading a NetCDF "
                 )
+            self._lazyLoad = self.getBoolOption(NETCDF_OPTION_LAZY_LOAD, False)
+            self._packedGrids = self.getBoolOption(NETCDF_OPTION_PACKED_GRIDS, False)
+            self._gridCache = None
+            if self._lazyLoad:
+                cachemb = self.getOption(
+                    NETCDF_OPTION_GRID_CACHE_MB, NETCDF_DEFAULT_GRID_CACHE_MB
+                )
+                try:
+                    cachebytes = int(float(cachemb) * 1024 * 1024)
+                except ValueError:
+                    raise RuntimeError(
+                        f"Invalid {NETCDF_OPTION_GRID_CACHE_MB} option {cachemb}"
+                    )
+                self._gridCache = GridDataCache(cachebytes)
+            self._boundingBox = None
+            bbox = self.getOption(NETCDF_OPTION_BOUNDING_BOX)
+            if bbox is not None:
+                try:
+                    limits = [float(v) for v in bbox.split(",")]
+                    if (
+                        len(limits) != 4
+                        or limits[0] > limits[2]
+                        or limits[1] > limits[3]
+                    ):
+                        raise ValueError
+                except ValueError:
+                    raise RuntimeError(
+                        f"Invalid {NETCDF_OPTION_BOUNDING_BOX} option {bbox}"
+                    )
+                self._boundingBox = np.array(limits).reshape((2, 2))
 
             root = netCDF4.Dataset(ggxf_file, "r", format="NETCDF4")
             metadata = self.loadMetadata(NETCDF_ATTR_CONTEXT_GGXF, root)
@@ -154,6 +251,15 @@ class Reader(BaseReader):
                 ggxf = GGXF(metadata)
                 for groupname, ncgroup in root.groups.items():
                     group = self.loadGroup(ggxf, groupname, ncgroup)
+                    if (
+                        group is not None
+                        and self._boundingBox is not None
+                        and not group.grids()
+                    ):
+                        self._logger.debug(
+                            f"Group {groupname} is outside the {NETCDF_OPTION_BOUNDING_BOX}"
+                        )
+                        continue
                     ggxf.addGroup(group)
                 ggxf.configure(errorhandler=self.error)
             if not self._loadok:
@@ -181,60 +287,204 @@ class Reader(BaseReader):
         return group
 
     def addGrids(self, group, ncgroup, target):
+        parent = target if isinstance(target, Grid) else None
         for gridname, ncgrid in ncgroup.groups.items():
-            grid = self.loadGrid(group, gridname, ncgrid)
+            grid = self.loadGrid(group, gridname, ncgrid, parent)
             if grid is not None:
                 target.addGrid(grid)
 
-    def loadGrid(self, group, gridname, ncgrid):
+    def loadGrid(self, group, gridname, ncgrid, parent=None):
         self._logger.debug(f"Loading grid {gridname}")
         context = f"{group.name()} {gridname}"
         metadata = self.loadMetadata(NETCDF_ATTR_CONTEXT_GRID, ncgrid)
         grid = None
 
+        data = None
+        packing = None
+        window = None
+        try:
+            if self._boundingBox is not None:
+                shape = self.gridDataShape(group, gridname, ncgrid)
+                window = self.gridWindow(
+                    metadata, shape, parent, group.stencilMargins()
+                )
+                if window is None:
+                    self._logger.debug(
+                        f"Grid {gridname} is outside the {NETCDF_OPTION_BOUNDING_BOX}"
+                    )
+                    return
+            if self._packedGrids:
+                packing = self.gridPacking(group, ncgrid)
+            if self._lazyLoad:
+                shape = self.gridDataShape(group, gridname, ncgrid, window)
+            else:
+                data = self.loadGridData(group, gridname, ncgrid, packing, window)
+                shape = data.shape
+        except Error as ex:
+            self.error(str(ex))
+            return
+        scale, offset = (None, None) if packing is None else packing[1:]
+
+        metadata[GRID_ATTR_I_NODE_COUNT] = shape[0]
+        metadata[GRID_ATTR_J_NODE_COUNT] = shape[1]
+
+        if self.validator().validateGridAttributes(metadata, context=context):
+            grid = Grid(group, gridname, metadata)
+            if self._lazyLoad:
+                grid.setDataLoader(
+                    lambda: self.loadGridData(
+                        group, gridname, ncgrid, packing, window
+                    ),
+                    self._gridCache,
+                    scale,
+                    offset,
+                )
+            else:
+                grid.setData(data, scale, offset)
+            self.addGrids(group, ncgrid, grid)
+        return grid
+
+    def gridDataShape(self, group, gridname, ncgrid, window=None):
+        # Returns the grid size (ni,nj) from the parameter set variable
+        # dimensions without loading the data.  If window is defined (see
+        # gridWindow) returns the size of the window.
+        if window is not None:
+            return tuple(s.stop - s.start for s in window)
+        shape = None
+        for pset in group.paramSetIndices():
+            try:
+                psetshape = ncgrid[pset].shape[:2]
+            except Exception as ex:
+                raise Error(
+                    f"Cannot load data for grid {gridname} parameter set {pset}: {ex}"
+                )
+            if shape is not None and psetshape != shape:
+                raise Error(
+                    f"Inconsistent dimensions of parameter sets for grid {gridname}"
+                )
+            shape = psetshape
+        return shape
+
+    def gridWindow(self, metadata, shape, parent=None, margins=(0, 0)):
+        # Returns the (islice, jslice) node ranges of a grid of size shape
+        # covering the bounding box, or None if the grid is outside it.  The
+        # window includes the margins (nodes before, nodes after) around the
+        # bounding box used by the interpolation method.  The affine
+        # coefficients in metadata are updated for the first node of the
+        # window.  Child grids are also trimmed to the nodes inside their
+        # (trimmed) parent.
+        coeffs = np.array(metadata[GRID_ATTR_AFFINE_COEFFS], dtype=float).reshape(
+            (2, 3)
+        )
+        xy0 = coeffs[:, 0]
+        tfm = coeffs[:, 1:]
+        inv = np.linalg.inv(tfm)
+        tolerance = NETCDF_WINDOW_NODE_TOLERANCE
+
+        def nodeRange(extents):
+            (xmin, ymin), (xmax, ymax) = extents
+            corners = np.array(
+                [[xmin, ymin], [xmin, ymax], [xmax, ymin], [xmax, ymax]]
+            )
+            ij = (corners - xy0).dot(inv.T)
+            return ij.min(axis=0), ij.max(axis=0)
+
+        ijmin, ijmax = nodeRange(self._boundingBox)
+        lower = np.floor(ijmin + tolerance).astype(int)
+        upper = np.ceil(ijmax - tolerance).astype(int)
+        limits = (np.zeros(2, dtype=int), np.array(shape) - 1)
+        if parent is not None:
+            pmin, pmax = nodeRange(parent.extents())
+            limits = (
+                np.maximum(limits[0], np.ceil(pmin - tolerance)).astype(int),
+                np.minimum(limits[1], np.floor(pmax + tolerance)).astype(int),
+            )
+        if np.any(np.minimum(upper, limits[1]) < np.maximum(lower, limits[0])):
+            return None
+        lower = np.maximum(lower - margins[0], limits[0])
+        upper = np.minimum(upper + margins[1], limits[1])
+        # Interpolation needs at least one cell in each direction
+        for axis in range(2):
+            if upper[axis] == lower[axis]:
+                if upper[axis] < limits[1][axis]:
+                    upper[axis] += 1
+                elif lower[axis] > limits[0][axis]:
+                    lower[axis] -= 1
+                else:
+                    return None
+        coeffs[:, 0] = xy0 + tfm.dot(lower)
+        metadata[GRID_ATTR_AFFINE_COEFFS] = coeffs.flatten().tolist()
+        return tuple(
+            slice(int(start), int(end) + 1) for start, end in zip(lower, upper)
+        )
+
+    def gridPacking(self, group, ncgrid):
+        # Returns (dtype, scale, offset) for a grid in which every parameter set
+        # is stored as an integer variable, where scale and offset are arrays of
+        # the scale_factor and add_offset for each parameter.  Returns None if
+        # any parameter set is not an integer variable.
+        dtype = None
+        scale = np.ones((group.nparam(),))
+        offset = np.zeros((group.nparam(),))
+        for pset, pindices in group.paramSetIndices().items():
+            try:
+                ncdata = ncgrid[pset]
+            except Exception:
+                return None
+            if not np.issubdtype(ncdata.dtype, np.integer):
+                return None
+            if dtype is not None:
+                dtype = np.promote_types(dtype, ncdata.dtype)
+            else:
+                dtype = ncdata.dtype
+            ncattrs = ncdata.ncattrs()
+            if "scale_factor" in ncattrs:
+                scale[pindices] = ncdata.getncattr("scale_factor")
+            if "add_offset" in ncattrs:
+                offset[pindices] = ncdata.getncattr("add_offset")
+        return dtype, scale, offset
+
+    def loadGridData(self, group, gridname, ncgrid, packing=None, window=None):
         # Handling of sets in NetCDF reader/writer, mapping to/from
         # single array.  Implemented in NetCDF reader as short term
         # approach.  Ultimately want parameter sets in GGXF definition
         # to support lazy loading of grids.
+        #
+        # If packing is defined (see gridPacking) the integer values are
+        # loaded without applying the scale factor and offset.  If window
+        # is defined (see gridWindow) only the nodes in the window are read.
+        dtype = self._dtype if packing is None else packing[0]
+        if window is None:
+            window = (slice(None), slice(None))
         data = None
+        self._logger.debug(f"Loading data for grid {gridname}")
         try:
             for pset, pindices in group.paramSetIndices().items():
                 try:
                     ncdata = ncgrid[pset]
-                #                   sdata = np.ma.masked_array(ncdata)
                 except Exception as ex:
-                    self.error(
+                    raise Error(
                         f"Cannot load data for grid {gridname} parameter set {pset}: {ex}"
                     )
-                    return
-                # if len(sdata.shape) == 2:
-                #     shape = [*data.shape, 1]
-                #     print(sdata)
-                #     rsdata = sdata.reshape(shape)
-                #     sdata = rsdata
+                ncdata.set_auto_scale(packing is None)
+                psetdata = np.ma.masked_array(ncdata[window])
                 if data is None:
                     data = np.ma.masked_all(
-                        (ncdata.shape[0], ncdata.shape[1], group.nparam()),
-                        dtype=self._dtype,
+                        (psetdata.shape[0], psetdata.shape[1], group.nparam()),
+                        dtype=dtype,
                     )
-                if len(ncdata.shape) == 2:
-                    data[:, :, pindices[0]] = np.ma.masked_array(ncdata)
+                if len(psetdata.shape) == 2:
+                    data[:, :, pindices[0]] = psetdata
                 else:
-                    data[:, :, pindices] = np.ma.masked_array(ncdata)
-
+                    data[:, :, pindices] = psetdata
+        except Error:
+            raise
         except Exception as ex:
-            self.error(f"Cannot compile grid data for grid {gridname}: {ex}")
+            raise Error(f"Cannot compile grid data for grid {gridname}: {ex}")
 
         if np.count_nonzero(data.mask) == 0:
             data = data.data
-
-        metadata[GRID_ATTR_I_NODE_COUNT] = data.shape[0]
-        metadata[GRID_ATTR_J_NODE_COUNT] = data.shape[1]
-
-        if self.validator().validateGridAttributes(metadata, context=context):
-            grid = Grid(group, gridname, metadata, data)
-            self.addGrids(group, ncgrid, grid)
-        return grid
+        return data
 
     def loadMetadata(self, context: str, source):
         attrs = {}
@@ -395,8 +645,10 @@ class Writer(BaseWriter):
                 raise NetCdfWriterError(
                     f"Invalid value for {NETCDF_OPTION_PACK_PRECISION}"
                 )
+        self.setStorageOptions()
 
         self._logger.debug(f"Saving NetCDF4 grid as {netcdf4_file}")
+        starttime = time.perf_counter()
         if os.path.isfile(netcdf4_file):
             os.remove(netcdf4_file)
         root = netCDF4.Dataset(netcdf4_file, "w", format="NETCDF4")
@@ -404,6 +656,9 @@ class Writer(BaseWriter):
         ggxf.setFilename(filename)
         self.saveGgxfNetCdf4(root, ggxf)
         root.close()
+        self._logger.info(
+            f"Wrote {netcdf4_file}: {os.path.getsize(netcdf4_file)} bytes in {time.perf_counter()-starttime:.3f} seconds"
+        )
         cdloption = self.getOption(
             NETCDF_OPTION_WRITE_CDL, NETCDF_CDL_OPTION_NONE
         ).lower()
@@ -435,6 +690,91 @@ class Writer(BaseWriter):
                         for line in cdldata:
                             cdlh.write(line)
 
+    def setStorageOptions(self):
+        # Chunking, compression, and quantization options for grid variables
+        chunksize = self.getOption(NETCDF_OPTION_CHUNK_SIZE, NETCDF_CHUNK_AUTO)
+        if chunksize in (NETCDF_CHUNK_AUTO, NETCDF_CHUNK_CONTIGUOUS):
+            self._chunkSize = chunksize
+        else:
+            try:
+                self._chunkSize = tuple(int(n) for n in chunksize.split(","))
+                if len(self._chunkSize) != 2 or min(self._chunkSize) < 1:
+                    raise ValueError
+            except ValueError:
+                raise NetCdfWriterError(
+                    f"Invalid {NETCDF_OPTION_CHUNK_SIZE} option {chunksize}"
+                )
+
+        self._compression = self.getOption(
+            NETCDF_OPTION_COMPRESSION, NETCDF_COMPRESSION_NONE
+        )
+        if self._compression not in NETCDF_COMPRESSION_TYPES:
+            raise NetCdfWriterError(
+                f"Invalid {NETCDF_OPTION_COMPRESSION} option {self._compression}"
+            )
+        if self._compression == NETCDF_COMPRESSION_NONE:
+            self._compression = None
+        elif self._chunkSize == NETCDF_CHUNK_CONTIGUOUS:
+            raise NetCdfWriterError(
+                f"{NETCDF_OPTION_COMPRESSION} requires chunked grid data"
+            )
+        level = self.getOption(
+            NETCDF_OPTION_COMPRESSION_LEVEL, NETCDF_DEFAULT_COMPRESSION_LEVEL
+        )
+        try:
+            self._compressionLevel = int(level)
+            if self._compressionLevel < 1 or self._compressionLevel > 9:
+                raise ValueError
+        except ValueError:
+            raise NetCdfWriterError(
+                f"Invalid {NETCDF_OPTION_COMPRESSION_LEVEL} option {level}"
+            )
+        self._shuffle = self.getBoolOption(NETCDF_OPTION_SHUFFLE, True)
+
+        digits = self.getOption(NETCDF_OPTION_SIGNIFICANT_DIGITS)
+        self._significantDigits = None
+        if digits is not None:
+            try:
+                self._significantDigits = int(digits)
+                if self._significantDigits < 1:
+                    raise ValueError
+            except ValueError:
+                raise NetCdfWriterError(
+                    f"Invalid {NETCDF_OPTION_SIGNIFICANT_DIGITS} option {digits}"
+                )
+        self._quantizeMode = self.getOption(
+            NETCDF_OPTION_QUANTIZE_MODE, NETCDF_QUANTIZE_MODES[0]
+        )
+        if self._quantizeMode not in NETCDF_QUANTIZE_MODES:
+            raise NetCdfWriterError(
+                f"Invalid {NETCDF_OPTION_QUANTIZE_MODE} option {self._quantizeMode}"
+            )
+
+    def storageArguments(self, vartype, shape):
+        # Returns the createVariable arguments for storing a grid variable of
+        # the given type and shape
+        args = {}
+        if self._significantDigits is not None and np.issubdtype(vartype, np.floating):
+            args["significant_digits"] = self._significantDigits
+            args["quantize_mode"] = self._quantizeMode
+        if self._chunkSize == NETCDF_CHUNK_CONTIGUOUS or (
+            self._chunkSize == NETCDF_CHUNK_AUTO and self._compression is None
+        ):
+            args["contiguous"] = True
+            return args
+        if self._chunkSize == NETCDF_CHUNK_AUTO:
+            chunksize = (NETCDF_AUTO_CHUNK_NODES, NETCDF_AUTO_CHUNK_NODES)
+        else:
+            chunksize = self._chunkSize
+        chunksizes = [min(n, size) for n, size in zip(chunksize, shape)]
+        chunksizes.extend(shape[2:])
+        args["chunksizes"] = chunksizes
+        if self._compression is not None:
+            args["compression"] = self._compression
+            args["complevel"] = self._compressionLevel
+            args["shuffle"] = self._shuffle
+        return args
+
     def saveGgxfNetCdf4(self, root, ggxf):
         nctypes = {}
         exclude = [GGXF_ATTR_GGXF_GROUPS]
@@ -505,10 +845,12 @@ class Writer(BaseWriter):
             if len(pindices) > 1:
                 dimensions.append(f"{pset}Count")
 
+            shape = vardata.shape if len(pindices) > 1 else vardata.shape[:2]
             datavar = cdfgrid.createVariable(
                 pset,
                 vartype,
                 dimensions,
+                **self.storageArguments(vartype, shape),
             )
             if varattr:
                 datavar.setncatts(varattr)
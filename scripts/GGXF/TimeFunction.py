@@ -6,11 +6,15 @@ import datetime
 import logging
 import math
 import re
+from collections import OrderedDict
 
 import numpy as np
 
 from .Constants import *
 
+# Number of epochs for which CompoundTimeFunction retains calculated values
+TIME_FUNCTION_CACHE_SIZE = 64
+
 
 class Error(RuntimeError):
     pass
@@ -45,6 +49,16 @@ def DateToEpoch(sourcedate):
     raise Error(f"Invalide date {sourcedate}")
 
 
+def _mapFunction(function, values):
+    # Apply a math module function to each element of an array.  The math
+    # functions are used rather than the numpy ufuncs as the numpy
+    # implementations of exp, tanh, etc can differ in the last bit, and array
+    # evaluation must give the same result as evaluating each epoch.
+    return np.fromiter(
+        map(function, values.ravel().tolist()), dtype=np.float64, count=values.size
+    ).reshape(values.shape)
+
+
 class BaseTimeFunction:
     @staticmethod
     def Create(definition: dict):
@@ -115,11 +129,54 @@ class BaseTimeFunction:
         elif self._endEpoch and epoch > self._endEpoch:
             epoch = self._endEpoch
         value = self.refFunc(epoch) * self._multiplier
+        return value - self._referenceValue()
+
+    def valuesAt(self, epochs):
+        # Array version of valueAt, evaluating the function at each element
+        # of an array of epochs.
+        epochs = np.asarray(epochs, dtype=np.float64)
+        clamped = epochs
+        if self._endEpoch:
+            clamped = np.where(clamped > self._endEpoch, self._endEpoch, clamped)
+        if self._startEpoch:
+            clamped = np.where(epochs < self._startEpoch, self._startEpoch, clamped)
+        values = self.refFuncArray(clamped) * self._multiplier
+        return values - self._referenceValue()
+
+    def epochs(self):
+        # Epochs at which the behaviour of the function changes, such as the
+        # event, start, and end epochs
+        return sorted(
+            value for key, value in self._params.items() if key.endswith("Epoch")
+        )
+
+    def isZeroBetween(self, epoch0, epoch1):
+        # Test whether the function is zero at all epochs from epoch0 to epoch1,
+        # that is it is constant over the (clamped) epochs and zero at epoch0.
+        epoch0, epoch1 = (self._clampedEpoch(epoch) for epoch in (epoch0, epoch1))
+        if epoch1 > epoch0 and self._multiplier != 0.0:
+            if not self.refFuncIsConstant(epoch0, epoch1):
+                return False
+        return self.valueAt(epoch0) == 0.0
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        # Test whether refFunc is constant from epoch0 to epoch1.  Overridden by
+        # the functions which are constant over some epochs.
+        return False
+
+    def _clampedEpoch(self, epoch):
+        if self._startEpoch and epoch < self._startEpoch:
+            return self._startEpoch
+        elif self._endEpoch and epoch > self._endEpoch:
+            return self._endEpoch
+        return epoch
+
+    def _referenceValue(self):
         if self._refValue is None:
             self._refValue = 0.0
             if self._refEpoch is not None:
                 self._refValue = self.valueAt(self._refEpoch)
-        return value - self._refValue
+        return self._refValue
 
 
 class LinearTimeFunction(BaseTimeFunction):
@@ -136,6 +193,9 @@ class LinearTimeFunction(BaseTimeFunction):
     def refFunc(self, epoch):
         return epoch - self._refEpoch
 
+    def refFuncArray(self, epochs):
+        return epochs - self._refEpoch
+
 
 class QuadraticTimeFunction(BaseTimeFunction):
     Params = (TIME_PARAM_FUNCTION_REFERENCE_EPOCH,)
@@ -152,6 +212,10 @@ class QuadraticTimeFunction(BaseTimeFunction):
         epoch -= self._refEpoch
         return epoch * epoch
 
+    def refFuncArray(self, epochs):
+        epochs = epochs - self._refEpoch
+        return epochs * epochs
+
 
 class StepTimeFunction(BaseTimeFunction):
     Params = (TIME_PARAM_EVENT_EPOCH,)
@@ -165,6 +229,12 @@ class StepTimeFunction(BaseTimeFunction):
     def refFunc(self, epoch):
         return 1.0 if epoch >= self._epoch else 0.0
 
+    def refFuncArray(self, epochs):
+        return np.where(epochs >= self._epoch, 1.0, 0.0)
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        return epoch1 < self._epoch or epoch0 >= self._epoch
+
 
 class ExponentialTimeFunction(BaseTimeFunction):
     Params = (
@@ -188,6 +258,16 @@ class ExponentialTimeFunction(BaseTimeFunction):
             return 0.0
         return 1.0 - math.exp(-epoch / self._decay)
 
+    def refFuncArray(self, epochs):
+        epochs = epochs - self._epoch
+        values = np.zeros(epochs.shape)
+        after = ~(epochs < 0.0)
+        values[after] = 1.0 - _mapFunction(math.exp, -epochs[after] / self._decay)
+        return values
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        return epoch1 <= self._epoch
+
 
 class LogBaseETimeFunction(BaseTimeFunction):
     Params = (
@@ -211,13 +291,23 @@ class LogBaseETimeFunction(BaseTimeFunction):
             return 0.0
         return math.log(1.0 + epoch / self._decay)
 
+    def refFuncArray(self, epochs):
+        epochs = epochs - self._epoch
+        values = np.zeros(epochs.shape)
+        after = ~(epochs < 0.0)
+        values[after] = _mapFunction(math.log, 1.0 + epochs[after] / self._decay)
+        return values
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        return epoch1 <= self._epoch
+
 
 class LogBase10TimeFunction(BaseTimeFunction):
     Params = (
         TIME_PARAM_EVENT_EPOCH,
         TIME_PARAM_TIME_CONSTANT,
     )
-    log10 = lambda t: math.log(t) / math.log(10)
+    log10 = staticmethod(lambda t: math.log(t) / math.log(10))
 
     def __init__(self, definition):
         BaseTimeFunction.__init__(
@@ -235,6 +325,17 @@ class LogBase10TimeFunction(BaseTimeFunction):
             return 0.0
         return self.log10(1.0 + epoch / self._decay)
 
+    def refFuncArray(self, epochs):
+        epochs = epochs - self._epoch
+        values = np.zeros(epochs.shape)
+        after = ~(epochs < 0.0)
+        values[after] = _mapFunction(math.log, 1.0 + epochs[after] / self._decay)
+        values[after] /= math.log(10)
+        return values
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        return epoch1 <= self._epoch
+
 
 class RampTimeFunction(BaseTimeFunction):
     Params = (
@@ -261,6 +362,15 @@ class RampTimeFunction(BaseTimeFunction):
         else:
             return (epoch - self._epoch0) / self._epochDiff
 
+    def refFuncArray(self, epochs):
+        values = np.where(epochs < self._epoch0, 0.0, 1.0)
+        during = (epochs >= self._epoch0) & (epochs < self._epoch1)
+        values[during] = (epochs[during] - self._epoch0) / self._epochDiff
+        return values
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        return epoch1 <= self._epoch0 or epoch0 >= self._epoch1
+
 
 class CyclicTimeFunction(BaseTimeFunction):
     Params = (
@@ -281,6 +391,14 @@ class CyclicTimeFunction(BaseTimeFunction):
     def refFunc(self, epoch):
         return math.sin(self._frequency * (epoch - self._refEpoch) * (2.0 * math.pi))
 
+    def refFuncArray(self, epochs):
+        return _mapFunction(
+            math.sin, self._frequency * (epochs - self._refEpoch) * (2.0 * math.pi)
+        )
+
+    def refFuncIsConstant(self, epoch0, epoch1):
+        return self._frequency == 0.0
+
 
 class HyperbolicTangentTimeFunction(BaseTimeFunction):
     Params = (
@@ -301,23 +419,61 @@ class HyperbolicTangentTimeFunction(BaseTimeFunction):
     def refFunc(self, epoch):
         return (1.0 + math.tanh((epoch - self._epoch) / self._timeFactor)) / 2.0
 
+    def refFuncArray(self, epochs):
+        values = _mapFunction(math.tanh, (epochs - self._epoch) / self._timeFactor)
+        return (1.0 + values) / 2.0
+
 
 class CompoundTimeFunction:
-    def __init__(self, minEpoch=None, maxEpoch=None):
+    # Sum of a set of base time functions.  Values calculated by valueAt and
+    # valueChange are held in a least recently used cache of up to cacheSize
+    # epochs.
+
+    def __init__(
+        self, minEpoch=None, maxEpoch=None, cacheSize=TIME_FUNCTION_CACHE_SIZE
+    ):
         self._baseFunctions = []
         self._minEpoch = minEpoch
         self._maxEpoch = maxEpoch
-        self._cacheEpoch0 = None
-        self._cacheValue0 = None
-        self._cacheEpoch1 = None
-        self._cacheValue1 = None
+        self._cacheSize = cacheSize
+        self._cache = OrderedDict()
+        self._cacheHits = 0
+        self._cacheMisses = 0
 
     def addFunction(self, function: BaseTimeFunction):
         self._baseFunctions.append(function)
-        self._cacheEpoch0 = None
-        self._cacheValue0 = None
-        self._cacheEpoch1 = None
-        self._cacheValue1 = None
+        self._cache.clear()
+
+    def epochs(self):
+        # Epochs at which the behaviour of any of the functions changes
+        epochs = set()
+        for f in self._baseFunctions:
+            epochs.update(f.epochs())
+        for epoch in (self._minEpoch, self._maxEpoch):
+            if epoch is not None:
+                epochs.add(epoch)
+        return sorted(epochs)
+
+    def isZeroBetween(self, epoch0, epoch1):
+        # Test whether the function is zero (or not defined) at all epochs from
+        # epoch0 to epoch1.  This is true if each of the base functions is zero
+        # over the epochs at which the function is defined.  Base functions which
+        # cancel each other out are not detected, so the test may return False for
+        # a function which is zero, but never returns True for one which is not.
+        if self._minEpoch is not None:
+            epoch0 = max(epoch0, self._minEpoch)
+        if self._maxEpoch is not None:
+            epoch1 = min(epoch1, self._maxEpoch)
+        if epoch1 < epoch0:
+            return True
+        return all(f.isZeroBetween(epoch0, epoch1) for f in self._baseFunctions)
+
+    def cacheStats(self):
+        return {
+            "hits": self._cacheHits,
+            "misses": self._cacheMisses,
+            "size": len(self._cache),
+        }
 
     def _evaluate(self, epoch):
         if self._minEpoch is not None and epoch < self._minEpoch:
@@ -326,17 +482,48 @@ class CompoundTimeFunction:
             return None
         return sum((f.valueAt(epoch) for f in self._baseFunctions))
 
+    def _evaluateArray(self, epochs):
+        values = np.zeros(epochs.shape)
+        for f in self._baseFunctions:
+            values += f.valuesAt(epochs)
+        if self._minEpoch is not None:
+            values[epochs < self._minEpoch] = np.nan
+        if self._maxEpoch is not None:
+            values[epochs > self._maxEpoch] = np.nan
+        return values
+
     def valueAt(self, epoch):
-        if self._cacheEpoch0 is None or epoch != self._cacheEpoch0:
-            self._cacheEpoch0 = self._evaluate(epoch)
-        return self._cacheEpoch0
+        cache = self._cache
+        if epoch in cache:
+            self._cacheHits += 1
+            cache.move_to_end(epoch)
+            return cache[epoch]
+        self._cacheMisses += 1
+        value = self._evaluate(epoch)
+        if self._cacheSize > 0:
+            cache[epoch] = value
+            if len(cache) > self._cacheSize:
+                cache.popitem(last=False)
+        return value
 
     def valueChange(self, epoch, refepoch):
-        if self._cacheEpoch1 is None or epoch != self._cacheEpoch1:
-            self._cacheEpoch1 = self._evaluate(epoch)
-        value1 = self._cacheEpoch1
+        value1 = self.valueAt(epoch)
         value0 = self.valueAt(refepoch)
         if value1 is None or value0 is None:
             return None
         else:
             return value1 - value0
+
+    def valuesAt(self, epochs):
+        # Array version of valueAt.  Returns NaN for epochs at which the
+        # function is not defined.
+        return self._evaluateArray(np.asarray(epochs, dtype=np.float64))
+
+    def valuesChange(self, epochs, refepochs):
+        # Array version of valueChange.  epochs and refepochs are arrays (or
+        # single epochs) which are broadcast together.
+        epochs, refepochs = np.broadcast_arrays(
+            np.asarray(epochs, dtype=np.float64),
+            np.asarray(refepochs, dtype=np.float64),
+        )
+        return self._evaluateArray(epochs) - self._evaluateArray(refepochs)
@@ -4,11 +4,15 @@
 #
 # YAML grid data in column major order corresponding to ncol,nrow,nparam numpy array.
 
+import hashlib
 import importlib
+import json
 import logging
 import os.path
 import re
 import tempfile
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import yaml
@@ -27,6 +31,20 @@ YAML_OPTION_WRITE_CSV_NODE_INDICES = "write-csv-node-indices"
 # Option for testing yaml headers without requiring valid grid data
 YAML_OPTION_CREATE_DUMMY_GRID_DATA = "create-dummy-grid-data"
 
+# Options for deferring conversion of inline grid data until it is used
+YAML_OPTION_LAZY_LOAD = "lazy-load"
+YAML_OPTION_GRID_CACHE_MB = "grid-cache-mb"
+YAML_DEFAULT_GRID_CACHE_MB = 1024
+
+# Option for the number of threads used to load grid data sources
+YAML_OPTION_LOAD_THREADS = "load-threads"
+YAML_DEFAULT_LOAD_THREADS = os.cpu_count() or 1
+
+# Option for a directory caching grid data loaded from data sources
+YAML_OPTION_SOURCE_CACHE_DIRECTORY = "source-cache-directory"
+# Change if the content of the source cache changes
+YAML_SOURCE_CACHE_VERSION = 1
+
 YAML_AFFINE_COEFF_DIFFERENCE_TOLERANCE = 1.0e-6
 
 YAML_OPTION_GRID_DTYPE = "grid_dtype"
@@ -48,11 +66,19 @@ YAML_ALL_OPTIONS = {
     YAML_OPTION_WRITE_CSV_NODE_INDICES,
     YAML_OPTION_CREATE_DUMMY_GRID_DATA,
     YAML_OPTION_GRID_DTYPE,
+    YAML_OPTION_LAZY_LOAD,
+    YAML_OPTION_GRID_CACHE_MB,
+    YAML_OPTION_LOAD_THREADS,
+    YAML_OPTION_SOURCE_CACHE_DIRECTORY,
 }
 
 YAML_READ_OPTIONS = f"""
   "{YAML_OPTION_GRID_DIRECTORY}" Base directory (relative to YAML file) used for grid files
   "{YAML_OPTION_CHECK_DATASOURCE_AFFINE}" Compare affine coeffs from data source with those defined in YAML (true or false)
+  "{YAML_OPTION_LAZY_LOAD}" Only convert inline grid data when it is first used (true or false, default false)
+  "{YAML_OPTION_GRID_CACHE_MB}" Memory limit in MB for grid data loaded by {YAML_OPTION_LAZY_LOAD} (default {YAML_DEFAULT_GRID_CACHE_MB})
+  "{YAML_OPTION_LOAD_THREADS}" Number of threads used to load grid data sources (default {YAML_DEFAULT_LOAD_THREADS})
+  "{YAML_OPTION_SOURCE_CACHE_DIRECTORY}" Directory used to cache grid data loaded from data sources
   """
 
 YAML_WRITE_OPTIONS = f"""
@@ -65,6 +91,43 @@ YAML_WRITE_OPTIONS = f"""
 
 CSV_COORDINATE_FORMAT = ".12g"
 CSV_PARAMETER_FORMAT = ".12g"
+# Number of grid nodes formatted at a time when writing a CSV grid
+CSV_WRITE_BLOCK_NODES = 65536
+# Number of grid nodes formatted at a time when writing grid data in the YAML file
+YAML_DATA_BLOCK_NODES = 65536
+# Line width and indent used by the PyYAML emitter, matched when writing grid data
+YAML_EMITTER_WIDTH = 80
+YAML_EMITTER_INDENT = 2
+
+# The C implementation of the YAML parser is used if it is available
+YAML_BASE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Inline grid data is extracted from the YAML text before it is parsed and replaced
+# with a tagged reference to the extracted text.  Matches the "data:" key of a grid
+# where the value is empty (a block sequence on the following lines) or a flow sequence.
+# Only data made up of plain scalars and sequences are extracted, and the loader
+# rejects extracted data other than the data of a grid (see LoadYamlText).
+YAML_GRID_DATA_TAG = "!ggxf-grid-data"
+YAML_GRID_DATA_RE = re.compile(
+    r"^(?P<key>(?P<indent> *)(?:- +)*"
+    + GRID_ATTR_DATA
+    + r":)(?:[ \t]+(?P<value>\[.*))?[ \t]*$"
+)
+YAML_GRID_DATA_CHARS_RE = re.compile(r"[-+.\w\s\[\],]*")
+
+# Values of inline grid data which are read the same by the JSON parser and the YAML
+# 1.1 resolver.  For example 1e3 is a number in JSON but a string in YAML.  Data
+# without other characters than digits, signs and points are either read the same
+# or rejected by the JSON parser.
+YAML_JSON_OTHER_CHARS_RE = re.compile(r"[^-+.0-9\s\[\],]")
+YAML_JSON_VALUE_RE = re.compile(
+    r"(?<=[\s\[,])(?:-?(?:0|[1-9][0-9]*)(?:\.[0-9]+(?:[eE][-+][0-9]+)?)?"
+    r"|[-+]?\.(?:inf|Inf|INF)|\.(?:nan|NaN|NAN))(?=[\s\],])"
+)
+YAML_JSON_SEPARATORS_RE = re.compile(r"[\s\[\],]*")
+YAML_SPECIAL_FLOAT_RE = re.compile(
+    r"(?<=[\s\[,])(?:([-+]?)\.(?:inf|Inf|INF)|(\.(?:nan|NaN|NAN)))(?=[\s\],])"
+)
 
 SOURCE_ATTR_SOURCE_TYPE = "dataSourceType"
 SOURCE_ATTR_GRID_FILENAME = "gridFilename"
@@ -78,6 +141,251 @@ SOURCE_XFORM_ATTR_PARAMETER_SCALE = "scale"
 SOURCE_XFORM_ATTR_PARAMETER_OFFSET = "offset"
 
 
+class InlineGridData:
+    # Text of inline grid data extracted from the YAML file (see ExtractInlineGridData).
+    # The data are converted to an array with the JSON parser if they are a simple
+    # sequence of numbers which JSON and YAML read the same, otherwise with the YAML
+    # parser.  line is the line number of the data key in the YAML file.
+
+    def __init__(self, text: str, line: int = 0):
+        self._text = text
+        self.line = line
+
+    def array(self):
+        data = None
+        text = self.jsonText()
+        if text is not None:
+            try:
+                data = json.loads(text)
+            except ValueError:
+                pass
+        if data is None:
+            data = yaml.load(self._text, Loader=YAML_BASE_LOADER)
+        return np.array(data)
+
+    def jsonText(self):
+        # Returns the data as JSON text, or None if the JSON parser may read them
+        # differently to the YAML parser
+        text = self._text
+        if not text.lstrip().startswith("["):
+            items = re.split(r"^[ \t]*- ", text, flags=re.MULTILINE)
+            if items[0].strip() != "":
+                return None
+            text = "[" + ",".join(items[1:]) + "]"
+        if YAML_JSON_OTHER_CHARS_RE.search(text):
+            if not YAML_JSON_SEPARATORS_RE.fullmatch(YAML_JSON_VALUE_RE.sub("", text)):
+                return None
+            text = YAML_SPECIAL_FLOAT_RE.sub(InlineGridData._jsonFloat, text)
+        return text
+
+    @staticmethod
+    def _jsonFloat(match):
+        if match.group(2):
+            return "NaN"
+        return "-Infinity" if match.group(1) == "-" else "Infinity"
+
+
+def ExtractInlineGridData(text: str, skip=()):
+    # Replace the inline grid data in the YAML text with references to InlineGridData
+    # objects so that the YAML parser does not have to construct each grid value.
+    # Data keys on the lines listed in skip are left in the text.
+    # Returns the amended text and the list of InlineGridData objects.
+
+    lines = text.splitlines(keepends=True)
+    result = []
+    griddata = []
+    nline = 0
+    while nline < len(lines):
+        start = nline
+        line = lines[nline]
+        nline += 1
+        match = YAML_GRID_DATA_RE.match(line) if start not in skip else None
+        if not match:
+            result.append(line)
+            continue
+        keycol = len(match.group("key")) - len(GRID_ATTR_DATA) - 1
+        value = match.group("value")
+        datalines = []
+        if value is not None:
+            # Flow sequence, which ends where the brackets are balanced
+            datalines.append(value + "\n")
+            depth = value.count("[") - value.count("]")
+            while depth > 0 and nline < len(lines):
+                dline = lines[nline]
+                depth += dline.count("[") - dline.count("]")
+                datalines.append(dline)
+                nline += 1
+            extract = depth == 0
+        else:
+            # Block sequence, which ends at the next line other than a comment that is
+            # indented less than the sequence entries
+            while nline < len(lines):
+                dline = lines[nline]
+                content = dline.lstrip(" ")
+                indent = len(dline) - len(content)
+                if content.strip() and not content.startswith("#") and indent <= keycol:
+                    if indent < keycol or not content.startswith("- "):
+                        break
+                datalines.append(dline)
+                nline += 1
+            extract = any(dline.lstrip(" ").startswith("- ") for dline in datalines)
+        if extract:
+            datatext = "".join(
+                dline for dline in datalines if not dline.lstrip().startswith("#")
+            )
+            extract = YAML_GRID_DATA_CHARS_RE.fullmatch(datatext) is not None
+        if not extract:
+            result.extend(lines[start:nline])
+            continue
+        result.append(f"{match.group('key')} {YAML_GRID_DATA_TAG} {len(griddata)}\n")
+        griddata.append(InlineGridData(textwrap.dedent("".join(datalines)), start))
+    return "".join(result), griddata
+
+
+def LoadYamlText(text: str):
+    # Parse the text of a GGXF YAML file, using ExtractInlineGridData to speed up
+    # loading inline grid data.  Data extracted from anywhere other than the data
+    # of a grid, for example from a block scalar, are left in the text and it is
+    # parsed again, as it is if the extraction leaves text that cannot be parsed.
+    skip = set()
+    while True:
+        ytext, griddata = ExtractInlineGridData(text, skip)
+        loader = Loader(ytext, griddata)
+        try:
+            ydata = loader.get_single_data()
+        except yaml.YAMLError:
+            if not griddata:
+                raise
+            skip.update(gdata.line for gdata in griddata)
+            continue
+        finally:
+            loader.dispose()
+        misplaced = loader.misplacedGridData()
+        if not misplaced:
+            return ydata
+        skip.update(gdata.line for gdata in misplaced)
+
+
+class SourceDataCache:
+    # Directory of grid data loaded from external data sources, saved as numpy .npz
+    # files.  The file name is a hash of the data source definition, the group
+    # parameters used by the loader, and the path, size, and modification time of
+    # each file named in the data source, so a cached grid is not used if any of
+    # these change.  Data sources which do not name any files are not cached.
+
+    def __init__(self, cachedir: str):
+        os.makedirs(cachedir, exist_ok=True)
+        self._cachedir = cachedir
+
+    def cacheFile(self, group, datasource: dict, griddir: str):
+        # Returns the name of the cache file for the data source, or None if it
+        # cannot be cached
+        files = []
+        self._sourceFiles(datasource, griddir or os.getcwd(), files)
+        if not files:
+            return None
+        key = {
+            "version": YAML_SOURCE_CACHE_VERSION,
+            "dataSource": datasource,
+            "parameters": list(group.parameterNames()),
+            "nodeCoordinates": list(group.ggxf().nodeCoordinateParameters()),
+            "files": sorted(files),
+        }
+        try:
+            keytext = json.dumps(key, sort_keys=True)
+        except TypeError:
+            return None
+        keyhash = hashlib.sha256(keytext.encode("utf8")).hexdigest()
+        return os.path.join(self._cachedir, keyhash + ".npz")
+
+    def _sourceFiles(self, value, griddir, files):
+        # Collect the path, size, and modification time of files named in value
+        if isinstance(value, dict):
+            value = list(value.values())
+        if isinstance(value, list):
+            for item in value:
+                self._sourceFiles(item, griddir, files)
+        elif isinstance(value, str):
+            filename = os.path.abspath(os.path.join(griddir, value))
+            if os.path.isfile(filename):
+                stat = os.stat(filename)
+                files.append([filename, stat.st_size, stat.st_mtime_ns])
+
+    def loadGrid(self, loader, group, datasource: dict, logger, griddir: str):
+        # Returns the result of loader.LoadGrid, using the cached result if it is valid
+        cachefile = self.cacheFile(group, datasource, griddir)
+        if cachefile is None:
+            return loader.LoadGrid(group, datasource, logger, griddir)
+        if os.path.isfile(cachefile):
+            try:
+                with np.load(cachefile, allow_pickle=False) as cached:
+                    data = cached["data"]
+                    size = affine = None
+                    if "size" in cached:
+                        size = tuple(int(n) for n in cached["size"])
+                    if "affine" in cached:
+                        affine = cached["affine"].tolist()
+                logger.debug(f"Using cached grid data {cachefile}")
+                return data, size, affine
+            except Exception as ex:
+                logger.warning(f"Cannot use cached grid data {cachefile}: {ex}")
+        data, size, affine = loader.LoadGrid(group, datasource, logger, griddir)
+        arrays = {"data": np.asarray(data)}
+        if size is not None:
+            arrays["size"] = np.asarray(size)
+        if affine is not None:
+            arrays["affine"] = np.asarray(affine)
+        # Write to a temporary file so that a partly written file is never used
+        tmpfile = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=self._cachedir, suffix=".npz", delete=False
+            ) as tmph:
+                tmpfile = tmph.name
+                np.savez(tmph, **arrays)
+            os.replace(tmpfile, cachefile)
+        except Exception as ex:
+            logger.warning(f"Cannot write cached grid data {cachefile}: {ex}")
+            if tmpfile is not None and os.path.exists(tmpfile):
+                os.remove(tmpfile)
+        return data, size, affine
+
+
+class Loader(YAML_BASE_LOADER):
+    # YAML loader for GGXF files from which inline grid data have been extracted.
+    # Records which extracted data are the data of a grid mapping.
+
+    def __init__(self, stream, griddata: list):
+        super().__init__(stream)
+        self._griddata = griddata
+        self._gridDataUsed = set()
+
+    def construct_mapping(self, node, deep=False):
+        if isinstance(node, yaml.MappingNode):
+            keys = [knode.value for knode, vnode in node.value]
+            if GRID_ATTR_GRID_NAME in keys:
+                for knode, vnode in node.value:
+                    if (
+                        knode.value == GRID_ATTR_DATA
+                        and vnode.tag == YAML_GRID_DATA_TAG
+                    ):
+                        self._gridDataUsed.add(int(vnode.value))
+        return super().construct_mapping(node, deep)
+
+    def constructInlineGridData(self, node):
+        return self._griddata[int(self.construct_scalar(node))]
+
+    def misplacedGridData(self):
+        return [
+            gdata
+            for index, gdata in enumerate(self._griddata)
+            if index not in self._gridDataUsed
+        ]
+
+
+Loader.add_constructor(YAML_GRID_DATA_TAG, Loader.constructInlineGridData)
+
+
 class Reader(BaseReader):
     @staticmethod
     def Read(yaml_file: str, options: dict = None) -> GGXF:
@@ -101,6 +409,28 @@ class Reader(BaseReader):
         self._useDummyGridData = self.getBoolOption(
             YAML_OPTION_CREATE_DUMMY_GRID_DATA, False
         )
+        self._lazyLoad = self.getBoolOption(YAML_OPTION_LAZY_LOAD, False)
+        self._gridCache = None
+        if self._lazyLoad:
+            cachemb = self.getOption(
+                YAML_OPTION_GRID_CACHE_MB, YAML_DEFAULT_GRID_CACHE_MB
+            )
+            try:
+                cachebytes = int(float(cachemb) * 1024 * 1024)
+            except ValueError:
+                raise Error(f"Invalid {YAML_OPTION_GRID_CACHE_MB} option {cachemb}")
+            self._gridCache = GridDataCache(cachebytes)
+        threads = self.getOption(YAML_OPTION_LOAD_THREADS, YAML_DEFAULT_LOAD_THREADS)
+        try:
+            self._loadThreads = int(threads)
+        except ValueError:
+            raise Error(f"Invalid {YAML_OPTION_LOAD_THREADS} option {threads}")
+        self._gridDirectory = None
+        self._sourceData = {}
+        self._sourceCache = None
+        cachedir = self.getOption(YAML_OPTION_SOURCE_CACHE_DIRECTORY)
+        if cachedir is not None:
+            self._sourceCache = SourceDataCache(cachedir)
         self._logger = logging.getLogger("GGXF.YamlReader")
         self.validator().update(GGXF_Types.YamlAttributes)
 
@@ -111,7 +441,8 @@ class Reader(BaseReader):
             if not os.path.isfile(yaml_file):
                 raise Error(f"{yaml_file} does not exist or is not a file")
             try:
-                ydata = yaml.load(open(yaml_file).read(), Loader=yaml.SafeLoader)
+                with open(yaml_file) as yamlh:
+                    ydata = LoadYamlText(yamlh.read())
             except Exception as ex:
                 raise Error(f"Cannot parse YAML in {yaml_file}: {ex}")
             if not isinstance(ydata, dict):
@@ -123,8 +454,22 @@ class Reader(BaseReader):
                 )
             ygroups = ydata.pop(GGXF_ATTR_GGXF_GROUPS, [])
             ggxf = GGXF(ydata)
+            groups = []
             for ygroup in ygroups:
-                self.loadGroup(ggxf, ygroup)
+                groupdef = self.createGroup(ggxf, ygroup)
+                if groupdef is not None:
+                    groups.append(groupdef)
+            self._gridDirectory = os.path.abspath(
+                self.getOption(YAML_OPTION_GRID_DIRECTORY, os.getcwd())
+            )
+            pool = self.loadDataSources(groups)
+            try:
+                for group, ygrids in groups:
+                    self.loadGroup(ggxf, group, ygrids)
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+                self._sourceData = {}
             ggxf.configure(self.error)
             if not self._loadok:
                 ggxf = None
@@ -135,18 +480,63 @@ class Reader(BaseReader):
             ggxf = None
         return ggxf
 
-    def loadGroup(self, ggxf: GGXF, ygroup: dict):
+    def createGroup(self, ggxf: GGXF, ygroup: dict):
+        # Returns the group and the definitions of its grids, or None if the group
+        # attributes are not valid
         context = f"Group {ygroup.get(GROUP_ATTR_GGXF_GROUP_NAME,'unnamed')}"
-        if self.validator().validateGroupAttributes(ygroup, context=context):
-            groupname = ygroup.pop(GROUP_ATTR_GGXF_GROUP_NAME, None)
-            ygrids = ygroup.pop(GROUP_ATTR_GRIDS, [])
-            # Need to handle parameter validation here
-            group = Group(ggxf, groupname, ygroup)
-            group.configureParameters(self.error)
-            for ygrid in ygrids:
-                self.loadGrid(group, ygrid)
-            group.configure(self.error)
-            ggxf.addGroup(group)
+        if not self.validator().validateGroupAttributes(ygroup, context=context):
+            return None
+        groupname = ygroup.pop(GROUP_ATTR_GGXF_GROUP_NAME, None)
+        ygrids = ygroup.pop(GROUP_ATTR_GRIDS, [])
+        # Need to handle parameter validation here
+        group = Group(ggxf, groupname, ygroup)
+        group.configureParameters(self.error)
+        return group, ygrids
+
+    def loadGroup(self, ggxf: GGXF, group: Group, ygrids: list):
+        for ygrid in ygrids:
+            self.loadGrid(group, ygrid)
+        group.configure(self.error)
+        ggxf.addGroup(group)
+
+    def loadDataSources(self, groups: list):
+        # Start loading the data of all grids defined by a dataSource in a pool of
+        # threads.  loadExternalGrid uses the results as each grid is installed so
+        # that the grids and any errors are handled in the order they are defined.
+        # Returns the thread pool, or None if the data are loaded by loadExternalGrid.
+        if self._useDummyGridData or self._loadThreads < 2:
+            return None
+        sources = []
+        for group, ygrids in groups:
+            self.collectDataSources(group, ygrids, sources)
+        if len(sources) < 2:
+            return None
+        pool = ThreadPoolExecutor(
+            max_workers=min(self._loadThreads, len(sources)),
+            thread_name_prefix="GGXF-load",
+        )
+        for group, datasource, loader in sources:
+            self._sourceData[id(datasource)] = pool.submit(
+                self.loadSourceData, loader, group, datasource
+            )
+        return pool
+
+    def collectDataSources(self, group: Group, ygrids: list, sources: list):
+        # Add the (group, datasource, loader) for each grid and child grid defined by a
+        # dataSource to sources.  Invalid definitions are reported by loadGrid.
+        if not isinstance(ygrids, list):
+            return
+        for ygrid in ygrids:
+            if not isinstance(ygrid, dict):
+                continue
+            datasource = ygrid.get(GRID_ATTR_DATA_SOURCE)
+            if isinstance(datasource, dict) and GRID_ATTR_DATA not in ygrid:
+                try:
+                    loader = self.gridLoader(datasource)
+                    sources.append((group, datasource, loader))
+                except Exception:
+                    pass
+            self.collectDataSources(group, ygrid.get(GRID_ATTR_CHILD_GRIDS), sources)
 
     def installDummyGrid(self, group: Group, ygrid: dict):
         nparam = group.nparam()
@@ -172,7 +562,7 @@ class Reader(BaseReader):
         if GRID_ATTR_DATA_SOURCE in ygrid and GRID_ATTR_DATA not in ygrid:
             datasource = ygrid.pop(GRID_ATTR_DATA_SOURCE)
             ygrid[GRID_ATTR_DATA] = None
-            self.installGridFromSource(group, ygrid, datasource)
+            self.loadExternalGrid(group, ygrid, datasource)
             if SOURCE_ATTR_PARAMETER_TRANSFORMATION in datasource:
                 self.applyParameterTransformation(
                     group,
@@ -185,8 +575,17 @@ class Reader(BaseReader):
             gdata = ygrid.pop(GRID_ATTR_DATA, [])
             cgrids = ygrid.pop(GRID_ATTR_CHILD_GRIDS, [])
             gridname = ygrid.pop(GRID_ATTR_GRID_NAME)
-            data = self.splitGridByParamSet(group, gdata)
-            grid = Grid(group, gridname, ygrid, data)
+            if isinstance(gdata, InlineGridData):
+                grid = Grid(group, gridname, ygrid)
+                ni = ygrid.get(GRID_ATTR_I_NODE_COUNT)
+                nj = ygrid.get(GRID_ATTR_J_NODE_COUNT)
+                grid.setDataLoader(
+                    lambda: self.gridDataArray(group, gridname, ni, nj, gdata),
+                    self._gridCache,
+                )
+            else:
+                data = self.splitGridByParamSet(group, gdata)
+                grid = Grid(group, gridname, ygrid, data)
             for cgrid in cgrids:
                 self.loadGrid(group, cgrid, grid)
             if parent:
@@ -194,14 +593,22 @@ class Reader(BaseReader):
             else:
                 group.addGrid(grid)
 
-    def installGridFromSource(self, group: Group, ygrid: dict, datasource: dict):
-        startdir = os.getcwd()
-        griddir = self.getOption(YAML_OPTION_GRID_DIRECTORY, startdir)
-        try:
-            os.chdir(griddir)
-            self.loadExternalGrid(group, ygrid, datasource)
-        finally:
-            os.chdir(startdir)
+    def loadSourceData(self, loader, group: Group, datasource: dict):
+        # Returns the grid data, inferred size, and inferred affine coefficients
+        # from the data source, using the source cache if it is configured
+        if self._sourceCache is not None:
+            return self._sourceCache.loadGrid(
+                loader, group, datasource, self._logger, self._gridDirectory
+            )
+        return loader.LoadGrid(group, datasource, self._logger, self._gridDirectory)
+
+    def gridLoader(self, datasource: dict):
+        # Returns the GridLoader module for the data source
+        datasourceType = datasource.get(SOURCE_ATTR_SOURCE_TYPE)
+        if not re.match(r"^[\w\-]+$", datasourceType):
+            raise RuntimeError(f"Invalid {SOURCE_ATTR_SOURCE_TYPE}")
+        datasourceModule = datasourceType.replace("-", "_")
+        return importlib.import_module(f"..GridLoader.{datasourceModule}", __name__)
 
     def loadExternalGrid(self, group: Group, ygrid, datasource):
         # NOTE: This probably needs additional options for selecting bands,
@@ -217,12 +624,7 @@ class Reader(BaseReader):
             return
 
         try:
-            if not re.match(r"^[\w\-]+$", datasourceType):
-                raise RuntimeError(f"Invalid {SOURCE_ATTR_SOURCE_TYPE}")
-            datasourceModule = datasourceType.replace("-", "_")
-            loader = importlib.import_module(
-                f"..GridLoader.{datasourceModule}", __name__
-            )
+            loader = self.gridLoader(datasource)
         except Exception as ex:
             self.error(
                 f"Grid {gridname}: Cannot install loader for datatype {datasourceType}: {ex}"
@@ -234,10 +636,16 @@ class Reader(BaseReader):
         #        if (eg [ni.nj,nparam])
         #   inferredSize - The grid size (ni,nj) if it can be inferred from the data source
         #   inferredAffine - The affine transformation coeffs if they can be inferred from the data source
+        #
+        # Relative file names in the data source are relative to the grid directory.
+        # The grid may already be loading in a thread (see loadDataSources).
         try:
-            gridData, inferredSize, inferredAffine = loader.LoadGrid(
-                group, datasource, self._logger
-            )
+            future = self._sourceData.pop(id(datasource), None)
+            if future is not None:
+                result = future.result()
+            else:
+                result = self.loadSourceData(loader, group, datasource)
+            gridData, inferredSize, inferredAffine = result
         except Exception as ex:
             self.error(f"Grid {gridname}: Failed to load - {ex}")
             return
@@ -303,29 +711,41 @@ class Reader(BaseReader):
                 self.error(f"Error in {SOURCE_ATTR_PARAMETER_TRANSFORMATION}: {ex}")
 
     def validateGridData(self, group, ygrid):
-        gridname = ygrid.get(GRID_ATTR_GRID_NAME, "unnamed")
         data = ygrid.get(GRID_ATTR_DATA)
         if data is None:
             return
-        nparam = group.nparam()
+        if self._lazyLoad and isinstance(data, InlineGridData):
+            # Converted when the grid data is first used (see loadGrid)
+            return
+        gridname = ygrid.get(GRID_ATTR_GRID_NAME, "unnamed")
         ni = ygrid.get(GRID_ATTR_I_NODE_COUNT)
         nj = ygrid.get(GRID_ATTR_J_NODE_COUNT)
+        try:
+            ygrid[GRID_ATTR_DATA] = self.gridDataArray(group, gridname, ni, nj, data)
+        except Error as ex:
+            self.error(str(ex))
+
+    def gridDataArray(self, group, gridname, ni, nj, data):
+        # Convert the grid data to an (ni,nj,nparam) array, masked if the grid
+        # parameters have a noDataFlag.  Raises an Error if the data are not valid.
+        nparam = group.nparam()
+        if isinstance(data, InlineGridData):
+            try:
+                data = data.array()
+            except Exception:
+                raise Error(f"Failed to load grid {gridname} data into an array")
         if not isinstance(data, np.ndarray):
             try:
                 data = np.array(data)
             except:
-                self.error(f"Failed to load grid {gridname} data into an array")
-                return
-            dtype = data.dtype
-            if dtype == np.dtype("object"):
-                self.error(
-                    f"Failed to load grid {gridname} - bracketing may be inconsistent"
-                )
-            if not (
-                np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.floating)
-            ):
-                self.error(f"Failed to load grid {gridname} - not numeric data")
-                return
+                raise Error(f"Failed to load grid {gridname} data into an array")
+        dtype = data.dtype
+        if dtype == np.dtype("object"):
+            raise Error(
+                f"Failed to load grid {gridname} - bracketing may be inconsistent"
+            )
+        if not (np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.floating)):
+            raise Error(f"Failed to load grid {gridname} - not numeric data")
 
         size = data.size
         shape = data.shape
@@ -333,74 +753,64 @@ class Reader(BaseReader):
         # YAML grid order expects row, column, param corresponding to nj,ni,nparam
         expectedShape = (ni, nj, nparam)
 
-        gridok = True
         if size != expectedSize:
-            gridok = False
-            self.error(
+            raise Error(
                 f"Grid {gridname}: size {size} different to expected {expectedSize}"
             )
         # Valid option for number of dimensions
-        if gridok and len(shape) > len(expectedShape):
-            gridok = False
-            self.error(
+        if len(shape) > len(expectedShape):
+            raise Error(
                 f"Grid {gridname}: more dimensions ({len(shape)}) than expected ({len(expectedShape)})"
             )
-        if gridok and shape != expectedShape:
+        if shape != expectedShape:
             # Is the grid transposed?
             if (
-                gridok
-                and shape[0] != expectedShape[0]
+                shape[0] != expectedShape[0]
                 and shape[0] == expectedShape[1]
                 and shape[1] == expectedShape[0]
             ):
-                gridok = False
-                self.error(f"Grid {gridname}: grid dimension wrong - likely transposed")
+                raise Error(
+                    f"Grid {gridname}: grid dimension wrong - likely transposed"
+                )
             # Check for flattening options of source grid.  This works because we already know the size is correct
-            if gridok:
-                shp = [*shape]
-                eshp = [*expectedShape]
-                while len(shp) > 0 and len(eshp) > 0:
-                    if shp[0] == eshp[0]:
-                        shp.pop(0)
-                        eshp.pop(0)
-                    elif shp[0] > eshp[0]:
-                        e0 = eshp.pop(0)
-                        eshp[0] *= e0
-                    else:
-                        gridok = False
-                        self.error(
-                            f"Grid {gridname}: YAML dimensions ({shape}) don't match expected {(expectedShape)} (ni,nj,np)"
-                        )
-                        break
+            shp = [*shape]
+            eshp = [*expectedShape]
+            while len(shp) > 0 and len(eshp) > 0:
+                if shp[0] == eshp[0]:
+                    shp.pop(0)
+                    eshp.pop(0)
+                elif shp[0] > eshp[0]:
+                    e0 = eshp.pop(0)
+                    eshp[0] *= e0
+                else:
+                    raise Error(
+                        f"Grid {gridname}: YAML dimensions ({shape}) don't match expected {(expectedShape)} (ni,nj,np)"
+                    )
             # Grid shape is compatible, so can reshape the grid to match.  Relies on numpy using row major ordering
             # internally for reshape.
+            data = data.reshape(expectedShape)
 
-            if gridok:
-                data = data.reshape(expectedShape)
-        if gridok:
-            if data.dtype != self._dtype:
-                data = data.astype(self._dtype)
-            self._logger.debug(
-                f"Grid {gridname} loaded - dimensions {data.shape}, type {data.dtype}"
-            )
-            # Mask the array if it contains missing values
-
-            mask = None
-            for iparam, param in enumerate(group.parameters()):
-                noDataFlag = param.noDataFlag()
-                if noDataFlag is not None:
-                    if mask is None:
-                        mask = np.zeros(data.shape, dtype=bool)
-                    mask[:, :, iparam] = data[:, :, iparam] == noDataFlag
-
-            if mask is not None:
-                nmissing = np.count_nonzero(mask)
-                self._logger.debug(
-                    f"Grid {gridname} - masking {nmissing} missing values"
-                )
-                if nmissing > 0:
-                    data = np.ma.masked_array(data, mask=mask)
-            ygrid[GRID_ATTR_DATA] = data
+        if data.dtype != self._dtype:
+            data = data.astype(self._dtype)
+        self._logger.debug(
+            f"Grid {gridname} loaded - dimensions {data.shape}, type {data.dtype}"
+        )
+        # Mask the array if it contains missing values
+
+        mask = None
+        for iparam, param in enumerate(group.parameters()):
+            noDataFlag = param.noDataFlag()
+            if noDataFlag is not None:
+                if mask is None:
+                    mask = np.zeros(data.shape, dtype=bool)
+                mask[:, :, iparam] = data[:, :, iparam] == noDataFlag
+
+        if mask is not None:
+            nmissing = np.count_nonzero(mask)
+            self._logger.debug(f"Grid {gridname} - masking {nmissing} missing values")
+            if nmissing > 0:
+                data = np.ma.masked_array(data, mask=mask)
+        return data
 
     def splitGridByParamSet(self, group, gdata):
         # Placeholder for representing data in sets rather than single grid.
@@ -411,10 +821,12 @@ class Reader(BaseReader):
 
 
 class Writer(BaseWriter):
-    # PyYAML has an annoying trait of adding tags.  While it makes the YAML loader "safe"
-    # it is not consistent with the GGXF YAML spec.  To get around this the YAML is first written
-    # to a string, the tags are removed with a regular expression, and then the YAML is written to the
-    # output file.  This may die for large GGXF files!
+    # The YAML file is written incrementally rather than passing the whole GGXF
+    # object to yaml.safe_dump, so that large GGXF files can be written in bounded
+    # memory.  The metadata of the GGXF, each group, and each grid are written with
+    # yaml.safe_dump and indented to their place in the document.  Inline grid
+    # data is written directly as a block sequence of flow style rows, a block of
+    # rows at a time.
     #
     # Another option for YAML would be to write to JSON.
 
@@ -433,9 +845,6 @@ class Writer(BaseWriter):
     def write(self, ggxf, yaml_file):
         # Not sure about this code - changes the YAML module I think?
         dumper = yaml.SafeDumper
-        dumper.add_representer(GGXF, self._writeGgxfHeader)
-        dumper.add_representer(Group, self._writeGgxfGroup)
-        dumper.add_representer(Grid, self._writeGgxfGrid)
         dumper.add_representer(np.ndarray, Util.dumpNdArray)
         dumper.add_representer(str, Util.dumpString)
         self._headerOnly = self.getBoolOption(YAML_OPTION_WRITE_HEADERS_ONLY, False)
@@ -444,32 +853,55 @@ class Writer(BaseWriter):
         self._csvIndices = self.getBoolOption(YAML_OPTION_WRITE_CSV_NODE_INDICES, False)
         self._csvFileTemplate = os.path.splitext(yaml_file)[0] + "-{csvid}.csv"
         self._csvFileGridNames = {}
-        self._crdFormat = f"{{:{CSV_COORDINATE_FORMAT}}}".format
-        self._prmFormat = f"{{:{CSV_PARAMETER_FORMAT}}}".format
         self._yamlFileDir = os.path.dirname(yaml_file)
         filename = os.path.basename(yaml_file)
         ggxf.setFilename(filename)
 
         with open(yaml_file, "w") as yamlh:
-            yaml.safe_dump(ggxf, yamlh, indent=2, sort_keys=False)
+            self._writeGgxfHeader(yamlh, ggxf)
+
+    def _writeYaml(self, yamlh, data, indent=0):
+        # Write data with yaml.safe_dump, indented by indent spaces
+        text = yaml.safe_dump(data, indent=2, sort_keys=False)
+        if indent > 0:
+            prefix = " " * indent
+            text = "".join(
+                prefix + line if line.strip() else line
+                for line in text.splitlines(keepends=True)
+            )
+        yamlh.write(text)
 
-    def _writeGgxfHeader(self, dumper, ggxf):
-        ydata = ggxf.metadata().copy()
-        ydata[GGXF_ATTR_GGXF_GROUPS] = ggxf._groups
-        return dumper.represent_mapping(YAML_MAP_TAG, ydata)
+    def _writeSequence(self, yamlh, key, items, writer, indent):
+        # Write a sequence of GGXF objects (groups or grids) using writer
+        prefix = " " * indent
+        if not items:
+            yamlh.write(f"{prefix}{key}: []\n")
+            return
+        yamlh.write(f"{prefix}{key}:\n")
+        for item in items:
+            writer(yamlh, item, indent)
+
+    def _writeGgxfHeader(self, yamlh, ggxf):
+        self._writeYaml(yamlh, ggxf.metadata())
+        self._writeSequence(
+            yamlh, GGXF_ATTR_GGXF_GROUPS, ggxf._groups, self._writeGgxfGroup, 0
+        )
 
-    def _writeGgxfGroup(self, dumper, group):
+    def _writeGgxfGroup(self, yamlh, group, indent):
         ydata = {GROUP_ATTR_GGXF_GROUP_NAME: group.name()}
         ydata.update(group.metadata())
-        ydata[GROUP_ATTR_GRIDS] = group.grids()
-        return dumper.represent_mapping(YAML_MAP_TAG, ydata)
+        self._writeYaml(yamlh, [ydata], indent)
+        self._writeSequence(
+            yamlh, GROUP_ATTR_GRIDS, group.grids(), self._writeGgxfGrid, indent + 2
+        )
 
-    def _writeGgxfGrid(self, dumper, grid):
+    def _writeGgxfGrid(self, yamlh, grid, indent):
         ydata = {GRID_ATTR_GRID_NAME: grid.name()}
         ydata.update(grid.metadata())
         # Convert to numpy array so that they get picked up by representer with [] style of sequence.
         ydata[GRID_ATTR_AFFINE_COEFFS] = np.array(ydata[GRID_ATTR_AFFINE_COEFFS])
         ydata.pop(GRID_ATTR_DATA, None)
+        data = None
         if not self._headerOnly:
             data = self._gridDataWithNoDataFlag(grid)
             if self._csvGrids:
@@ -478,15 +910,37 @@ class Writer(BaseWriter):
                     SOURCE_ATTR_SOURCE_TYPE: SOURCE_TYPE_GGXF_CSV,
                     SOURCE_ATTR_GRID_FILENAME: gridfile,
                 }
-            else:
-                ygrid = data
-                shape = ygrid.shape
-                if len(shape) == 3 and shape[2] == 1:
-                    ygrid = data.reshape(shape[:2])
-                ydata[GRID_ATTR_DATA] = ygrid
+                data = None
+        self._writeYaml(yamlh, [ydata], indent)
+        if data is not None:
+            self._writeGridData(yamlh, data, indent + 2)
         if len(grid.grids()) > 0:
-            ydata[GRID_ATTR_CHILD_GRIDS] = grid.grids()
-        return dumper.represent_mapping(YAML_MAP_TAG, ydata)
+            self._writeSequence(
+                yamlh,
+                GRID_ATTR_CHILD_GRIDS,
+                grid.grids(),
+                self._writeGgxfGrid,
+                indent + 2,
+            )
+
+    def _writeGridData(self, yamlh, data, indent):
+        # Write the grid data as a flow sequence, laid out exactly as yaml.safe_dump
+        # would write it, a block of rows at a time.
+        prefix = " " * indent
+        ni, nj, nparam = data.shape
+        if nparam == 1:
+            data = data.reshape((ni, nj))
+        yamlh.write(f"{prefix}{GRID_ATTR_DATA}:")
+        emitter = FlowSequenceEmitter(yamlh, indent + len(GRID_ATTR_DATA) + 1, indent)
+        emitter.startSequence()
+        blockrows = max(1, YAML_DATA_BLOCK_NODES // nj)
+        for i0 in range(0, ni, blockrows):
+            for row in data[i0 : i0 + blockrows].tolist():
+                emitter.sequenceItem(row, data.ndim - 1)
+            emitter.flush()
+        emitter.endSequence()
+        emitter.flush()
+        yamlh.write("\n")
 
     def _writeCsvGrid(self, grid, data):
         # Construct a unique grid name
@@ -497,7 +951,6 @@ class Writer(BaseWriter):
         filename = self._csvFileTemplate.replace("{csvid}", f"{name}{gridid:02d}")
 
         try:
-            # Consider using numpy.savetxt in the future...
             with open(filename, "w") as csvh:
                 csvw = csv.writer(csvh)
                 header = []
@@ -506,24 +959,85 @@ class Writer(BaseWriter):
                 if self._csvCoords:
                     header.extend(grid.group().ggxf().nodeCoordinateParameters())
                 csvw.writerow((*header, *grid.group().parameterNames()))
-                shape = data.shape
-                crd = []
-                indices = []
-                for inode in range(shape[0]):
-                    for jnode in range(shape[1]):
-                        if self._csvIndices:
-                            indices = [str(inode), str(jnode)]
-                        if self._csvCoords:
-                            xy = grid.calcxy([inode, jnode])
-                            crd = [self._crdFormat(c) for c in xy]
-                        prm = [self._prmFormat(p) for p in data[inode, jnode]]
-                        csvw.writerow([*indices, *crd, *prm])
+                self._writeCsvGridRows(csvh, grid, data)
         except Exception as ex:
             self._logger.error(f"Error saving CSV grid file {filename}: {ex}")
 
         gridfile = os.path.relpath(filename, self._yamlFileDir)
         return gridfile
 
+    def _writeCsvGridRows(self, csvh, grid, data):
+        # Write the grid nodes in blocks of rows, matching the rows written by
+        # csv.writer.  The node columns (indices and coordinates) are each
+        # defined as value = c0 + (ci * i + cj * j), the same calculation as
+        # Grid.calcxy.
+        ni, nj, nparam = data.shape
+        nodecolumns = []
+        if self._csvIndices:
+            nodecolumns.append(("%.0f", 0.0, 1.0, 0.0))
+            nodecolumns.append(("%.0f", 0.0, 0.0, 1.0))
+        if self._csvCoords:
+            for xy0, (ci, cj) in zip(grid._xy0.tolist(), grid._tfm.tolist()):
+                nodecolumns.append((f"%{CSV_COORDINATE_FORMAT}", xy0, ci, cj))
+        paramformat = ",".join((f"%{CSV_PARAMETER_FORMAT}",) * nparam) + "\r\n"
+        blockrows = max(1, CSV_WRITE_BLOCK_NODES // nj)
+        if all(ci == 0.0 or cj == 0.0 for _, _, ci, cj in nodecolumns):
+            rows = self._csvGridRowsSeparable(nodecolumns, paramformat, ni, nj)
+            for i0 in range(0, ni, blockrows):
+                i1 = min(ni, i0 + blockrows)
+                csvh.write(
+                    "".join(
+                        [
+                            next(rows) % tuple(data[i].ravel().tolist())
+                            for i in range(i0, i1)
+                        ]
+                    )
+                )
+            return
+
+        # Otherwise compile an array of the node columns and parameters for each
+        # block and format it with a single format string.
+        rowformat = ",".join([c[0] for c in nodecolumns] + [paramformat])
+        for i0 in range(0, ni, blockrows):
+            i1 = min(ni, i0 + blockrows)
+            inode, jnode = np.indices((i1 - i0, nj), dtype=np.float64)
+            inode = (inode + i0).ravel()
+            jnode = jnode.ravel()
+            columns = [c0 + (ci * inode + cj * jnode) for _, c0, ci, cj in nodecolumns]
+            columns.append(data[i0:i1].reshape(((i1 - i0) * nj, nparam)))
+            block = np.column_stack(columns)
+            csvh.write((rowformat * block.shape[0]) % tuple(block.ravel().tolist()))
+
+    def _csvGridRowsSeparable(self, nodecolumns, paramformat, ni, nj):
+        # Generates for each grid row i a format string for the nodes of the row
+        # requiring just the parameter values.  Used when each node column
+        # depends only on i or only on j, as for a grid aligned with the
+        # coordinate axes, so each node column value is formatted just once.
+        inode = np.arange(ni, dtype=np.float64)
+        jnode = np.arange(nj, dtype=np.float64)
+        jcolumns = []
+        icolumns = []
+        for format, c0, ci, cj in nodecolumns:
+            if ci == 0.0:
+                values = c0 + (ci * 0.0 + cj * jnode)
+                jcolumns.append([format % v for v in values.tolist()])
+            else:
+                # Placeholder for the value replaced in each row
+                placeholder = chr(1 + len(icolumns))
+                values = c0 + (ci * inode + cj * 0.0)
+                icolumns.append((placeholder, [format % v for v in values.tolist()]))
+                jcolumns.append([placeholder] * nj)
+        template = "".join(
+            [",".join([*nodes, paramformat]) for nodes in zip(*jcolumns)]
+            if jcolumns
+            else [paramformat] * nj
+        )
+        for i in range(ni):
+            rowformat = template
+            for placeholder, values in icolumns:
+                rowformat = rowformat.replace(placeholder, values[i])
+            yield rowformat
+
     def _gridDataWithNoDataFlag(self, grid):
         data = grid.data()
         if isinstance(data, np.ma.core.MaskedArray):
@@ -547,6 +1061,83 @@ class Writer(BaseWriter):
         return data
 
 
+class FlowSequenceEmitter:
+    # Writes nested lists of numbers as a YAML flow sequence with the same layout as
+    # the PyYAML emitter, which breaks a line after a "," or "[" once the line is
+    # longer than the emitter width.  Each nested sequence is indented a further
+    # YAML_EMITTER_INDENT spaces from the indent of the mapping containing it.
+
+    def __init__(self, output, column: int, indent: int):
+        self._output = output
+        self._parts = []
+        self._column = column
+        self._whitespace = False
+        self._indent = indent
+        self._first = True
+
+    def flush(self):
+        self._output.write("".join(self._parts))
+        self._parts = []
+
+    def startSequence(self):
+        self._indicator("[", True, True)
+        self._indent += YAML_EMITTER_INDENT
+        self._first = True
+
+    def endSequence(self):
+        self._indent -= YAML_EMITTER_INDENT
+        self._indicator("]", False)
+        self._first = False
+
+    def sequenceItem(self, value, depth: int = 0):
+        # Write an item, which is a number or depth nested lists of numbers
+        if not self._first:
+            self._indicator(",", False)
+        if self._column > YAML_EMITTER_WIDTH:
+            self._lineBreak()
+        if depth > 0:
+            self.startSequence()
+            for item in value:
+                self.sequenceItem(item, depth - 1)
+            self.endSequence()
+        else:
+            self._scalar(FlowSequenceEmitter.formatNumber(value))
+        self._first = False
+
+    @staticmethod
+    def formatNumber(value):
+        # Representation of numbers used by the YAML representer
+        if not isinstance(value, float):
+            return str(value)
+        if value != value:
+            return ".nan"
+        if value in (np.inf, -np.inf):
+            return ".inf" if value > 0 else "-.inf"
+        text = repr(value)
+        if "." not in text and "e" in text:
+            text = text.replace("e", ".0e", 1)
+        return text
+
+    def _indicator(self, indicator, needWhitespace, whitespace=False):
+        if needWhitespace and not self._whitespace:
+            indicator = " " + indicator
+        self._parts.append(indicator)
+        self._column += len(indicator)
+        self._whitespace = whitespace
+
+    def _scalar(self, text):
+        if not self._whitespace:
+            text = " " + text
+        self._parts.append(text)
+        self._column += len(text)
+        self._whitespace = False
+
+    def _lineBreak(self):
+        self._parts.append("\n" + " " * self._indent)
+        self._column = self._indent
+        self._whitespace = True
+
+
 class Util:
     @staticmethod
     def dumpNdArray(dumper, data):
@@ -1,12 +1,23 @@
 #!/usr/bin/python3
 
 import argparse
+import collections
 import csv
+import functools
+import itertools
+import json
 import logging
+import multiprocessing
 import os.path
 import re
 import sys
+import time
 
+import numpy as np
+
+from .Binary import BINARY_READ_OPTIONS, BINARY_WRITE_OPTIONS
+from .Binary import Reader as BinaryReader
+from .Binary import Writer as BinaryWriter
 from .Constants import *
 from .GdalImport import (
     EpsgCacheFileEnv,
@@ -14,7 +25,13 @@ from .GdalImport import (
     GdalDriverConfigFileEnv,
     GdalImporter,
 )
-from .NetCDF import NETCDF_READ_OPTIONS, NETCDF_WRITE_OPTIONS
+from .NetCDF import (
+    NETCDF_OPTION_BOUNDING_BOX,
+    NETCDF_OPTION_GRID_CACHE_MB,
+    NETCDF_OPTION_LAZY_LOAD,
+    NETCDF_READ_OPTIONS,
+    NETCDF_WRITE_OPTIONS,
+)
 from .NetCDF import Reader as NetCdfReader
 from .NetCDF import Writer as NetCdfWriter
 from .YAML import YAML_READ_OPTIONS, YAML_WRITE_OPTIONS
@@ -27,6 +44,7 @@ CMDARG_IMPORT = "import"
 CMDARG_DESCRIBE = "describe"
 CMDARG_CALCULATE = "calculate"
 CMDARG_CHECK = "check"
+CMDARG_SUBSET = "subset"
 
 SubcommandHelp = f"""Action to perform, one of:
   {CMDARG_CONVERT}: Convert between YAML and NetCDF GGXF formats
@@ -34,6 +52,7 @@ SubcommandHelp = f"""Action to perform, one of:
   {CMDARG_DESCRIBE}: Describe the contents of a GGXF file
   {CMDARG_CALCULATE}: Calculate parameter values using data in GGXF file
   {CMDARG_CHECK}: Check interpolated parameter values at embedded check points
+  {CMDARG_SUBSET}: Write a GGXF file restricted to a region, groups, or time window
 For more help on an option use the action followed by -h.
 """
 
@@ -55,6 +74,7 @@ def main():
         addDescribeParser,
         addCalculateParser,
         addCheckParser,
+        addSubsetParser,
         addImportParser,
     ):
         parser = addparser(subparsers)
@@ -64,6 +84,8 @@ def main():
         args = rootParser.parse_args()
         setLogLevel(args)
         args.function(args)
+        if args.profile:
+            printProfile(args)
     except Exception as ex:
         print(f"Failed: {ex}")
         sys.exit(1)
@@ -75,13 +97,13 @@ def main():
 
 def addInputGgxfArguments(parser):
     parser.add_argument(
-        "input_ggxf_file", help="Input GGXF file, either .yaml or .ggxf"
+        "input_ggxf_file", help="Input GGXF file, either .yaml, .ggxf, or .ggxb"
     )
 
 
 def addOutputGgxfArguments(parser):
     parser.add_argument(
-        "output_ggxf_file", help="Output GGXF file, either .yaml or .ggxf"
+        "output_ggxf_file", help="Output GGXF file, either .yaml, .ggxf, or .ggxb"
     )
 
 
@@ -100,6 +122,12 @@ def addFormatOptionArguments(parser):
         metavar="option=value",
         help="Format options for YAML files",
     )
+    parser.add_argument(
+        "--binary-options",
+        action="append",
+        metavar="option=value",
+        help="Format options for binary (.ggxb) files",
+    )
 
 
 def compileFormatOptions(source):
@@ -121,6 +149,9 @@ Format options for reading a YAML GGXF file can be
 
 Format options for reading a NetCDF4 GGXF file can be
 {NETCDF_READ_OPTIONS}
+
+Format options for reading a binary GGXF file can be
+{BINARY_READ_OPTIONS}
 """
 
 
@@ -131,10 +162,39 @@ Format options for writing a YAML GGXF file can be:
 
 Format options for writing a NetCDF4 GGXF file can be:
 {NETCDF_WRITE_OPTIONS}
+
+Format options for writing a binary GGXF file can be:
+{BINARY_WRITE_OPTIONS}
 """
 
 
 def loadGgxfInputFile(args):
+    starttime = time.perf_counter()
+    ggxf = readGgxfFile(args)
+    if getattr(args, "profile", False) and ggxf is not None:
+        args.profile_times["read"] = time.perf_counter() - starttime
+        args.profile_ggxf = ggxf
+        ggxf.setProfile()
+    threads = getattr(args, "threads", 1)
+    if threads > 1 and ggxf is not None:
+        ggxf.setThreads(threads)
+    return ggxf
+
+
+def inputGgxfFileArgs(args):
+    # The arguments used by loadGgxfInputFile to load the input file, without the
+    # profile data.  These are passed to processes which load the file.
+    return argparse.Namespace(
+        input_ggxf_file=args.input_ggxf_file,
+        yaml_options=args.yaml_options,
+        netcdf4_options=args.netcdf4_options,
+        binary_options=args.binary_options,
+        debug=args.debug,
+        threads=getattr(args, "threads", 1),
+    )
+
+
+def readGgxfFile(args):
     ggxf_file = args.input_ggxf_file
     if ggxf_file.endswith(".yaml"):
         yaml_options = compileFormatOptions(args.yaml_options)
@@ -142,9 +202,12 @@ def loadGgxfInputFile(args):
     elif ggxf_file.endswith(".ggxf"):
         netcdf_options = compileFormatOptions(args.netcdf4_options)
         ggxf = NetCdfReader.Read(ggxf_file, options=netcdf_options)
+    elif ggxf_file.endswith(".ggxb"):
+        binary_options = compileFormatOptions(args.binary_options)
+        ggxf = BinaryReader.Read(ggxf_file, options=binary_options)
     else:
         raise RuntimeError(
-            f"GGXF filename {ggxf_file} must have extension .yaml or .ggxf (NetCDF)"
+            f"GGXF filename {ggxf_file} must have extension .yaml, .ggxf (NetCDF), or .ggxb (binary)"
         )
     if args.debug:
         ggxf.setDebug()
@@ -152,6 +215,13 @@ def loadGgxfInputFile(args):
 
 
 def saveGgxfOutputFile(ggxf, args):
+    starttime = time.perf_counter()
+    writeGgxfFile(ggxf, args)
+    if getattr(args, "profile", False):
+        args.profile_times["write"] = time.perf_counter() - starttime
+
+
+def writeGgxfFile(ggxf, args):
     output_ggxf_file = args.output_ggxf_file
     if output_ggxf_file.endswith(".yaml"):
         yaml_options = compileFormatOptions(args.yaml_options)
@@ -159,9 +229,12 @@ def saveGgxfOutputFile(ggxf, args):
     elif output_ggxf_file.endswith(".ggxf"):
         netcdf_options = compileFormatOptions(args.netcdf4_options)
         NetCdfWriter.Write(ggxf, output_ggxf_file, options=netcdf_options)
+    elif output_ggxf_file.endswith(".ggxb"):
+        binary_options = compileFormatOptions(args.binary_options)
+        BinaryWriter.Write(ggxf, output_ggxf_file, options=binary_options)
     else:
         raise RuntimeError(
-            f"GGXF output filename {output_ggxf_file} must have extension .yaml or .ggxf (NetCDF)"
+            f"GGXF output filename {output_ggxf_file} must have extension .yaml, .ggxf (NetCDF), or .ggxb (binary)"
         )
 
 
@@ -172,9 +245,16 @@ def addLoggingArguments(parser):
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="More verbose output"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print file read/write times and GGXF evaluation statistics",
+    )
 
 
 def setLogLevel(args):
+    args.profile_times = {}
+    args.profile_ggxf = None
     logging.basicConfig()
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -182,6 +262,15 @@ def setLogLevel(args):
         logging.getLogger().setLevel(logging.INFO)
 
 
+def printProfile(args):
+    # Print the statistics collected with the --profile option.
+    profile = {"time": args.profile_times}
+    if args.profile_ggxf is not None:
+        profile["ggxf"] = args.profile_ggxf.stats()
+    print("Profile statistics:")
+    print(json.dumps(profile, indent=2))
+
+
 #####################################################################################
 # Convert a GGXF file
 
@@ -396,6 +485,15 @@ The input CSV file must have a header row of field names.  The input
 coordinate are in columns nodeLatitude, nodeLongitude, or if the 
 interpolationCrs is a projection CRS then nodeEasting, nodeNorthing.
 
+With --jobs the input points are split into blocks of {CALCULATE_CHUNK_SIZE} rows which
+are calculated in separate processes.  Each process loads the GGXF file.  Using
+a binary (.ggxb) GGXF file minimises the load time and memory used as the grid
+data is memory mapped and shared by the processes.
+
+With --threads the groups of a GGXF file with multiple groups (such as a
+deformation model) are evaluated concurrently.  The results are identical to
+evaluating the groups serially.
+
 {inputFileOptions()}
 """,
         formatter_class=argparse.RawTextHelpFormatter,
@@ -432,26 +530,77 @@ interpolationCrs is a projection CRS then nodeEasting, nodeNorthing.
         help="Base epoch in years for calculating change between epochs",
         metavar="####.#",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="#",
+        help="Number of processes used to calculate values",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=1,
+        metavar="#",
+        help="Number of threads used to evaluate the groups of a multi-group GGXF",
+    )
     parser.set_defaults(function=calculateGgxf)
     return parser
 
 
 def calculateGgxf(args):
+    # The evaluation statistics are collected in the worker processes when
+    # calculating with multiple jobs, so cannot be profiled.
+    if args.profile and args.jobs > 1:
+        raise RuntimeError("--profile cannot be used with --jobs greater than 1")
     ggxf = loadGgxfInputFile(args)
     input_csv = args.csv_points_file
     output_csv = args.csv_results_file
     decimal_places = args.csv_decimal_places
     epoch = args.epoch
     refepoch = args.base_epoch
-    calculateCsvPoints(ggxf, input_csv, output_csv, epoch, refepoch, decimal_places)
+    calculateCsvPoints(
+        ggxf,
+        input_csv,
+        output_csv,
+        epoch,
+        refepoch,
+        decimal_places,
+        jobs=args.jobs,
+        ggxfLoader=functools.partial(loadGgxfInputFile, inputGgxfFileArgs(args)),
+    )
+
+
+CALCULATE_CHUNK_SIZE = 10000
+
+# GGXF model used by calculate worker processes, loaded once per process
+_calculateWorkerGgxf = None
 
 
 def calculateCsvPoints(
-    ggxf, input_csv, output_csv, epoch=None, refepoch=None, decimal_places: int = 4
+    ggxf,
+    input_csv,
+    output_csv,
+    epoch=None,
+    refepoch=None,
+    decimal_places: int = 4,
+    jobs: int = 1,
+    ggxfLoader=None,
+    chunksize: int = CALCULATE_CHUNK_SIZE,
 ):
+    # The input CSV file is processed in blocks of chunksize rows so that memory
+    # use is independent of the size of the file.
+    #
+    # If jobs > 1 then ggxfLoader is a picklable function returning the GGXF
+    # object, which is called once in each worker process.
     if not os.path.isfile(input_csv):
         raise RuntimeError(f"CSV input file {input_csv} not found")
+    if jobs > 1 and ggxfLoader is None:
+        raise RuntimeError("Calculating with multiple jobs requires a GGXF loader")
 
+    starttime = time.perf_counter()
     with open(input_csv) as inh, open(output_csv, "w") as outh:
         csvin = csv.reader(inh)
         csvout = csv.writer(outh)
@@ -469,29 +618,174 @@ def calculateCsvPoints(
                 f"Input CSV {input_csv} does not have {' and '.join(coordFields)} columns"
             )
             return
-        missingval = []
         for param in ggxf.parameters():
             cols.append(param.name())
-            missingval.append("")
         csvout.writerow(cols)
-        nrow = 1
-        for row in csvin:
-            nrow += 1
-            try:
-                output = list(row)
-                xy = [float(row[xcol]), float(row[ycol])]
-                value = ggxf.valueAt(xy, epoch, refepoch)
-                if value is None:
-                    value = missingval
-                else:
-                    value = [f"{x:.{decimal_places}f}" for x in value]
-                output.extend(value)
-            except Exception as ex:
-                logging.error(f"Error at row {nrow} of {input_csv}: {ex}")
-                output = list(row)
-                output.extend(missingval)
-                output.append(f"{ex}")
-            csvout.writerow(output)
+        calculate = functools.partial(
+            calculateCsvRows,
+            xcol=xcol,
+            ycol=ycol,
+            epoch=epoch,
+            refepoch=refepoch,
+            decimal_places=decimal_places,
+        )
+        chunks = csvRowChunks(csvin, chunksize)
+        if jobs > 1:
+            with multiprocessing.Pool(
+                jobs, initializer=_initCalculateWorker, initargs=(ggxfLoader,)
+            ) as pool:
+                results = orderedPoolResults(
+                    pool,
+                    functools.partial(_calculateWorkerRows, calculate),
+                    chunks,
+                    jobs * 2,
+                )
+                nrows = writeCalculatedRows(csvout, results, input_csv)
+        else:
+            results = (calculate(ggxf, nrow0, rows) for nrow0, rows in chunks)
+            nrows = writeCalculatedRows(csvout, results, input_csv)
+    elapsed = time.perf_counter() - starttime
+    rate = nrows / max(elapsed, 1.0e-6)
+    logging.info(
+        f"Calculated {nrows} rows in {elapsed:.2f} seconds ({rate:.0f} rows/s)"
+    )
+
+
+def csvRowChunks(csvin, chunksize):
+    # Generates (nrow0, rows) for blocks of rows from a CSV reader, where nrow0 is
+    # the row number in the file of the first row (the header is row 1)
+    nrow0 = 2
+    while True:
+        rows = list(itertools.islice(csvin, chunksize))
+        if not rows:
+            break
+        yield nrow0, rows
+        nrow0 += len(rows)
+
+
+def orderedPoolResults(pool, function, chunks, maxpending):
+    # Generates the results of function applied to each chunk in the order of the
+    # chunks.  At most maxpending chunks are queued in the pool at any time so that
+    # the input is not read faster than it is processed.
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(function, (chunk,)))
+        if len(pending) >= maxpending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def csvRowCoordinates(rows, xcol, ycol):
+    # Returns an (N,2) array of the coordinates of a block of rows and a dictionary
+    # of errors for rows that cannot be parsed, keyed on the index in the block.
+    # The coordinates of rows with errors are set to nan.
+    try:
+        xy = np.array([(row[xcol], row[ycol]) for row in rows], dtype=np.float64)
+        return xy.reshape((len(rows), 2)), {}
+    except (ValueError, IndexError):
+        pass
+    xy = np.full((len(rows), 2), np.nan)
+    errors = {}
+    for irow, row in enumerate(rows):
+        try:
+            xy[irow] = (float(row[xcol]), float(row[ycol]))
+        except Exception as ex:
+            errors[irow] = f"{ex}"
+    return xy, errors
+
+
+def calculateCsvRows(
+    ggxf, nrow0, rows, xcol, ycol, epoch=None, refepoch=None, decimal_places=4
+):
+    # Calculate the output rows for a block of input rows.  Returns the output
+    # rows and a list of errors as (row number, message).
+    xy, rowerrors = csvRowCoordinates(rows, xcol, ycol)
+    if rowerrors:
+        calcrows = np.array(
+            [irow for irow in range(len(rows)) if irow not in rowerrors], dtype=int
+        )
+        xy = xy[calcrows]
+    else:
+        calcrows = None
+    try:
+        values, valid = ggxf.valuesAt(xy, epoch, refepoch)
+    except Exception:
+        # Errors which apply to the whole block (eg invalid epochs) are reported
+        # for each row
+        return calculateCsvRowsByPoint(
+            ggxf, nrow0, rows, xcol, ycol, epoch, refepoch, decimal_places
+        )
+
+    nparam = len(ggxf.parameters())
+    missingval = [""] * nparam
+    valueformat = ",".join([f"%.{decimal_places}f"] * nparam)
+    formatted = [
+        (valueformat % tuple(value)).split(",") if isvalid else missingval
+        for value, isvalid in zip(values.tolist(), valid.tolist())
+    ]
+    if calcrows is None:
+        output = [row + value for row, value in zip(rows, formatted)]
+        return output, []
+
+    output = []
+    errors = []
+    formatted = iter(formatted)
+    for irow, row in enumerate(rows):
+        if irow in rowerrors:
+            message = rowerrors[irow]
+            errors.append((nrow0 + irow, message))
+            output.append(row + missingval + [message])
+        else:
+            output.append(row + next(formatted))
+    return output, errors
+
+
+def calculateCsvRowsByPoint(
+    ggxf, nrow0, rows, xcol, ycol, epoch=None, refepoch=None, decimal_places=4
+):
+    # Calculate the output rows for a block of input rows one point at a time.
+    missingval = [""] * len(ggxf.parameters())
+    output = []
+    errors = []
+    for nrow, row in enumerate(rows, start=nrow0):
+        try:
+            outrow = list(row)
+            xy = [float(row[xcol]), float(row[ycol])]
+            value = ggxf.valueAt(xy, epoch, refepoch)
+            if value is None:
+                value = missingval
+            else:
+                value = [f"{x:.{decimal_places}f}" for x in value]
+            outrow.extend(value)
+        except Exception as ex:
+            errors.append((nrow, f"{ex}"))
+            outrow = list(row)
+            outrow.extend(missingval)
+            outrow.append(f"{ex}")
+        output.append(outrow)
+    return output, errors
+
+
+def writeCalculatedRows(csvout, results, input_csv):
+    # Write the calculated rows and log the errors.  Returns the number of rows
+    nrows = 0
+    for output, errors in results:
+        for nrow, message in errors:
+            logging.error(f"Error at row {nrow} of {input_csv}: {message}")
+        csvout.writerows(output)
+        nrows += len(output)
+    return nrows
+
+
+def _initCalculateWorker(ggxfLoader):
+    global _calculateWorkerGgxf
+    _calculateWorkerGgxf = ggxfLoader()
+
+
+def _calculateWorkerRows(calculate, chunk):
+    nrow0, rows = chunk
+    return calculate(_calculateWorkerGgxf, nrow0, rows)
 
 
 #####################################################################################
@@ -599,6 +893,133 @@ def testGgxfCheckPoints(args):
         )
 
 
+#####################################################################################
+# Write a subset of a GGXF file
+
+# Memory limit for grid data when streaming grids from a NetCDF file
+SUBSET_GRID_CACHE_MB = 64
+
+
+def addSubsetParser(subparsers):
+    parser = subparsers.add_parser(
+        CMDARG_SUBSET,
+        description="Write a GGXF file restricted to a region, groups, or time window",
+        epilog=f"""
+The bounding box is "xmin,ymin,xmax,ymax" in interpolation CRS coordinates, where
+x and y are the first and second coordinates (eg latitude and longitude).  Grids
+are trimmed to the nodes covering the box, plus the nodes around it used by the
+interpolation method, and grids and groups outside it are omitted.  The bounding box requires a NetCDF (.ggxf) input file.  Use
+--bounding-box=xmin,ymin,xmax,ymax if xmin is negative.
+
+With --start-epoch and --end-epoch groups whose time functions are zero
+throughout the time window are omitted.  A group is omitted only if each of
+the functions in its time function is zero.
+
+A NetCDF input file is read with the {NETCDF_OPTION_LAZY_LOAD} option so that grid data
+is read from the input as it is written to the output.  Only the part of each
+grid within the bounding box is read.
+
+{inputFileOptions()}
+{outputFileOptions()}
+""",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    addInputGgxfArguments(parser)
+    addOutputGgxfArguments(parser)
+    addFormatOptionArguments(parser)
+    parser.add_argument(
+        "-b",
+        "--bounding-box",
+        type=parseBoundingBox,
+        metavar="xmin,ymin,xmax,ymax",
+        help="Region of the grids to include",
+    )
+    parser.add_argument(
+        "-G",
+        "--group",
+        action="append",
+        metavar="group_name",
+        help="Name of a group to include (default all groups)",
+    )
+    parser.add_argument(
+        "-s",
+        "--start-epoch",
+        type=float,
+        metavar="####.#",
+        help="Start of the time window in years",
+    )
+    parser.add_argument(
+        "-e",
+        "--end-epoch",
+        type=float,
+        metavar="####.#",
+        help="End of the time window in years",
+    )
+    parser.set_defaults(function=subsetGgxf)
+    return parser
+
+
+def parseBoundingBox(value):
+    try:
+        bbox = [float(v) for v in value.split(",")]
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid bounding box {value}: must be xmin,ymin,xmax,ymax"
+        )
+    return bbox
+
+
+def subsetGgxf(args):
+    if (args.start_epoch is None) != (args.end_epoch is None):
+        raise RuntimeError("Both --start-epoch and --end-epoch are required")
+    if args.start_epoch is not None and args.start_epoch > args.end_epoch:
+        raise RuntimeError("--start-epoch is after --end-epoch")
+    if args.input_ggxf_file.endswith(".ggxf"):
+        netcdf_options = compileFormatOptions(args.netcdf4_options)
+        netcdf_options.setdefault(NETCDF_OPTION_LAZY_LOAD, "true")
+        netcdf_options.setdefault(
+            NETCDF_OPTION_GRID_CACHE_MB, str(SUBSET_GRID_CACHE_MB)
+        )
+        if args.bounding_box is not None:
+            netcdf_options[NETCDF_OPTION_BOUNDING_BOX] = ",".join(
+                repr(v) for v in args.bounding_box
+            )
+        args.netcdf4_options = [f"{k}={v}" for k, v in netcdf_options.items()]
+    elif args.bounding_box is not None:
+        raise RuntimeError("--bounding-box requires a NetCDF (.ggxf) input file")
+
+    ggxf = loadGgxfInputFile(args)
+    if ggxf is None:
+        raise RuntimeError(f"Cannot load {args.input_ggxf_file}")
+    subsetGgxfGroups(ggxf, args.group, args.start_epoch, args.end_epoch)
+    saveGgxfOutputFile(ggxf, args)
+
+
+def subsetGgxfGroups(ggxf, groupnames=None, startEpoch=None, endEpoch=None):
+    # Remove the groups not in groupnames (if defined), and the groups which are
+    # zero from startEpoch to endEpoch (if defined).
+    groups = {group.name(): group for group in ggxf.groups()}
+    if groupnames is not None:
+        missing = [name for name in groupnames if name not in groups]
+        if missing:
+            raise RuntimeError(f"Groups {', '.join(missing)} not found in GGXF file")
+        for name, group in groups.items():
+            if name not in groupnames:
+                ggxf.removeGroup(group)
+    if startEpoch is not None:
+        for group in list(ggxf.groups()):
+            if group.isZeroBetween(startEpoch, endEpoch):
+                logging.info(
+                    f"Omitting group {group.name()}: zero from {startEpoch} to {endEpoch}"
+                )
+                ggxf.removeGroup(group)
+    if not any(group.grids() for group in ggxf.groups()):
+        raise RuntimeError("No grids selected for the subset")
+    ggxf.configure()
+
+
 #####################################################################################
 # Import gridded data to a GGXF file
 
@@ -0,0 +1,501 @@
+#!/usr/bin/python3
+#
+# Benchmarks of the GGXF module load, write, grid search, and interpolation
+# functions.  Models are built with the DummyGGXF factories used by the unit
+# tests, and the NetCDF GGXF files in the examples directory are also loaded.
+# Results are written as JSON so that runs on different commits can be compared
+# with the --compare option.
+
+import os
+import sys
+
+testdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(testdir, "../unit"))
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, "../..")))
+
+import argparse
+import datetime
+import glob
+import json
+import logging
+import platform
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+from DummyGGXF import (
+    dummyDeformationModel,
+    dummyGridModel,
+    dummyMultiGroupModel,
+    dummyPatchModel,
+)
+
+from GGXF import GGXF
+from GGXF import YAML
+from GGXF import NetCDF
+from GGXF import Binary
+
+EXAMPLES_DIR = os.path.abspath(os.path.join(testdir, "../../../examples"))
+
+INTERPOLATION_METHODS = (
+    GGXF.INTERPOLATION_METHOD_BILINEAR,
+    GGXF.INTERPOLATION_METHOD_BIQUADRATIC,
+    GGXF.INTERPOLATION_METHOD_BICUBIC,
+)
+
+# Grid sizes (ni=nj) of models for load and write benchmarks, and the maximum
+# size written as YAML, which is much slower than the other formats.
+GRID_SIZES = (51, 201, 501)
+QUICK_GRID_SIZES = (51, 201)
+MAX_YAML_GRID_SIZE = 201
+
+NPOINTS = 2000
+GRID_SEARCH_DEPTHS = (0, 1, 2, 3)
+GRID_SEARCH_PATCHES = 100
+
+# Pairs of benchmarks (fast, slow) for which the fast (array) version must
+# take less time than the slow (point by point) version for the same points.
+RATIO_CHECKS = [
+    (f"gridsearch.gridsAt.depth{depth}", f"gridsearch.gridAt.depth{depth}")
+    for depth in GRID_SEARCH_DEPTHS
+]
+
+
+class Benchmark:
+    # A single benchmark.  setup is called once and returns the function to time.
+    # npoints is the number of points evaluated by each call, if applicable.
+
+    def __init__(self, name, setup, npoints=None):
+        self.name = name
+        self.setup = setup
+        self.npoints = npoints
+
+    def run(self, repeat=5, mintime=0.2):
+        function = self.setup()
+        # Calibrate the number of calls in each repeat so that each takes at
+        # least mintime seconds
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        number = max(1, int(mintime / max(elapsed, 1.0e-9)))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            times.append((time.perf_counter() - start) / number)
+        result = {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "repeat": repeat,
+            "number": number,
+        }
+        if self.npoints:
+            result["npoints"] = self.npoints
+            result["points_per_second"] = self.npoints / result["median"]
+        return result
+
+
+def readGgxf(reader, ggxf_file, options=None):
+    # Readers log errors and return None if the file cannot be loaded
+    ggxf = reader.Read(ggxf_file, options=options)
+    if ggxf is None:
+        raise RuntimeError(f"Failed to read {ggxf_file}")
+    return ggxf
+
+
+def testPoints(npoints=NPOINTS, seed=1):
+    # Random points covering the dummy models and some of the area beyond them
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-46.0, -38.0, npoints)
+    lon = rng.uniform(165.0, 175.0, npoints)
+    return np.vstack((lat, lon)).T
+
+
+class ModelFiles:
+    # A synthetic model of a given grid size and the files written from it in a
+    # temporary directory.  The model and files are only created when a benchmark
+    # setup needs them, so that benchmarks can be listed without creating them.
+
+    def __init__(self, tempdir, size):
+        self.tempdir = tempdir
+        self.size = size
+        self._ggxf = None
+
+    def ggxf(self):
+        if self._ggxf is None:
+            self._ggxf = dummyGridModel(self.size, self.size)
+        return self._ggxf
+
+    def path(self, name):
+        # Path of a file in the temporary directory, creating its directory
+        filename = os.path.join(self.tempdir, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        return filename
+
+    def file(self, name, writer, options=None):
+        # Path of a file written from the model, writing it if it does not exist
+        filename = self.path(name)
+        if not os.path.exists(filename):
+            writer.Write(self.ggxf(), filename, options=options)
+        return filename
+
+
+def writeSetup(model, writer, name, options=None):
+    # Setup for a benchmark writing the model to a file
+    def setup():
+        ggxf = model.ggxf()
+        filename = model.path(name)
+        return lambda: writer.Write(ggxf, filename, options=options)
+
+    return setup
+
+
+def readSetup(model, writer, reader, name, writeoptions=None, readoptions=None):
+    # Setup for a benchmark reading a file written from the model
+    def setup():
+        filename = model.file(name, writer, writeoptions)
+        return lambda: readGgxf(reader, filename, readoptions)
+
+    return setup
+
+
+def ioBenchmarks(tempdir, sizes):
+    # Read and write benchmarks for each file format using models of varying size
+    benchmarks = []
+    for size in sizes:
+        model = ModelFiles(tempdir, size)
+        netcdf_file = f"grid{size}.ggxf"
+        binary_file = f"grid{size}.ggxb"
+        benchmarks.extend(
+            [
+                Benchmark(
+                    f"netcdf.write.grid{size}",
+                    writeSetup(model, NetCDF.Writer, netcdf_file),
+                ),
+                Benchmark(
+                    f"netcdf.read.grid{size}",
+                    readSetup(model, NetCDF.Writer, NetCDF.Reader, netcdf_file),
+                ),
+                Benchmark(
+                    f"netcdf.read-lazy.grid{size}",
+                    readSetup(
+                        model,
+                        NetCDF.Writer,
+                        NetCDF.Reader,
+                        netcdf_file,
+                        readoptions={NetCDF.NETCDF_OPTION_LAZY_LOAD: "true"},
+                    ),
+                ),
+                Benchmark(
+                    f"binary.write.grid{size}",
+                    writeSetup(model, Binary.Writer, binary_file),
+                ),
+                Benchmark(
+                    f"binary.read.grid{size}",
+                    readSetup(model, Binary.Writer, Binary.Reader, binary_file),
+                ),
+            ]
+        )
+        if size > MAX_YAML_GRID_SIZE:
+            continue
+        yaml_file = f"grid{size}.yaml"
+        csv_dir = f"csv{size}"
+        csv_yaml_file = os.path.join(csv_dir, f"grid{size}.yaml")
+        csv_options = {YAML.YAML_OPTION_WRITE_CSV_GRIDS: "true"}
+        inline_options = {YAML.YAML_OPTION_WRITE_CSV_GRIDS: "false"}
+        csv_read_options = {
+            YAML.YAML_OPTION_GRID_DIRECTORY: os.path.join(tempdir, csv_dir)
+        }
+        benchmarks.extend(
+            [
+                Benchmark(
+                    f"yaml.write.grid{size}",
+                    writeSetup(model, YAML.Writer, yaml_file, inline_options),
+                ),
+                Benchmark(
+                    f"yaml.read.grid{size}",
+                    readSetup(
+                        model, YAML.Writer, YAML.Reader, yaml_file, inline_options
+                    ),
+                ),
+                Benchmark(
+                    f"yaml-csv.write.grid{size}",
+                    writeSetup(model, YAML.Writer, csv_yaml_file, csv_options),
+                ),
+                Benchmark(
+                    f"yaml-csv.read.grid{size}",
+                    readSetup(
+                        model,
+                        YAML.Writer,
+                        YAML.Reader,
+                        csv_yaml_file,
+                        csv_options,
+                        csv_read_options,
+                    ),
+                ),
+            ]
+        )
+    return benchmarks
+
+
+def exampleBenchmarks():
+    # Read benchmarks for the NetCDF GGXF files in the examples directory
+    benchmarks = []
+    for netcdf_file in sorted(
+        glob.glob(os.path.join(EXAMPLES_DIR, "**", "*.ggxf"), recursive=True)
+    ):
+        name = os.path.splitext(os.path.basename(netcdf_file))[0]
+        benchmarks.append(
+            Benchmark(
+                f"example.netcdf.read.{name}",
+                lambda file=netcdf_file: lambda: readGgxf(NetCDF.Reader, file),
+            )
+        )
+    return benchmarks
+
+
+def evaluationBenchmarks():
+    # Multi-group deformation model evaluation for each interpolation method,
+    # evaluated point by point and as an array
+    benchmarks = []
+    xy = testPoints()
+    for method in INTERPOLATION_METHODS:
+        ggxf = dummyDeformationModel(method)
+
+        def valueAt(ggxf=ggxf, epoch=2015.0, refepoch=None):
+            return lambda: [ggxf.valueAt(point, epoch, refepoch) for point in xy]
+
+        def valuesAt(ggxf=ggxf, epoch=2015.0, refepoch=None):
+            return lambda: ggxf.valuesAt(xy, epoch, refepoch)
+
+        benchmarks.extend(
+            [
+                Benchmark(f"deformation.valueAt.{method}", valueAt, len(xy)),
+                Benchmark(f"deformation.valuesAt.{method}", valuesAt, len(xy)),
+            ]
+        )
+    ggxf = dummyDeformationModel()
+    benchmarks.append(
+        Benchmark(
+            "deformation.valueAt.epoch-change",
+            lambda: lambda: [ggxf.valueAt(point, 2015.0, 2005.0) for point in xy],
+            len(xy),
+        )
+    )
+    # Model with many small event groups
+    mggxf = dummyMultiGroupModel()
+    benchmarks.extend(
+        [
+            Benchmark(
+                "multigroup.valueAt",
+                lambda: lambda: [mggxf.valueAt(point, 2015.0) for point in xy],
+                len(xy),
+            ),
+            Benchmark(
+                "multigroup.valuesAt",
+                lambda: lambda: mggxf.valuesAt(xy, 2015.0),
+                len(xy),
+            ),
+        ]
+    )
+    return benchmarks
+
+
+def gridSearchBenchmarks(depths):
+    # Grid search in a model with many patch grids with nested child grids
+    benchmarks = []
+    rng = np.random.default_rng(2)
+    xy = np.vstack(
+        (rng.uniform(-46.0, -38.0, NPOINTS), rng.uniform(167.0, 175.0, NPOINTS))
+    ).T
+    for depth in depths:
+        ggxf = dummyPatchModel(npatch=GRID_SEARCH_PATCHES, depth=depth)
+        group = next(ggxf.groups())
+        benchmarks.extend(
+            [
+                Benchmark(
+                    f"gridsearch.gridAt.depth{depth}",
+                    lambda group=group: lambda: [group.gridAt(point) for point in xy],
+                    len(xy),
+                ),
+                Benchmark(
+                    f"gridsearch.gridsAt.depth{depth}",
+                    lambda group=group: lambda: group.gridsAt(xy),
+                    len(xy),
+                ),
+                Benchmark(
+                    f"gridsearch.valuesAt.depth{depth}",
+                    lambda ggxf=ggxf: lambda: ggxf.valuesAt(xy, 2015.0),
+                    len(xy),
+                ),
+            ]
+        )
+    return benchmarks
+
+
+def gitCommit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=testdir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compareResults(results, previous_file, threshold):
+    # Print the ratio of the median times to those in a previous results file.
+    # Returns the names of benchmarks slower by more than the threshold ratio.
+    with open(previous_file) as jsonh:
+        previous = json.load(jsonh)
+    prevbench = previous["benchmarks"]
+    print(
+        f"\nComparison with {previous_file} (commit {previous.get('commit')}, {previous.get('created')})"
+    )
+    print(f"{'benchmark':50s} {'previous':>12s} {'current':>12s} {'ratio':>8s}")
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        if "median" not in result or "median" not in prevbench.get(name, {}):
+            continue
+        prevtime = prevbench[name]["median"]
+        ratio = result["median"] / prevtime
+        flag = ""
+        if ratio > threshold:
+            flag = " slower"
+            regressions.append(name)
+        elif ratio < 1.0 / threshold:
+            flag = " faster"
+        print(
+            f"{name:50s} {prevtime:12.6f} {result['median']:12.6f} {ratio:8.2f}{flag}"
+        )
+    return regressions
+
+
+def checkRatios(results):
+    # Print the ratio of the median times of each pair in RATIO_CHECKS that
+    # was run.  Returns the names of the pairs where the fast version is not
+    # faster.
+    checks = [
+        (fast, slow)
+        for fast, slow in RATIO_CHECKS
+        if "median" in results["benchmarks"].get(fast, {})
+        and "median" in results["benchmarks"].get(slow, {})
+    ]
+    if not checks:
+        return []
+    print("\nRatio checks")
+    print(f"{'benchmark':50s} {'reference':>30s} {'ratio':>8s}")
+    failures = []
+    for fast, slow in checks:
+        ratio = (
+            results["benchmarks"][fast]["median"]
+            / results["benchmarks"][slow]["median"]
+        )
+        flag = ""
+        if ratio >= 1.0:
+            flag = " failed"
+            failures.append(f"{fast}/{slow}")
+        print(f"{fast:50s} {slow:>30s} {ratio:8.2f}{flag}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run GGXF performance benchmarks and save the results as JSON"
+    )
+    parser.add_argument(
+        "-o", "--output", default="benchmark.json", help="JSON results file"
+    )
+    parser.add_argument(
+        "-c", "--compare", help="Previous JSON results file to compare with"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Time ratio above which a benchmark is reported as a regression",
+    )
+    parser.add_argument(
+        "-k", "--select", help="Regular expression selecting benchmarks to run"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Number of timing repeats"
+    )
+    parser.add_argument(
+        "-q",
+        "--quick",
+        action="store_true",
+        help="Skip the largest models and use fewer repeats",
+    )
+    parser.add_argument(
+        "-l", "--list", action="store_true", help="List benchmarks without running"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    repeat = 3 if args.quick else args.repeat
+    mintime = 0.05 if args.quick else 0.2
+    sizes = QUICK_GRID_SIZES if args.quick else GRID_SIZES
+    with tempfile.TemporaryDirectory() as tempdir:
+        benchmarks = []
+        benchmarks.extend(ioBenchmarks(tempdir, sizes))
+        benchmarks.extend(exampleBenchmarks())
+        benchmarks.extend(evaluationBenchmarks())
+        benchmarks.extend(gridSearchBenchmarks(GRID_SEARCH_DEPTHS))
+        if args.select:
+            benchmarks = [b for b in benchmarks if re.search(args.select, b.name)]
+        if args.list:
+            for benchmark in benchmarks:
+                print(benchmark.name)
+            return
+
+        results = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": gitCommit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "benchmarks": {},
+        }
+        for benchmark in benchmarks:
+            try:
+                result = benchmark.run(repeat=repeat, mintime=mintime)
+            except Exception as ex:
+                print(f"{benchmark.name:50s} failed: {ex}")
+                results["benchmarks"][benchmark.name] = {"error": str(ex)}
+                continue
+            results["benchmarks"][benchmark.name] = result
+            rate = ""
+            if "points_per_second" in result:
+                rate = f" ({result['points_per_second']:.0f} points/s)"
+            print(f"{benchmark.name:50s} {result['median']:12.6f}s{rate}")
+
+    with open(args.output, "w") as jsonh:
+        json.dump(results, jsonh, indent=2)
+    print(f"Results written to {args.output}")
+
+    failed = False
+    failures = checkRatios(results)
+    if failures:
+        print(f"\n{len(failures)} ratio checks failed")
+        failed = True
+    if args.compare:
+        regressions = compareResults(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmarks slower than threshold")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
+import numpy as np
+
 from GGXF import GGXF
 
 params = [
     {
         GGXF.PARAM_ATTR_PARAMETER_NAME: GGXF.GGXF_PARAMETER_DISPLACEMENT_EAST,
+        GGXF.PARAM_ATTR_PARAMETER_SET: GGXF.GGXF_PARAMETER_SET_DISPLACEMENT,
         GGXF.PARAM_ATTR_UNIT_SI_RATIO: 1.0,
         GGXF.PARAM_ATTR_UNIT_NAME: "meter",
     },
     {
         GGXF.PARAM_ATTR_PARAMETER_NAME: GGXF.GGXF_PARAMETER_DISPLACEMENT_NORTH,
+        GGXF.PARAM_ATTR_PARAMETER_SET: GGXF.GGXF_PARAMETER_SET_DISPLACEMENT,
         GGXF.PARAM_ATTR_UNIT_SI_RATIO: 1.0,
         GGXF.PARAM_ATTR_UNIT_NAME: "meter",
     },
     {
         GGXF.PARAM_ATTR_PARAMETER_NAME: GGXF.GGXF_PARAMETER_DISPLACEMENT_UP,
+        GGXF.PARAM_ATTR_PARAMETER_SET: GGXF.GGXF_PARAMETER_SET_DISPLACEMENT,
         GGXF.PARAM_ATTR_UNIT_SI_RATIO: 1.0,
         GGXF.PARAM_ATTR_UNIT_NAME: "meter",
     },
@@ -50,3 +55,216 @@ def dummyGroup(
         GGXF.GROUP_ATTR_GRID_PARAMETERS: gparams,
     }
     return GGXF.Group(dummyGGXF(), "DummyGroup", metadata)
+
+
+def dummyModelMetadata():
+    # Minimal valid metadata for a deformation model that can be written to
+    # and read from a file
+    return {
+        GGXF.GGXF_ATTR_GGXF_VERSION: "GGXF-1.0",
+        GGXF.GGXF_ATTR_FILENAME: "DummyGGXF.ggxf",
+        GGXF.GGXF_ATTR_CONTENT: GGXF.GGXF_CONTENT_DEFORMATION_MODEL,
+        GGXF.GGXF_ATTR_TITLE: "Dummy deformation model",
+        GGXF.GGXF_ATTR_ABSTRACT: "Deformation model for testing",
+        GGXF.GGXF_ATTR_CONTENT_APPLICABILITY_EXTENT: {
+            GGXF.GGXF_ATTR_BOUNDING_BOX: {
+                GGXF.GGXF_ATTR_SOUTH_BOUND_LATITUDE: -48.0,
+                GGXF.GGXF_ATTR_WEST_BOUND_LONGITUDE: 165.0,
+                GGXF.GGXF_ATTR_NORTH_BOUND_LATITUDE: -37.0,
+                GGXF.GGXF_ATTR_EAST_BOUND_LONGITUDE: 176.0,
+            }
+        },
+        GGXF.GGXF_ATTR_INTERPOLATION_CRS_WKT: crswkt,
+        GGXF.GGXF_ATTR_SOURCE_CRS_WKT: crswkt,
+        GGXF.GGXF_ATTR_TARGET_CRS_WKT: crswkt,
+        GGXF.GGXF_ATTR_PARAMETERS: params,
+    }
+
+
+def dummyDeformationModel(method=GGXF.INTERPOLATION_METHOD_BILINEAR):
+    # A configured deformation model with a secular velocity group and an event
+    # group with a nested grid.  Grid values are a smooth function of position
+    # so that interpolated values are easily checked.
+    ggxf = GGXF.GGXF(dummyModelMetadata(), source="DummyGGXF")
+    groupdefs = [
+        (
+            "velocity",
+            params[2:],
+            [{"functionType": "linear", "functionReferenceEpoch": 2000.0}],
+            [([-45.0, 0.5, 0.0, 166.0, 0.0, 0.5], 13, 17, [])],
+        ),
+        (
+            "event",
+            params,
+            [{"functionType": "step", "eventEpoch": 2010.0}],
+            [
+                (
+                    [-43.0, 0.5, 0.0, 170.0, 0.0, 0.5],
+                    7,
+                    9,
+                    [([-42.0, 0.1, 0.0, 171.0, 0.0, 0.1], 11, 11)],
+                )
+            ],
+        ),
+    ]
+    for groupname, gparams, timefuncs, griddefs in groupdefs:
+        group = GGXF.Group(
+            ggxf,
+            groupname,
+            {
+                GGXF.GROUP_ATTR_INTERPOLATION_METHOD: method,
+                GGXF.GROUP_ATTR_TIME_FUNCTIONS: timefuncs,
+                GGXF.GROUP_ATTR_GRID_PARAMETERS: [
+                    p[GGXF.PARAM_ATTR_PARAMETER_NAME] for p in gparams
+                ],
+            },
+        )
+        group.configureParameters()
+        for igrid, (affine, ni, nj, childdefs) in enumerate(griddefs):
+            grid = dummyGrid(group, f"{groupname}{igrid}", affine, ni, nj)
+            for ichild, (caffine, cni, cnj) in enumerate(childdefs):
+                child = dummyGrid(
+                    group, f"{groupname}{igrid}.{ichild}", caffine, cni, cnj
+                )
+                grid.addGrid(child)
+            group.addGrid(grid)
+        ggxf.addGroup(group)
+    ggxf.configure()
+    return ggxf
+
+
+def dummyGrid(group, gridname, affine, ni, nj, priority=None):
+    metadata = {
+        GGXF.GRID_ATTR_I_NODE_COUNT: ni,
+        GGXF.GRID_ATTR_J_NODE_COUNT: nj,
+        GGXF.GRID_ATTR_AFFINE_COEFFS: affine,
+    }
+    if priority is not None:
+        metadata[GGXF.GRID_ATTR_GRID_PRIORITY] = priority
+    grid = GGXF.Grid(group, gridname, metadata)
+    i, j = np.indices((ni, nj))
+    xy0 = np.array(affine).reshape((2, 3))[:, 0]
+    x = xy0[0] + i * affine[1]
+    y = xy0[1] + j * affine[5]
+    data = [np.sin(x * (k + 1)) + np.cos(y * (k + 2)) for k in range(group.nparam())]
+    grid.setData(np.stack(data, axis=2))
+    return grid
+
+
+def dummyPatchModel(npatch=50, depth=1, seed=1):
+    # A configured single group model with many overlapping patch grids over a
+    # base grid, similar in structure to earthquake patches in a deformation
+    # model.  Each patch has child grids nested to the specified depth.
+    ggxf = GGXF.GGXF(dummyModelMetadata(), source="DummyGGXF")
+    group = GGXF.Group(
+        ggxf,
+        "patches",
+        {
+            GGXF.GROUP_ATTR_INTERPOLATION_METHOD: GGXF.INTERPOLATION_METHOD_BILINEAR,
+            GGXF.GROUP_ATTR_TIME_FUNCTIONS: [
+                {"functionType": "step", "eventEpoch": 2010.0}
+            ],
+            GGXF.GROUP_ATTR_GRID_PARAMETERS: [
+                p[GGXF.PARAM_ATTR_PARAMETER_NAME] for p in params
+            ],
+        },
+    )
+    group.configureParameters()
+    rng = np.random.default_rng(seed)
+    base = dummyGrid(
+        group, "base", [-47.0, 0.5, 0.0, 166.0, 0.0, 0.5], 21, 21, priority=0
+    )
+    group.addGrid(base)
+    for ipatch in range(npatch):
+        lat0, lon0 = rng.uniform((-46.0, 167.0), (-39.0, 174.0))
+        spacing = 0.05
+        affine = [lat0, spacing, 0.0, lon0, 0.0, spacing]
+        grid = dummyGrid(group, f"patch{ipatch}", affine, 21, 21, priority=ipatch + 1)
+        parent = grid
+        for level in range(depth):
+            affine = [
+                affine[0] + spacing * 5,
+                spacing / 2,
+                0.0,
+                affine[3] + spacing * 5,
+                0.0,
+                spacing / 2,
+            ]
+            spacing /= 2
+            child = dummyGrid(group, f"patch{ipatch}.{level}", affine, 21, 21)
+            parent.addGrid(child)
+            parent = child
+        group.addGrid(grid)
+    ggxf.addGroup(group)
+    ggxf.configure()
+    return ggxf
+
+
+def dummyMultiGroupModel(ngroup=40, seed=1):
+    # A configured model with a velocity group covering the model extents and
+    # ngroup small event groups with step time functions at different epochs,
+    # similar in structure to the earthquake patches of a national deformation
+    # model.
+    ggxf = GGXF.GGXF(dummyModelMetadata(), source="DummyGGXF")
+    rng = np.random.default_rng(seed)
+    groupdefs = [
+        (
+            "velocity",
+            params[2:],
+            {"functionType": "linear", "functionReferenceEpoch": 2000.0},
+            [-47.0, 0.5, 0.0, 166.0, 0.0, 0.5],
+        )
+    ]
+    for igroup in range(ngroup):
+        lat0, lon0 = rng.uniform((-46.0, 167.0), (-39.0, 174.0))
+        groupdefs.append(
+            (
+                f"event{igroup}",
+                params,
+                {"functionType": "step", "eventEpoch": 2000.0 + igroup * 0.5},
+                [lat0, 0.05, 0.0, lon0, 0.0, 0.05],
+            )
+        )
+    for groupname, gparams, timefunc, affine in groupdefs:
+        group = GGXF.Group(
+            ggxf,
+            groupname,
+            {
+                GGXF.GROUP_ATTR_INTERPOLATION_METHOD: GGXF.INTERPOLATION_METHOD_BILINEAR,
+                GGXF.GROUP_ATTR_TIME_FUNCTIONS: [timefunc],
+                GGXF.GROUP_ATTR_GRID_PARAMETERS: [
+                    p[GGXF.PARAM_ATTR_PARAMETER_NAME] for p in gparams
+                ],
+            },
+        )
+        group.configureParameters()
+        group.addGrid(dummyGrid(group, groupname, affine, 21, 21))
+        ggxf.addGroup(group)
+    ggxf.configure()
+    return ggxf
+
+
+def dummyGridModel(ni=101, nj=101, method=GGXF.INTERPOLATION_METHOD_BILINEAR):
+    # A configured single group model with one grid of ni x nj nodes covering
+    # the model extents.  Used to test the performance of loading and writing
+    # grids of different sizes.
+    ggxf = GGXF.GGXF(dummyModelMetadata(), source="DummyGGXF")
+    group = GGXF.Group(
+        ggxf,
+        "grid",
+        {
+            GGXF.GROUP_ATTR_INTERPOLATION_METHOD: method,
+            GGXF.GROUP_ATTR_TIME_FUNCTIONS: [
+                {"functionType": "linear", "functionReferenceEpoch": 2000.0}
+            ],
+            GGXF.GROUP_ATTR_GRID_PARAMETERS: [
+                p[GGXF.PARAM_ATTR_PARAMETER_NAME] for p in params
+            ],
+        },
+    )
+    group.configureParameters()
+    affine = [-47.0, 8.0 / (ni - 1), 0.0, 166.0, 0.0, 10.0 / (nj - 1)]
+    group.addGrid(dummyGrid(group, "grid", affine, ni, nj))
+    ggxf.addGroup(group)
+    ggxf.configure()
+    return ggxf
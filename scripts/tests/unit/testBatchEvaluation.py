@@ -0,0 +1,112 @@
+import os
+import sys
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel, dummyMultiGroupModel
+
+from GGXF import GGXF
+
+
+def testPoints(npoints=500, seed=1):
+    # Random points covering the model and some of the area beyond it
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-46.0, -38.0, npoints)
+    lon = rng.uniform(165.0, 175.0, npoints)
+    return np.vstack((lat, lon)).T
+
+
+class BatchEvaluationTest(unittest.TestCase):
+    def _checkBatch(self, ggxf, xy, epoch, refepoch=None):
+        values, valid = ggxf.valuesAt(xy, epoch, refepoch)
+        self.assertEqual(values.shape, (xy.shape[0], len(ggxf.parameters())))
+        for point, value, isvalid in zip(xy, values, valid):
+            expected = ggxf.valueAt(point, epoch, refepoch)
+            self.assertEqual(isvalid, expected is not None, msg=f"Valid at {point}")
+            if expected is not None:
+                np.testing.assert_allclose(
+                    value, expected, rtol=0.0, atol=1.0e-12, err_msg=f"At {point}"
+                )
+
+    def test_BatchMatchesPointEvaluation(self):
+        xy = testPoints()
+        for method in (
+            GGXF.INTERPOLATION_METHOD_BILINEAR,
+            GGXF.INTERPOLATION_METHOD_BIQUADRATIC,
+            GGXF.INTERPOLATION_METHOD_BICUBIC,
+        ):
+            ggxf = dummyDeformationModel(method)
+            for epoch, refepoch in ((2005.0, None), (2015.0, None), (2015.0, 2005.0)):
+                with self.subTest(method=method, epoch=epoch, refepoch=refepoch):
+                    self._checkBatch(ggxf, xy, epoch, refepoch)
+
+    def test_BatchGridsAt(self):
+        ggxf = dummyDeformationModel()
+        xy = testPoints()
+        for group in ggxf.groups():
+            found = np.zeros((xy.shape[0],), dtype=bool)
+            for grid, indices in group.gridsAt(xy):
+                self.assertFalse(found[indices].any(), msg="Point in multiple grids")
+                found[indices] = True
+                for i in indices:
+                    self.assertIs(group.gridAt(xy[i]), grid)
+            for i in np.nonzero(~found)[0]:
+                self.assertIsNone(group.gridAt(xy[i]))
+
+    def test_ThreadedEvaluation(self):
+        xy = testPoints()
+        epochs = np.array([2005.0, 2012.5, 2015.0])
+        ggxf = dummyDeformationModel()
+        expected = [
+            ggxf.valuesAt(xy, 2015.0, 2005.0),
+            ggxf.valuesAt(xy, np.resize(epochs, xy.shape[0])),
+            ggxf.valuesAtEpochs(xy, epochs),
+        ]
+        ggxf.setThreads(4)
+        try:
+            results = [
+                ggxf.valuesAt(xy, 2015.0, 2005.0),
+                ggxf.valuesAt(xy, np.resize(epochs, xy.shape[0])),
+                ggxf.valuesAtEpochs(xy, epochs),
+            ]
+        finally:
+            ggxf.setThreads(None)
+        for (values, valid), (expvalues, expvalid) in zip(results, expected):
+            np.testing.assert_array_equal(values, expvalues)
+            np.testing.assert_array_equal(valid, expvalid)
+
+    def test_GroupPruning(self):
+        # Groups are only evaluated at points within their extents.  Results
+        # must match summing every group with a non-zero time factor.
+        ggxf = dummyMultiGroupModel()
+        xy = testPoints()
+        epoch = 2012.0
+        groups = [group for group in ggxf.groups() if group.timeFactorAt(epoch)]
+        expected = np.zeros((xy.shape[0], len(ggxf.parameters())))
+        for ipoint, point in enumerate(xy):
+            for group in groups:
+                value = group.valueAt(point, epoch)
+                if value is not None:
+                    expected[ipoint] += value
+        for ipoint, point in enumerate(xy):
+            np.testing.assert_array_equal(ggxf.valueAt(point, epoch), expected[ipoint])
+        values, valid = ggxf.valuesAt(xy, epoch)
+        self.assertTrue(valid.all())
+        np.testing.assert_allclose(values, expected, rtol=0.0, atol=1.0e-12)
+        values, valid = ggxf.valuesAtEpochs(xy, [epoch])
+        np.testing.assert_allclose(values[:, 0, :], expected, rtol=0.0, atol=1.0e-12)
+
+    def test_BatchInvalidShape(self):
+        ggxf = dummyDeformationModel()
+        with self.assertRaises(GGXF.Error):
+            ggxf.valuesAt([1.0, 2.0, 3.0], 2010.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel
+
+from GGXF import Binary
+
+
+class BinaryReadWriteTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.ggxf = dummyDeformationModel()
+        cls.ggxf_file = os.path.join(cls.tempdir.name, "deformation.ggxb")
+        Binary.Writer.Write(cls.ggxf, cls.ggxf_file)
+        rng = np.random.default_rng(1)
+        lat = rng.uniform(-46.0, -38.0, 200)
+        lon = rng.uniform(165.0, 175.0, 200)
+        cls.xy = np.vstack((lat, lon)).T
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def _checkValues(self, ggxf, atol=1.0e-12):
+        for epoch in (2005.0, 2015.0):
+            values, _ = ggxf.valuesAt(self.xy, epoch)
+            expected, _ = self.ggxf.valuesAt(self.xy, epoch)
+            np.testing.assert_allclose(values, expected, rtol=0.0, atol=atol)
+
+    def test_Read(self):
+        ggxf = Binary.Reader.Read(self.ggxf_file)
+        self.assertIsNotNone(ggxf)
+        self.assertEqual(
+            [group.name() for group in ggxf.groups()],
+            [group.name() for group in self.ggxf.groups()],
+        )
+        for grid, expected in zip(ggxf.allgrids(), self.ggxf.allgrids()):
+            self.assertEqual(grid.name(), expected.name())
+            np.testing.assert_array_equal(grid.data(), expected.data())
+        self._checkValues(ggxf)
+
+    def test_MemoryMapped(self):
+        ggxf = Binary.Reader.Read(self.ggxf_file)
+        for grid in ggxf.allgrids():
+            data = grid.data()
+            self.assertIsInstance(data.base, np.memmap)
+            self.assertFalse(data.flags.writeable)
+
+    def test_NoMemoryMap(self):
+        ggxf = Binary.Reader.Read(
+            self.ggxf_file, options={Binary.BINARY_OPTION_MEMORY_MAP: "false"}
+        )
+        self.assertIsNotNone(ggxf)
+        for grid in ggxf.allgrids():
+            self.assertNotIsInstance(grid.data().base, np.memmap)
+        self._checkValues(ggxf)
+
+    def test_Float32(self):
+        ggxf_file = os.path.join(self.tempdir.name, "deformation32.ggxb")
+        Binary.Writer.Write(
+            self.ggxf, ggxf_file, options={Binary.BINARY_OPTION_GRID_DTYPE: "float32"}
+        )
+        ggxf = Binary.Reader.Read(ggxf_file)
+        self.assertIsNotNone(ggxf)
+        for grid in ggxf.allgrids():
+            self.assertEqual(grid.data().dtype, np.float32)
+        self._checkValues(ggxf, atol=1.0e-5)
+
+    def test_MaskedGrid(self):
+        ggxf = dummyDeformationModel()
+        grid = next(iter(ggxf.allgrids()))
+        data = np.ma.masked_array(grid.data().copy())
+        data[2, 3, :] = np.ma.masked
+        grid.setData(data)
+        ggxf_file = os.path.join(self.tempdir.name, "masked.ggxb")
+        Binary.Writer.Write(ggxf, ggxf_file)
+        copy = Binary.Reader.Read(ggxf_file)
+        self.assertIsNotNone(copy)
+        result = next(iter(copy.allgrids())).data()
+        self.assertIsInstance(result, np.ma.masked_array)
+        np.testing.assert_array_equal(result.mask, data.mask)
+        np.testing.assert_array_equal(result.filled(0.0), data.filled(0.0))
+
+    def test_Alignment(self):
+        ggxf = dummyDeformationModel()
+        grid = next(iter(ggxf.allgrids()))
+        data = np.ma.masked_array(grid.data().copy())
+        data[1, 1, :] = np.ma.masked
+        grid.setData(data)
+        ggxf_file = os.path.join(self.tempdir.name, "aligned.ggxb")
+        Binary.Writer.Write(ggxf, ggxf_file)
+        with open(ggxf_file, "rb") as binh:
+            binh.seek(len(Binary.BINARY_MAGIC))
+            (headerlen,) = struct.unpack("<Q", binh.read(8))
+            header = json.loads(binh.read(headerlen).decode("utf8"))
+        datastart = Binary._dataStart(headerlen)
+
+        def checkGrids(griddefs):
+            for griddef in griddefs:
+                for key in (Binary.BINARY_HEADER_DATA, Binary.BINARY_HEADER_MASK):
+                    if key in griddef:
+                        offset = griddef[key][Binary.BINARY_HEADER_OFFSET]
+                        self.assertEqual(
+                            (datastart + offset) % Binary.BINARY_ALIGNMENT,
+                            0,
+                            msg=f"{griddef[Binary.BINARY_HEADER_NAME]} {key}",
+                        )
+                checkGrids(griddef[Binary.BINARY_HEADER_GRIDS])
+
+        for groupdef in header[Binary.BINARY_HEADER_GROUPS]:
+            checkGrids(groupdef[Binary.BINARY_HEADER_GRIDS])
+        copy = Binary.Reader.Read(ggxf_file)
+        self.assertIsNotNone(copy)
+        for grid in copy.allgrids():
+            data = np.ma.getdata(grid.data())
+            self.assertEqual(data.ctypes.data % Binary.BINARY_ALIGNMENT, 0)
+
+    def test_InvalidFile(self):
+        ggxf_file = os.path.join(self.tempdir.name, "invalid.ggxb")
+        with open(ggxf_file, "wb") as binh:
+            binh.write(b"Not a binary GGXF file")
+        self.assertIsNone(Binary.Reader.Read(ggxf_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import argparse
+import csv
+import functools
+import pickle
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel
+
+from GGXF import Binary
+from GGXF.__main__ import calculateCsvPoints, inputGgxfFileArgs, loadGgxfInputFile
+
+
+class CalculateCsvTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.ggxf_file = os.path.join(cls.tempdir.name, "deformation.ggxb")
+        Binary.Writer.Write(dummyDeformationModel(), cls.ggxf_file)
+        cls.ggxf = Binary.Reader.Read(cls.ggxf_file)
+        cls.input_csv = os.path.join(cls.tempdir.name, "points.csv")
+        rng = np.random.default_rng(1)
+        lat = rng.uniform(-46.0, -38.0, 100)
+        lon = rng.uniform(165.0, 175.0, 100)
+        with open(cls.input_csv, "w") as csvh:
+            csvw = csv.writer(csvh)
+            csvw.writerow(["id", "nodeLatitude", "nodeLongitude"])
+            for i, (y, x) in enumerate(zip(lat, lon)):
+                csvw.writerow([f"P{i}", f"{y:.8f}", f"{x:.8f}"])
+                if i == 40:
+                    csvw.writerow(["BAD", "invalid", "170.0"])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def _calculate(self, name, **kwargs):
+        output_csv = os.path.join(self.tempdir.name, name)
+        with self.assertLogs(level="ERROR") as logs:
+            calculateCsvPoints(
+                self.ggxf, self.input_csv, output_csv, 2015.0, None, 6, **kwargs
+            )
+        with open(output_csv) as csvh:
+            return list(csv.reader(csvh)), logs.output
+
+    def test_Calculate(self):
+        rows, errors = self._calculate("results.csv")
+        self.assertEqual(
+            rows[0],
+            ["id", "nodeLatitude", "nodeLongitude"]
+            + [param.name() for param in self.ggxf.parameters()],
+        )
+        self.assertEqual(len(rows), 102)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("row 43", errors[0])
+        self.assertEqual(rows[42][0], "BAD")
+        self.assertEqual(rows[42][3:6], ["", "", ""])
+        for row in rows[1:42]:
+            xy = [float(row[1]), float(row[2])]
+            expected = self.ggxf.valueAt(xy, 2015.0)
+            self.assertEqual(row[3:], [f"{x:.6f}" for x in expected])
+
+    def test_CalculateMissingEpoch(self):
+        output_csv = os.path.join(self.tempdir.name, "noepoch.csv")
+        with self.assertLogs(level="ERROR") as logs:
+            calculateCsvPoints(self.ggxf, self.input_csv, output_csv, chunksize=7)
+        self.assertEqual(len(logs.output), 101)
+        with open(output_csv) as csvh:
+            rows = list(csv.reader(csvh))
+        self.assertEqual(len(rows), 102)
+        for row in rows[1:]:
+            self.assertEqual(row[3:6], ["", "", ""])
+            self.assertNotEqual(row[6], "")
+
+    def test_CalculateJobs(self):
+        expected = self._calculate("results.csv")
+        loader = functools.partial(Binary.Reader.Read, self.ggxf_file)
+        for jobs in (1, 3):
+            with self.subTest(jobs=jobs):
+                result = self._calculate(
+                    f"results{jobs}.csv", jobs=jobs, ggxfLoader=loader, chunksize=7
+                )
+                self.assertEqual(result, expected)
+
+    def test_WorkerLoaderArgs(self):
+        # Worker processes are passed only the arguments needed to load the file,
+        # not the profiled GGXF object
+        args = argparse.Namespace(
+            input_ggxf_file=self.ggxf_file,
+            yaml_options=None,
+            netcdf4_options=None,
+            binary_options=["memory-map=false"],
+            debug=False,
+            verbose=False,
+            threads=1,
+            jobs=3,
+            profile=True,
+            profile_times={"read": 0.1},
+            profile_ggxf=self.ggxf,
+        )
+        loaderargs = inputGgxfFileArgs(args)
+        self.assertFalse(hasattr(loaderargs, "profile_ggxf"))
+        loader = pickle.loads(
+            pickle.dumps(functools.partial(loadGgxfInputFile, loaderargs))
+        )
+        ggxf = loader()
+        self.assertIsNotNone(ggxf)
+        self.assertIsNone(ggxf.stats())
+        xy = [-42.0, 170.0]
+        np.testing.assert_array_equal(
+            ggxf.valueAt(xy, 2015.0), self.ggxf.valueAt(xy, 2015.0)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
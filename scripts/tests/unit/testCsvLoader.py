@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 
 testdir = os.path.dirname(os.path.dirname(__file__))
 srcdir = ".."
@@ -9,7 +10,7 @@ import unittest
 
 import numpy as np
 
-from GGXF.GridLoader import CSV
+from GGXF.GridLoader import CSV, ggxf_csv
 
 
 class CsvLoaderTest(unittest.TestCase):
@@ -41,6 +42,56 @@ class CsvLoaderTest(unittest.TestCase):
             f"Grid size - expected {shapeExpected} but got {size}",
         )
 
+    def testCsvLoaderBlocks(self):
+        # Load the test file in blocks of a few lines, with each separator
+        csvfile = os.path.join(testdir, "data", "test.csv")
+        fields = ["displacementEast", "displacementNorth"]
+        expected = ggxf_csv.LoadCsvGrid(csvfile, fields, xyfields=["X", "Y"])
+        with open(csvfile) as csvh:
+            lines = [line.strip().split(",") for line in csvh]
+        chunklines = ggxf_csv.GGXF_CSV_CHUNK_LINES
+        ggxf_csv.GGXF_CSV_CHUNK_LINES = 7
+        try:
+            with tempfile.TemporaryDirectory() as tempdir:
+                for separator, delimiter in (("space", "  "), ("tab", "\t")):
+                    filename = os.path.join(tempdir, f"test_{separator}.csv")
+                    with open(filename, "w") as csvh:
+                        for line in lines:
+                            csvh.write(delimiter.join(line) + "\n")
+                    loaded = ggxf_csv.LoadCsvGrid(
+                        filename,
+                        fields,
+                        xyfields=["X", "Y"],
+                        delimiter=ggxf_csv.GGXF_CSV_SEPARATORS[separator],
+                    )
+                    np.testing.assert_array_equal(loaded[0], expected[0])
+                    self.assertEqual(loaded[1:], expected[1:])
+        finally:
+            ggxf_csv.GGXF_CSV_CHUNK_LINES = chunklines
+
+    def testCsvLoaderErrors(self):
+        header = "X,Y,displacementEast\n"
+        rows = [f"{-38.0 - i * 0.1},171.0,{i}\n" for i in range(20)]
+        chunklines = ggxf_csv.GGXF_CSV_CHUNK_LINES
+        ggxf_csv.GGXF_CSV_CHUNK_LINES = 7
+        try:
+            with tempfile.TemporaryDirectory() as tempdir:
+                filename = os.path.join(tempdir, "test.csv")
+                for badrow, message in (
+                    ("-40.0,171.0,abc\n", "Non numeric value at line 12"),
+                    ("-40.0,171.0\n", "Not enough columns at line 12"),
+                    ("\n", "Not enough columns at line 12"),
+                ):
+                    with open(filename, "w") as csvh:
+                        csvh.write(header)
+                        csvh.writelines(rows[:11] + [badrow] + rows[12:])
+                    with self.assertRaisesRegex(ggxf_csv.CsvLoaderError, message):
+                        ggxf_csv.LoadCsvGrid(
+                            filename, ["displacementEast"], xyfields=["X", "Y"]
+                        )
+        finally:
+            ggxf_csv.GGXF_CSV_CHUNK_LINES = chunklines
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel
+from testBatchEvaluation import testPoints
+
+from GGXF import GGXF
+
+
+class EpochEvaluationTest(unittest.TestCase):
+    epochs = np.array([1999.5, 2005.0, 2009.25, 2015.0, 2015.0, 2021.75])
+
+    def test_EpochMatrix(self):
+        ggxf = dummyDeformationModel()
+        xy = testPoints(npoints=200)
+        for refepochs in (None, 2000.0, self.epochs[::-1]):
+            with self.subTest(refepochs=refepochs):
+                values, valid = ggxf.valuesAtEpochs(xy, self.epochs, refepochs)
+                self.assertEqual(values.shape, (200, self.epochs.size, 3))
+                for iepoch, epoch in enumerate(self.epochs):
+                    refepoch = refepochs
+                    if isinstance(refepochs, np.ndarray):
+                        refepoch = refepochs[iepoch]
+                    expected, expvalid = ggxf.valuesAt(xy, epoch, refepoch)
+                    np.testing.assert_array_equal(values[:, iepoch, :], expected)
+                    np.testing.assert_array_equal(valid, expvalid)
+
+    def test_PointEpochs(self):
+        ggxf = dummyDeformationModel()
+        xy = testPoints(npoints=200)
+        epochs = np.resize(self.epochs, 200)
+        values, valid = ggxf.valuesAt(xy, epochs)
+        for point, epoch, value, isvalid in zip(xy, epochs, values, valid):
+            expected = ggxf.valueAt(point, epoch)
+            self.assertEqual(isvalid, expected is not None)
+            if expected is not None:
+                np.testing.assert_array_equal(value, expected)
+        values, valid = ggxf.valuesAt(xy, epochs, 2000.0)
+        expected, _ = ggxf.valuesAt(xy[:1], epochs[0], 2000.0)
+        np.testing.assert_array_equal(values[0], expected[0])
+
+    def test_SingleSpatialInterpolation(self):
+        ggxf = dummyDeformationModel()
+        ggxf.setProfile()
+        xy = testPoints(npoints=50)
+        ggxf.valuesAtEpochs(xy, self.epochs)
+        for groupname, stats in ggxf.stats()["groups"].items():
+            self.assertLessEqual(stats["points"], 50, msg=groupname)
+            self.assertLessEqual(
+                stats["timeFactorCacheMisses"],
+                np.unique(self.epochs).size,
+                msg=groupname,
+            )
+
+    def test_InvalidEpochs(self):
+        ggxf = dummyDeformationModel()
+        xy = testPoints(npoints=10)
+        with self.assertRaises(GGXF.Error):
+            ggxf.valuesAt(xy, self.epochs)
+        with self.assertRaises(GGXF.Error):
+            ggxf.valuesAtEpochs(xy, self.epochs, self.epochs[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,5 +33,39 @@ class CsvLoaderTest(unittest.TestCase):
         )
 
 
+@unittest.skipUnless(GDAL.gdal is not None, "Python gdal module is not available")
+class GdalSourceTest(unittest.TestCase):
+    def testWindowAndBands(self):
+        tiffile = os.path.join(testdir, "data", "test.tif")
+        (full, size, affine) = GDAL.LoadGrid({}, {"gdalSource": tiffile}, None)
+        source = {
+            "gdalSource": tiffile,
+            "sourceWindow": [2, 3, 10, 8],
+            "selectBands": [1, 0],
+        }
+        (data, size, affine) = GDAL.LoadGrid({}, source, None)
+        self.assertEqual(size, (10, 8))
+        affineExpected = [-39.0, 0.0, -0.125, 171.4, 0.15, 0.0]
+        diff = max(np.abs(np.array(affine) - np.array(affineExpected)))
+        self.assertTrue(
+            diff < 0.000001,
+            f"Affine transformation: expected {affineExpected} but got {affine}",
+        )
+        np.testing.assert_array_equal(data, full[2:12, 3:11, [1, 0]])
+
+    def testSourceList(self):
+        tiffile = os.path.join(testdir, "data", "test.tif")
+        (full, size, affine) = GDAL.LoadGrid({}, {"gdalSource": tiffile}, None)
+        source = {
+            "gdalSourceList": [
+                {"gdalSource": tiffile, "selectBands": [1]},
+                {"gdalSource": tiffile, "selectBands": [0]},
+            ]
+        }
+        (data, size, affine) = GDAL.LoadGrid({}, source, None)
+        self.assertEqual(size, (43, 40))
+        np.testing.assert_array_equal(data, full[:, :, [1, 0]])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyMultiGroupModel, dummyPatchModel
+
+from GGXF import GGXF
+
+
+class GridIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.ggxf = dummyPatchModel(npatch=60, depth=2)
+        self.group = next(self.ggxf.groups())
+        rng = np.random.default_rng(2)
+        lat = rng.uniform(-48.0, -36.0, 2000)
+        lon = rng.uniform(165.0, 177.0, 2000)
+        self.xy = np.vstack((lat, lon)).T
+
+    def _linearSearch(self, func):
+        index = self.group._index
+        self.group._index = None
+        try:
+            return func()
+        finally:
+            self.group._index = index
+
+    def test_IndexBuilt(self):
+        self.assertIsNotNone(self.group._index)
+
+    def test_GridAtMatchesLinearSearch(self):
+        found = [self.group.gridAt(xy) for xy in self.xy]
+        expected = self._linearSearch(lambda: [self.group.gridAt(xy) for xy in self.xy])
+        for xy, grid, egrid in zip(self.xy, found, expected):
+            self.assertIs(grid, egrid, msg=f"Grid at {xy}")
+        self.assertTrue(any(g is not None and g.parent() for g in found))
+
+    def test_GridsAtMatchesLinearSearch(self):
+        def gridmap(gridpoints):
+            result = {}
+            for grid, indices in gridpoints:
+                for i in indices:
+                    self.assertNotIn(i, result, msg=f"Point {i} in multiple grids")
+                    result[i] = grid
+            return result
+
+        found = gridmap(self.group.gridsAt(self.xy))
+        expected = gridmap(self._linearSearch(lambda: self.group.gridsAt(self.xy)))
+        self.assertEqual(found.keys(), expected.keys())
+        for i, grid in found.items():
+            self.assertIs(grid, expected[i], msg=f"Grid at {self.xy[i]}")
+            self.assertIs(grid, self.group.gridAt(self.xy[i]))
+
+    def test_NonFinitePoints(self):
+        xy = np.array(
+            [
+                [np.nan, 170.0],
+                [-41.0, np.nan],
+                [np.inf, 170.0],
+                [-41.0, -np.inf],
+                [-41.0, 171.0],
+            ]
+        )
+        for point in xy[:4]:
+            self.assertIsNone(self.group.gridAt(point), msg=f"Grid at {point}")
+            self.assertIsNone(self.ggxf.valueAt(point, 2015.0), msg=f"Value at {point}")
+        # Casting NaN buckets to integers would raise with invalid="raise"
+        with np.errstate(invalid="raise"):
+            buckets = self.group._index.bucketsOf(xy)
+            gridpoints = self.group.gridsAt(xy)
+            value, valid = self.ggxf.valuesAt(xy, 2015.0)
+        np.testing.assert_array_equal(buckets[:4], -1)
+        self.assertEqual([list(indices) for grid, indices in gridpoints], [[4]])
+        np.testing.assert_array_equal(valid, [False, False, False, False, True])
+
+    def test_GridsAtFewPoints(self):
+        # Fewer points than buckets are searched without the index
+        xy = self.xy[:10]
+        self.assertLess(xy.shape[0], self.group._index.nbucket())
+        for grid, indices in self.group.gridsAt(xy):
+            for i in indices:
+                self.assertIs(grid, self.group.gridAt(xy[i]))
+
+
+class GroupIndexTest(unittest.TestCase):
+    def test_NonFiniteAndOutsidePoints(self):
+        # Points not in any group give the same value as evaluating without
+        # the group index, which is zero for the multi-group model.
+        ggxf = dummyMultiGroupModel()
+        self.assertIsNotNone(ggxf._groupIndex)
+        xy = np.array(
+            [
+                [np.nan, 170.0],
+                [-41.0, np.nan],
+                [np.inf, 170.0],
+                [-41.0, -np.inf],
+                [-60.0, 170.0],
+                [-41.0, 190.0],
+            ]
+        )
+        epoch = 2015.0
+        values = [ggxf.valueAt(point, epoch) for point in xy]
+        with np.errstate(invalid="raise"):
+            batch, valid = ggxf.valuesAt(xy, epoch)
+        index = ggxf._groupIndex
+        ggxf._groupIndex = None
+        try:
+            expected = [ggxf.valueAt(point, epoch) for point in xy]
+        finally:
+            ggxf._groupIndex = index
+        for point, value, evalue in zip(xy, values, expected):
+            np.testing.assert_array_equal(value, evalue, err_msg=f"At {point}")
+            np.testing.assert_array_equal(value, 0.0, err_msg=f"At {point}")
+        self.assertTrue(valid.all())
+        np.testing.assert_array_equal(batch, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -56,6 +56,56 @@ def convertTestPoints(testpoints, affine=defaultAffine):
     return testxy
 
 
+def baselineValue(method, grid, xy):
+    # Value at xy calculated as by the numpy implementation of the single point
+    # interpolation methods: weights times node values summed with numpy
+    cellij, cellxy = grid.cellij(np.array(xy))
+    data = grid.data()
+    if method == "bilinear":
+        crnr = np.array([[0, 0], [0, 1], [1, 1], [1, 0]])
+        nodef = (
+            (crnr[:, 0] * cellxy[0] + (1 - crnr[:, 0]) * (1 - cellxy[0]))
+            * (crnr[:, 1] * cellxy[1] + (1 - crnr[:, 1]) * (1 - cellxy[1]))
+        ).reshape((4, 1))
+    else:
+        gridsize = grid.size()
+        for axis in (0, 1):
+            if method == "biquadratic":
+                if (cellxy[axis] > 0.5 and cellij[axis] < gridsize[axis] - 2) or cellij[
+                    axis
+                ] == 0:
+                    cellxy[axis] -= 1.0
+                    cellij[axis] += 1
+            elif cellij[axis] == 0:
+                cellxy[axis] -= 1.0
+                cellij[axis] += 1
+            elif cellij[axis] >= gridsize[axis] - 2:
+                cellxy[axis] += 1.0
+                cellij[axis] -= 1
+        cellxy = cellxy.reshape((2, 1))
+        if method == "biquadratic":
+            offsets = [-1, 0, 1]
+            cellf = (
+                (cellxy * cellxy).dot([[0.5, -1.0, 0.5]])
+                + cellxy.dot([[-0.5, 0, 0.5]])
+                + [0.0, 1.0, 0.0]
+            )
+        else:
+            offsets = [-1, 0, 1, 2]
+            cellf = (
+                (cellxy * cellxy * cellxy).dot([[-1.0 / 6.0, 0.5, -0.5, 1.0 / 6.0]])
+                + (cellxy * cellxy).dot([[0.5, -1.0, 0.5, 0.0]])
+                + cellxy.dot([[-1.0 / 3.0, -0.5, 1.0, -1.0 / 6.0]])
+                + [0.0, 1.0, 0.0, 0.0]
+            )
+        nnode = len(offsets) ** 2
+        nodef = cellf[:1, :].T.dot(cellf[1:, :]).reshape((nnode, 1))
+        crnr = np.array([[i, j] for i in offsets for j in offsets])
+    nodes = crnr + cellij
+    nodeprm = data[nodes[:, 0], nodes[:, 1]]
+    return (nodef * nodeprm).sum(axis=0)
+
+
 class BilinearInterpolationTest(unittest.TestCase):
     def setUp(self):
         gen1 = lambda x, y: 0.3 - 0.5 * x + 0.1 * y
@@ -131,9 +181,11 @@ class BiquadraticInterpolationTest(unittest.TestCase):
         gen3 = lambda x, y: max(-1, min(1, 2 * (x - 1.5)))
         self.testgrid3 = createGrid((4, 4), [gen3])
         self.checkfunc3 = lambda point: [
-            (point[0] - 0.5) ** 2 - 1.25
-            if point[0] < 1.5
-            else 1.25 - (point[0] - 2.5) ** 2
+            (
+                (point[0] - 0.5) ** 2 - 1.25
+                if point[0] < 1.5
+                else 1.25 - (point[0] - 2.5) ** 2
+            )
         ]
         self.testpoints3 = [
             [0.5, 1.0],
@@ -258,5 +310,116 @@ class BicubicInterpolationTest(unittest.TestCase):
             )
 
 
+class PointArrayInterpolationTest(unittest.TestCase):
+    # Single point interpolation methods should match the vectorised methods
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.grids = [
+            createGrid((5, 6), data=rng.normal(size=(5, 6, nparam)))
+            for nparam in (1, 3)
+        ]
+        self.testpoints = rng.uniform([-0.2, -0.2], [4.2, 5.2], size=(50, 2)).tolist()
+        self.testpoints.extend([[0.0, 0.0], [4.0, 5.0], [2.0, 3.0]])
+
+    def _checkMethod(self, method, arrayMethod, grid):
+        testxy = convertTestPoints(self.testpoints)
+        expected = arrayMethod(grid, np.array(testxy))
+        for xy, point, check in zip(testxy, self.testpoints, expected):
+            result = method(grid, xy)
+            np.testing.assert_allclose(
+                result, check, rtol=0.0, atol=1.0e-12, err_msg=f"At {point}"
+            )
+
+    def test_PointMatchesArray(self):
+        for grid in self.grids:
+            for method, arrayMethod in (
+                (GridInterpolator.bilinear, GridInterpolator.bilinearArray),
+                (GridInterpolator.biquadratic, GridInterpolator.biquadraticArray),
+                (GridInterpolator.bicubic, GridInterpolator.bicubicArray),
+            ):
+                with self.subTest(method=method.__name__, nparam=grid._nparam):
+                    self._checkMethod(method, arrayMethod, grid)
+
+    def test_MaskedData(self):
+        grid = self.grids[1]
+        data = np.ma.masked_array(grid.data())
+        data[1, 1, 0] = np.ma.masked
+        grid.setData(data)
+        xy = convertTestPoints([[1.5, 1.5]])[0]
+        result = GridInterpolator.bilinear(grid, xy)
+        check = GridInterpolator.bilinearArray(grid, np.array([xy]))[0]
+        np.testing.assert_array_equal(result, check)
+
+    def test_PackedData(self):
+        # Interpolating packed data should match interpolating the unpacked values
+        scale = np.array([0.001, 0.002, 0.0005])
+        offset = np.array([0.5, -1.0, 0.0])
+        grid = self.grids[1]
+        packed = np.round((grid.data() - offset) / scale).astype(np.int16)
+        grid.setData(packed * scale + offset)
+        packedgrid = createGrid((5, 6), data=grid.data())
+        packedgrid.setData(packed, scale, offset)
+        self.assertTrue(packedgrid.isPacked())
+        self.assertEqual(packedgrid.storedData().dtype, np.int16)
+        np.testing.assert_array_equal(packedgrid.data(), grid.data())
+        testxy = convertTestPoints(self.testpoints)
+        for method, arrayMethod in (
+            (GridInterpolator.bilinear, GridInterpolator.bilinearArray),
+            (GridInterpolator.biquadratic, GridInterpolator.biquadraticArray),
+            (GridInterpolator.bicubic, GridInterpolator.bicubicArray),
+        ):
+            with self.subTest(method=method.__name__):
+                expected = arrayMethod(grid, np.array(testxy))
+                np.testing.assert_allclose(
+                    arrayMethod(packedgrid, np.array(testxy)),
+                    expected,
+                    rtol=0.0,
+                    atol=1.0e-12,
+                )
+                for xy, check in zip(testxy, expected):
+                    np.testing.assert_allclose(
+                        method(packedgrid, xy), check, rtol=0.0, atol=1.0e-12
+                    )
+
+    def test_PointDataTypes(self):
+        # Data which is not native float64 is interpolated from a converted copy
+        grid = self.grids[1]
+        testxy = convertTestPoints(self.testpoints)
+        for dtype in (np.float32, np.dtype(">f8"), np.float16):
+            with self.subTest(dtype=dtype):
+                data = grid.data().astype(dtype)
+                typedgrid = createGrid((5, 6), data=data)
+                expected = GridInterpolator.bicubicArray(typedgrid, np.array(testxy))
+                for xy, check in zip(testxy, expected):
+                    np.testing.assert_allclose(
+                        GridInterpolator.bicubic(typedgrid, xy),
+                        check,
+                        rtol=0.0,
+                        atol=1.0e-6,
+                    )
+
+    def test_PointMatchesBaseline(self):
+        # Single point interpolation reproduces the numpy implementation it
+        # replaced exactly, including rotated grids and float32 data
+        rng = np.random.default_rng(3)
+        rotated = [172.0, 0.3, 0.1, 41.5, -0.05, 0.4]
+        grids = self.grids + [
+            createGrid((5, 6), data=rng.normal(size=(5, 6, 2)), affine=rotated),
+            createGrid((5, 6), data=rng.normal(size=(5, 6, 1)).astype(np.float32)),
+        ]
+        for grid in grids:
+            affine = rotated if grid is grids[2] else defaultAffine
+            testxy = convertTestPoints(self.testpoints, affine)
+            for method in ("bilinear", "biquadratic", "bicubic"):
+                with self.subTest(method=method, nparam=grid._nparam):
+                    for xy, point in zip(testxy, self.testpoints):
+                        result = getattr(GridInterpolator, method)(grid, xy)
+                        self.assertIsInstance(result, list)
+                        self.assertTrue(
+                            np.array_equal(result, baselineValue(method, grid, xy)),
+                            msg=f"At {point}",
+                        )
+
+
 if __name__ == "__main__":
     unittest.main()
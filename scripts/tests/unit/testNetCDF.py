@@ -0,0 +1,258 @@
+import os
+import sys
+import tempfile
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel, dummyGridModel
+
+from GGXF import NetCDF
+from GGXF.Constants import *
+
+
+class NetCdfReadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.ggxf = dummyDeformationModel()
+        cls.ggxf_file = os.path.join(cls.tempdir.name, "deformation.ggxf")
+        NetCDF.Writer.Write(
+            cls.ggxf,
+            cls.ggxf_file,
+            options={NetCDF.NETCDF_OPTION_GRID_DTYPE: "float64"},
+        )
+        rng = np.random.default_rng(1)
+        lat = rng.uniform(-46.0, -38.0, 200)
+        lon = rng.uniform(165.0, 175.0, 200)
+        cls.xy = np.vstack((lat, lon)).T
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def _checkValues(self, ggxf):
+        for epoch in (2005.0, 2015.0):
+            values, _ = ggxf.valuesAt(self.xy, epoch)
+            expected, _ = self.ggxf.valuesAt(self.xy, epoch)
+            np.testing.assert_allclose(values, expected, rtol=0.0, atol=1.0e-12)
+
+    def test_Read(self):
+        ggxf = NetCDF.Reader.Read(self.ggxf_file)
+        self.assertIsNotNone(ggxf)
+        self._checkValues(ggxf)
+
+    def test_LazyLoad(self):
+        ggxf = NetCDF.Reader.Read(
+            self.ggxf_file, options={NetCDF.NETCDF_OPTION_LAZY_LOAD: "true"}
+        )
+        self.assertIsNotNone(ggxf)
+        grids = list(ggxf.allgrids())
+        self.assertTrue(all(grid._data is None for grid in grids))
+        self._checkValues(ggxf)
+        for grid, expected in zip(grids, self.ggxf.allgrids()):
+            np.testing.assert_array_equal(grid.data(), expected.data())
+
+    def test_LazyLoadCacheLimit(self):
+        ggxf = NetCDF.Reader.Read(
+            self.ggxf_file,
+            options={
+                NetCDF.NETCDF_OPTION_LAZY_LOAD: "true",
+                NetCDF.NETCDF_OPTION_GRID_CACHE_MB: "0.001",
+            },
+        )
+        grids = list(ggxf.allgrids())
+        cache = grids[0]._dataCache
+        for grid in grids:
+            grid.data()
+            self.assertLessEqual(cache.nbytes(), max(1024, grid.data().nbytes))
+        self._checkValues(ggxf)
+
+    def test_PackedGrids(self):
+        ggxf_file = os.path.join(self.tempdir.name, "packed.ggxf")
+        NetCDF.Writer.Write(
+            self.ggxf,
+            ggxf_file,
+            options={NetCDF.NETCDF_OPTION_PACK_PRECISION: "5"},
+        )
+        unpacked = NetCDF.Reader.Read(ggxf_file)
+        for lazy in ("false", "true"):
+            with self.subTest(lazy=lazy):
+                ggxf = NetCDF.Reader.Read(
+                    ggxf_file,
+                    options={
+                        NetCDF.NETCDF_OPTION_PACKED_GRIDS: "true",
+                        NetCDF.NETCDF_OPTION_LAZY_LOAD: lazy,
+                    },
+                )
+                self.assertIsNotNone(ggxf)
+                for grid, expected, original in zip(
+                    ggxf.allgrids(), unpacked.allgrids(), self.ggxf.allgrids()
+                ):
+                    self.assertTrue(grid.isPacked())
+                    self.assertTrue(np.issubdtype(grid.storedData().dtype, np.integer))
+                    self.assertLess(
+                        grid.storedData().nbytes, expected.storedData().nbytes
+                    )
+                    np.testing.assert_allclose(
+                        grid.data(), expected.data(), rtol=0.0, atol=1.0e-12
+                    )
+                    # Within the packing precision of the original data
+                    np.testing.assert_allclose(
+                        grid.data(), original.data(), rtol=0.0, atol=1.0e-5
+                    )
+                for epoch in (2005.0, 2015.0):
+                    values, _ = ggxf.valuesAt(self.xy, epoch)
+                    expected, _ = unpacked.valuesAt(self.xy, epoch)
+                    np.testing.assert_allclose(values, expected, rtol=0.0, atol=1.0e-12)
+
+    def test_BoundingBox(self):
+        rng = np.random.default_rng(2)
+        for bbox, ngroups in (
+            ((-41.83, 171.21, -41.32, 171.74), 2),
+            ((-42.6, 170.7, -40.2, 173.1), 2),
+            ((-44.5, 166.5, -43.5, 168.0), 1),
+        ):
+            for lazy in ("false", "true"):
+                with self.subTest(bbox=bbox, lazy=lazy):
+                    ggxf = NetCDF.Reader.Read(
+                        self.ggxf_file,
+                        options={
+                            NetCDF.NETCDF_OPTION_BOUNDING_BOX: ",".join(
+                                str(v) for v in bbox
+                            ),
+                            NetCDF.NETCDF_OPTION_LAZY_LOAD: lazy,
+                        },
+                    )
+                    self.assertIsNotNone(ggxf)
+                    self.assertEqual(len(list(ggxf.groups())), ngroups)
+                    full = {g.name(): g for g in self.ggxf.allgrids()}
+                    for grid in ggxf.allgrids():
+                        original = full[grid.name()]
+                        self.assertLessEqual(grid.data().size, original.data().size)
+                        (xmin, ymin), (xmax, ymax) = grid.extents()
+                        self.assertLessEqual(xmin, max(bbox[0], original._xmin))
+                        self.assertLessEqual(ymin, max(bbox[1], original._ymin))
+                        self.assertGreaterEqual(xmax, min(bbox[2], original._xmax))
+                        self.assertGreaterEqual(ymax, min(bbox[3], original._ymax))
+                    x = rng.uniform(bbox[0], bbox[2], 100)
+                    y = rng.uniform(bbox[1], bbox[3], 100)
+                    xy = np.vstack((x, y)).T
+                    for epoch in (2005.0, 2015.0):
+                        values, valid = ggxf.valuesAt(xy, epoch)
+                        expected, expvalid = self.ggxf.valuesAt(xy, epoch)
+                        np.testing.assert_array_equal(valid, expvalid)
+                        np.testing.assert_allclose(
+                            values, expected, rtol=0.0, atol=1.0e-12
+                        )
+
+    def test_BoundingBoxInterpolation(self):
+        # Nodes around the bounding box used by the interpolation stencil are read
+        bbox = (-44.0, 169.0, -43.0, 170.0)
+        rng = np.random.default_rng(3)
+        x = rng.uniform(bbox[0], bbox[2], 200)
+        y = rng.uniform(bbox[1], bbox[3], 200)
+        xy = np.vstack((np.append(x, bbox[::2]), np.append(y, bbox[1::2]))).T
+        for method in (
+            INTERPOLATION_METHOD_BIQUADRATIC,
+            INTERPOLATION_METHOD_BICUBIC,
+        ):
+            original = dummyGridModel(41, 41, method)
+            ggxf_file = os.path.join(self.tempdir.name, f"{method}.ggxf")
+            NetCDF.Writer.Write(
+                original,
+                ggxf_file,
+                options={NetCDF.NETCDF_OPTION_GRID_DTYPE: "float64"},
+            )
+            full = NetCDF.Reader.Read(ggxf_file)
+            expected, _ = full.valuesAt(xy, 2010.0)
+            for lazy in ("false", "true"):
+                with self.subTest(method=method, lazy=lazy):
+                    ggxf = NetCDF.Reader.Read(
+                        ggxf_file,
+                        options={
+                            NetCDF.NETCDF_OPTION_BOUNDING_BOX: ",".join(
+                                str(v) for v in bbox
+                            ),
+                            NetCDF.NETCDF_OPTION_LAZY_LOAD: lazy,
+                        },
+                    )
+                    self.assertIsNotNone(ggxf)
+                    grid = next(ggxf.allgrids())
+                    self.assertLess(
+                        grid.data().size, next(original.allgrids()).data().size
+                    )
+                    values, valid = ggxf.valuesAt(xy, 2010.0)
+                    self.assertTrue(np.all(valid))
+                    np.testing.assert_allclose(values, expected, rtol=0.0, atol=1.0e-12)
+
+    def test_InvalidBoundingBox(self):
+        for bbox in ("-41,171,-42", "-41,171,-42,172", "a,b,c,d"):
+            with self.subTest(bbox=bbox):
+                ggxf = NetCDF.Reader.Read(
+                    self.ggxf_file, options={NetCDF.NETCDF_OPTION_BOUNDING_BOX: bbox}
+                )
+                self.assertIsNone(ggxf)
+
+    def test_WriteStorageOptions(self):
+        import netCDF4
+
+        for options, chunked in (
+            ({}, False),
+            ({NetCDF.NETCDF_OPTION_CHUNK_SIZE: "contiguous"}, False),
+            ({NetCDF.NETCDF_OPTION_COMPRESSION: "zlib"}, True),
+            (
+                {
+                    NetCDF.NETCDF_OPTION_COMPRESSION: "zlib",
+                    NetCDF.NETCDF_OPTION_CHUNK_SIZE: "4,4",
+                    NetCDF.NETCDF_OPTION_COMPRESSION_LEVEL: "9",
+                },
+                True,
+            ),
+        ):
+            with self.subTest(options=options):
+                ggxf_file = os.path.join(self.tempdir.name, "storage.ggxf")
+                options[NetCDF.NETCDF_OPTION_GRID_DTYPE] = "float64"
+                NetCDF.Writer.Write(self.ggxf, ggxf_file, options=options)
+                with netCDF4.Dataset(ggxf_file, "r") as root:
+                    group = next(iter(root.groups.values()))
+                    grid = next(iter(group.groups.values()))
+                    variable = next(iter(grid.variables.values()))
+                    chunking = variable.chunking()
+                    filters = variable.filters()
+                if chunked:
+                    self.assertNotEqual(chunking, "contiguous")
+                    self.assertTrue(filters["zlib"])
+                    if "4,4" in options.values():
+                        self.assertEqual(chunking[:2], [4, 4])
+                else:
+                    self.assertEqual(chunking, "contiguous")
+                ggxf = NetCDF.Reader.Read(ggxf_file)
+                self.assertIsNotNone(ggxf)
+                for grid, expected in zip(ggxf.allgrids(), self.ggxf.allgrids()):
+                    np.testing.assert_array_equal(grid.data(), expected.data())
+
+    def test_InvalidStorageOptions(self):
+        ggxf_file = os.path.join(self.tempdir.name, "invalid.ggxf")
+        for options in (
+            {NetCDF.NETCDF_OPTION_CHUNK_SIZE: "4"},
+            {NetCDF.NETCDF_OPTION_COMPRESSION: "lzma"},
+            {NetCDF.NETCDF_OPTION_COMPRESSION_LEVEL: "10"},
+            {NetCDF.NETCDF_OPTION_SIGNIFICANT_DIGITS: "0"},
+            {
+                NetCDF.NETCDF_OPTION_COMPRESSION: "zlib",
+                NetCDF.NETCDF_OPTION_CHUNK_SIZE: "contiguous",
+            },
+        ):
+            with self.subTest(options=options):
+                with self.assertRaises(NetCDF.NetCdfWriterError):
+                    NetCDF.Writer.Write(self.ggxf, ggxf_file, options=options)
+
+
+if __name__ == "__main__":
+    unittest.main()
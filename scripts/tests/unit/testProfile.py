@@ -0,0 +1,80 @@
+import os
+import sys
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel
+from testBatchEvaluation import testPoints
+
+
+class ProfileStatsTest(unittest.TestCase):
+    def test_Disabled(self):
+        ggxf = dummyDeformationModel()
+        ggxf.valueAt([-42.0, 170.0], 2015.0)
+        self.assertIsNone(ggxf.stats())
+        for group in ggxf.groups():
+            self.assertIsNone(group.stats())
+
+    def test_PointStats(self):
+        ggxf = dummyDeformationModel()
+        ggxf.setProfile()
+        xy = testPoints(200)
+        for point in xy:
+            ggxf.valueAt(point, 2015.0)
+        stats = ggxf.stats()
+        self.assertEqual(stats["points"], 200)
+        for group in ggxf.groups():
+            # Groups are only evaluated at points within their extents
+            gstats = stats["groups"][group.name()]
+            inside = [point for point in xy if group.contains(point)]
+            missing = sum(1 for point in inside if group.gridAt(point) is None)
+            self.assertEqual(gstats["points"], len(inside))
+            self.assertEqual(gstats["searchMisses"], missing)
+            gridpoints = sum(g["points"] for g in gstats["grids"].values())
+            self.assertEqual(gridpoints, len(inside) - missing)
+            self.assertEqual(gstats["timeFactorCacheMisses"], 1)
+            self.assertGreater(gstats["timeFactorCacheHits"], 0)
+        self.assertGreater(stats["time"]["evaluate"], 0.0)
+        self.assertGreater(stats["time"]["interpolate"], 0.0)
+        self.assertEqual(
+            stats["bytesLoaded"], sum(grid.data().nbytes for grid in ggxf.allgrids())
+        )
+
+    def test_ArrayStats(self):
+        ggxf = dummyDeformationModel()
+        ggxf.setProfile()
+        xy = testPoints(200)
+        ggxf.valuesAt(xy, 2015.0)
+        ggxf.valuesAt(xy, 2005.0)
+        stats = ggxf.stats()
+        self.assertEqual(stats["points"], 400)
+        # The event group has a zero time factor at 2005 so is only evaluated once
+        inside = {
+            group.name(): int(np.count_nonzero(group.containsPoints(xy)))
+            for group in ggxf.groups()
+        }
+        self.assertEqual(stats["groups"]["velocity"]["points"], inside["velocity"] * 2)
+        self.assertEqual(stats["groups"]["event"]["points"], inside["event"])
+        for group in ggxf.groups():
+            gstats = stats["groups"][group.name()]
+            gridpoints = sum(g["points"] for g in gstats["grids"].values())
+            self.assertEqual(gstats["points"] - gstats["searchMisses"], gridpoints)
+
+    def test_Reset(self):
+        ggxf = dummyDeformationModel()
+        ggxf.setProfile()
+        ggxf.valuesAt(testPoints(10), 2015.0)
+        ggxf.setProfile()
+        self.assertEqual(ggxf.stats()["points"], 0)
+        ggxf.setProfile(False)
+        self.assertIsNone(ggxf.stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import argparse
+import unittest
+
+import numpy as np
+from DummyGGXF import dummyDeformationModel
+
+from GGXF import Binary, NetCDF
+from GGXF.Constants import INTERPOLATION_METHOD_BICUBIC
+from GGXF.__main__ import addLoggingArguments, addSubsetParser
+
+
+class SubsetTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.ggxf = dummyDeformationModel()
+        cls.ggxf_file = os.path.join(cls.tempdir.name, "deformation.ggxf")
+        NetCDF.Writer.Write(
+            cls.ggxf,
+            cls.ggxf_file,
+            options={NetCDF.NETCDF_OPTION_GRID_DTYPE: "float64"},
+        )
+        cls.output_file = os.path.join(cls.tempdir.name, "subset.ggxf")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def _subset(self, *arguments, input_file=None):
+        parser = argparse.ArgumentParser()
+        subparsers = parser.add_subparsers(dest="command")
+        addLoggingArguments(addSubsetParser(subparsers))
+        args = parser.parse_args(
+            ["subset", input_file or self.ggxf_file, self.output_file, *arguments]
+        )
+        args.function(args)
+        return NetCDF.Reader.Read(self.output_file)
+
+    def _groupNames(self, ggxf):
+        return [group.name() for group in ggxf.groups()]
+
+    def test_BoundingBox(self):
+        bbox = (-44.2, 167.3, -42.1, 170.6)
+        subset = self._subset(
+            "--bounding-box=" + ",".join(str(v) for v in bbox),
+            "-n",
+            "grid_dtype=float64",
+        )
+        self.assertEqual(self._groupNames(subset), ["velocity", "event"])
+        grids = {grid.name(): grid for grid in self.ggxf.allgrids()}
+        for grid in subset.allgrids():
+            self.assertLess(grid.data().size, grids[grid.name()].data().size)
+        rng = np.random.default_rng(1)
+        x = rng.uniform(bbox[0], bbox[2], 100)
+        y = rng.uniform(bbox[1], bbox[3], 100)
+        xy = np.vstack((x, y)).T
+        for epoch in (2005.0, 2015.0):
+            values, valid = subset.valuesAt(xy, epoch)
+            expected, expvalid = self.ggxf.valuesAt(xy, epoch)
+            np.testing.assert_array_equal(valid, expvalid)
+            np.testing.assert_allclose(values, expected, rtol=0.0, atol=1.0e-12)
+
+    def test_BoundingBoxBicubic(self):
+        # Values inside the bounding box are unchanged for a bicubic model
+        ggxf = dummyDeformationModel(INTERPOLATION_METHOD_BICUBIC)
+        ggxf_file = os.path.join(self.tempdir.name, "bicubic.ggxf")
+        NetCDF.Writer.Write(
+            ggxf, ggxf_file, options={NetCDF.NETCDF_OPTION_GRID_DTYPE: "float64"}
+        )
+        bbox = (-42.5, 170.5, -41.0, 172.0)
+        subset = self._subset(
+            "--bounding-box=" + ",".join(str(v) for v in bbox),
+            "-n",
+            "grid_dtype=float64",
+            input_file=ggxf_file,
+        )
+        rng = np.random.default_rng(2)
+        x = rng.uniform(bbox[0], bbox[2], 200)
+        y = rng.uniform(bbox[1], bbox[3], 200)
+        xy = np.vstack((np.append(x, bbox[::2]), np.append(y, bbox[1::2]))).T
+        for epoch in (2005.0, 2015.0):
+            values, valid = subset.valuesAt(xy, epoch)
+            expected, expvalid = ggxf.valuesAt(xy, epoch)
+            np.testing.assert_array_equal(valid, expvalid)
+            np.testing.assert_allclose(values, expected, rtol=0.0, atol=1.0e-12)
+
+    def test_Groups(self):
+        subset = self._subset("-G", "event")
+        self.assertEqual(self._groupNames(subset), ["event"])
+        with self.assertRaises(RuntimeError):
+            self._subset("-G", "event", "-G", "missing")
+
+    def test_TimeWindow(self):
+        subset = self._subset("-s", "2000.0", "-e", "2009.5")
+        self.assertEqual(self._groupNames(subset), ["velocity"])
+        subset = self._subset("-s", "2000.0", "-e", "2012.0")
+        self.assertEqual(self._groupNames(subset), ["velocity", "event"])
+        with self.assertRaises(RuntimeError):
+            self._subset("-s", "2000.0")
+
+    def test_BoundingBoxInput(self):
+        binary_file = os.path.join(self.tempdir.name, "deformation.ggxb")
+        Binary.Writer.Write(self.ggxf, binary_file)
+        subset = self._subset("-G", "velocity", input_file=binary_file)
+        self.assertEqual(self._groupNames(subset), ["velocity"])
+        with self.assertRaises(RuntimeError):
+            self._subset("--bounding-box=-44,167,-42,170", input_file=binary_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,34 @@ sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
 
 import unittest
 
-from GGXF.TimeFunction import BaseTimeFunction, DateToEpoch
+import numpy as np
+
+from GGXF.TimeFunction import BaseTimeFunction, CompoundTimeFunction, DateToEpoch
+
+arrayTestFunctions = (
+    {"functionType": "linear", "functionReferenceEpoch": 2003.0},
+    {
+        "functionType": "linear",
+        "functionReferenceEpoch": 2003.0,
+        "startEpoch": 2001.5,
+        "endEpoch": 2005.5,
+        "scaleFactor": 0.5,
+    },
+    {"functionType": "quadratic", "functionReferenceEpoch": 2003.0},
+    {"functionType": "step", "eventEpoch": 2010.3},
+    {"functionType": "exponential", "eventEpoch": 2010.3, "timeConstant": 0.7},
+    {
+        "functionType": "exponential",
+        "eventEpoch": 2010.3,
+        "timeConstant": 0.7,
+        "functionReferenceEpoch": 2012.0,
+    },
+    {"functionType": "logBaseE", "eventEpoch": 2010.3, "timeConstant": 0.7},
+    {"functionType": "logBase10", "eventEpoch": 2010.3, "timeConstant": 0.7},
+    {"functionType": "ramp", "startEpoch": 2004.2, "endEpoch": 2006.8},
+    {"functionType": "cyclic", "functionReferenceEpoch": 2000.0, "frequency": 2.0},
+    {"functionType": "hyperbolicTangent", "eventEpoch": 2011.0, "timeConstant": 0.3},
+)
 
 
 class TimeTest(unittest.TestCase):
@@ -20,6 +47,19 @@ class TimeTest(unittest.TestCase):
                 expected,
                 msg=f"test {name} epoch {epoch} expected {expected} got {testval}",
             )
+        epochs = np.array([epoch for epoch, expected in tests])
+        testvals = function.valuesAt(epochs)
+        np.testing.assert_allclose(
+            testvals, [expected for epoch, expected in tests], err_msg=f"test {name}"
+        )
+
+    def _arrayEpochs(self):
+        rng = np.random.default_rng(1)
+        epochs = rng.uniform(1995.0, 2025.0, 2000)
+        # Include the epochs at which functions change behaviour
+        return np.concatenate(
+            (epochs, [2001.5, 2003.0, 2004.2, 2005.5, 2006.8, 2010.3, 2011.0])
+        )
 
     def test_DateToEpoch(self):
         self.assertAlmostEqual(
@@ -80,6 +120,148 @@ class TimeTest(unittest.TestCase):
             ((2003.0, 0.0), (2013.0, 2.5), (1999.5, -1.5)),
         )
 
+    def test_ArrayEvaluation(self):
+        epochs = self._arrayEpochs()
+        for metadata in arrayTestFunctions:
+            with self.subTest(function=metadata):
+                function = BaseTimeFunction.Create(metadata)
+                expected = [function.valueAt(epoch) for epoch in epochs.tolist()]
+                np.testing.assert_array_equal(function.valuesAt(epochs), expected)
+
+    def test_CompoundArrayEvaluation(self):
+        epochs = self._arrayEpochs()
+        function = CompoundTimeFunction()
+        for metadata in arrayTestFunctions:
+            function.addFunction(BaseTimeFunction.Create(metadata))
+        expected = [function._evaluate(epoch) for epoch in epochs.tolist()]
+        np.testing.assert_array_equal(function.valuesAt(epochs), expected)
+        refepochs = epochs[::-1]
+        expected = [
+            function._evaluate(epoch) - function._evaluate(refepoch)
+            for epoch, refepoch in zip(epochs.tolist(), refepochs.tolist())
+        ]
+        np.testing.assert_array_equal(
+            function.valuesChange(epochs, refepochs), expected
+        )
+
+    def test_CompoundArrayLimits(self):
+        function = CompoundTimeFunction(minEpoch=2000.0, maxEpoch=2020.0)
+        function.addFunction(BaseTimeFunction.Create(arrayTestFunctions[0]))
+        values = function.valuesAt([1999.0, 2010.0, 2021.0])
+        np.testing.assert_array_equal(values, [np.nan, 7.0, np.nan])
+        values = function.valuesChange([2010.0, 2010.0], [2005.0, 1999.0])
+        np.testing.assert_array_equal(values, [5.0, np.nan])
+
+    def test_CompoundCache(self):
+        function = CompoundTimeFunction(cacheSize=2)
+        for metadata in arrayTestFunctions:
+            function.addFunction(BaseTimeFunction.Create(metadata))
+        expected = {epoch: function._evaluate(epoch) for epoch in (2005.0, 2012.0)}
+        self.assertEqual(function.valueAt(2005.0), expected[2005.0])
+        self.assertEqual(function.valueAt(2005.0), expected[2005.0])
+        self.assertEqual(
+            function.valueChange(2012.0, 2005.0), expected[2012.0] - expected[2005.0]
+        )
+        self.assertEqual(function.cacheStats(), {"hits": 2, "misses": 2, "size": 2})
+        # 2010.0 replaces 2012.0 as the least recently used epoch
+        function.valueAt(2005.0)
+        function.valueAt(2010.0)
+        function.valueAt(2005.0)
+        function.valueAt(2012.0)
+        self.assertEqual(function.cacheStats(), {"hits": 4, "misses": 4, "size": 2})
+
+    def test_CompoundCacheDisabled(self):
+        function = CompoundTimeFunction(cacheSize=0)
+        function.addFunction(BaseTimeFunction.Create(arrayTestFunctions[0]))
+        self.assertEqual(function.valueChange(2010.0, 2005.0), 5.0)
+        self.assertEqual(function.valueChange(2010.0, 2005.0), 5.0)
+        self.assertEqual(function.cacheStats(), {"hits": 0, "misses": 4, "size": 0})
+
+    def test_IsZeroBetween(self):
+        for metadata, window, expected in (
+            ({"functionType": "step", "eventEpoch": 2010.3}, (2000.0, 2010.0), True),
+            ({"functionType": "step", "eventEpoch": 2010.3}, (2000.0, 2010.5), False),
+            (
+                {"functionType": "ramp", "startEpoch": 2004.2, "endEpoch": 2006.8},
+                (2001.0, 2004.2),
+                True,
+            ),
+            (
+                {"functionType": "linear", "functionReferenceEpoch": 2003.0},
+                (2003.0, 2003.0),
+                True,
+            ),
+            (
+                {"functionType": "linear", "functionReferenceEpoch": 2003.0},
+                (2000.0, 2010.0),
+                False,
+            ),
+            (
+                {"functionType": "cyclic", "functionReferenceEpoch": 2000.0},
+                (2000.0, 2016.0),
+                False,
+            ),
+            (
+                {"functionType": "cyclic", "functionReferenceEpoch": 2000.0},
+                (2000.0, 2000.0),
+                True,
+            ),
+            (
+                {
+                    "functionType": "exponential",
+                    "eventEpoch": 2010.3,
+                    "timeConstant": 0.7,
+                },
+                (2000.0, 2010.3),
+                True,
+            ),
+            (
+                {
+                    "functionType": "exponential",
+                    "eventEpoch": 2010.3,
+                    "timeConstant": 0.7,
+                },
+                (2000.0, 2010.4),
+                False,
+            ),
+            (
+                {
+                    "functionType": "linear",
+                    "functionReferenceEpoch": 2003.0,
+                    "startEpoch": 2003.0,
+                    "endEpoch": 2005.0,
+                },
+                (1990.0, 2003.0),
+                True,
+            ),
+            (
+                {
+                    "functionType": "linear",
+                    "functionReferenceEpoch": 2003.0,
+                    "scaleFactor": 0.0,
+                },
+                (1990.0, 2010.0),
+                True,
+            ),
+        ):
+            with self.subTest(function=metadata, window=window):
+                function = CompoundTimeFunction()
+                if metadata["functionType"] == "cyclic":
+                    metadata = dict(metadata, frequency=1.0)
+                function.addFunction(BaseTimeFunction.Create(metadata))
+                self.assertEqual(function.isZeroBetween(*window), expected)
+        function = CompoundTimeFunction(minEpoch=2005.0)
+        function.addFunction(BaseTimeFunction.Create(arrayTestFunctions[3]))
+        self.assertTrue(function.isZeroBetween(1990.0, 2010.0))
+        self.assertFalse(function.isZeroBetween(1990.0, 2011.0))
+        # Functions which cancel each other are not identified as zero
+        function = CompoundTimeFunction()
+        for scale in (1.0, -1.0):
+            function.addFunction(
+                BaseTimeFunction.Create(dict(arrayTestFunctions[0], scaleFactor=scale))
+            )
+        self.assertFalse(function.isZeroBetween(2000.0, 2010.0))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,338 @@
+import os
+import sys
+import tempfile
+
+testdir = os.path.dirname(__file__)
+srcdir = "../.."
+sys.path.insert(0, testdir)
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import csv
+import glob
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+import yaml
+from DummyGGXF import dummyDeformationModel, dummyGrid, dummyGridModel
+
+from GGXF import YAML
+from GGXF.GridLoader import ggxf_csv
+from GGXF.Constants import GRID_ATTR_AFFINE_COEFFS
+
+
+def expectedCsvGrid(grid, indices, coords):
+    # CSV grid file written one node at a time using csv.writer
+    csvh = io.StringIO(newline="")
+    csvw = csv.writer(csvh)
+    header = ["i", "j"] if indices else []
+    if coords:
+        header.extend(grid.group().ggxf().nodeCoordinateParameters())
+    csvw.writerow(header + grid.group().parameterNames())
+    data = grid.data()
+    for inode in range(data.shape[0]):
+        for jnode in range(data.shape[1]):
+            row = [str(inode), str(jnode)] if indices else []
+            if coords:
+                row.extend(f"{c:.12g}" for c in grid.calcxy([inode, jnode]))
+            row.extend(f"{p:.12g}" for p in data[inode, jnode])
+            csvw.writerow(row)
+    return csvh.getvalue()
+
+
+class YamlWriterTest(unittest.TestCase):
+    def _checkCsvGrids(self, ggxf):
+        for indices in (False, True):
+            for coords in (False, True):
+                with self.subTest(indices=indices, coords=coords):
+                    with tempfile.TemporaryDirectory() as tempdir:
+                        yaml_file = os.path.join(tempdir, "test.yaml")
+                        YAML.Writer.Write(
+                            ggxf,
+                            yaml_file,
+                            options={
+                                YAML.YAML_OPTION_WRITE_CSV_NODE_INDICES: str(indices),
+                                YAML.YAML_OPTION_WRITE_CSV_COORDS: str(coords),
+                            },
+                        )
+                        csvfiles = sorted(glob.glob(os.path.join(tempdir, "*.csv")))
+                        grids = list(ggxf.allgrids())
+                        self.assertEqual(len(csvfiles), len(grids))
+                        expected = sorted(
+                            expectedCsvGrid(grid, indices, coords) for grid in grids
+                        )
+                        written = []
+                        for csvfile in csvfiles:
+                            with open(csvfile, newline="") as csvh:
+                                written.append(csvh.read())
+                        self.assertEqual(sorted(written), expected)
+
+    def test_CsvGrid(self):
+        self._checkCsvGrids(dummyDeformationModel())
+
+    def test_CsvGridBlocks(self):
+        blocknodes = YAML.CSV_WRITE_BLOCK_NODES
+        YAML.CSV_WRITE_BLOCK_NODES = 50
+        try:
+            self._checkCsvGrids(dummyGridModel(23, 31))
+        finally:
+            YAML.CSV_WRITE_BLOCK_NODES = blocknodes
+
+    def test_CsvRotatedGrid(self):
+        ggxf = dummyGridModel(5, 5)
+        group = next(ggxf.groups())
+        group._grids = [
+            dummyGrid(group, "rotated", [-45.3, 0.31, -0.07, 168.2, 0.05, 0.29], 9, 7)
+        ]
+        ggxf.configure()
+        self._checkCsvGrids(ggxf)
+
+    def _checkInlineGrids(self, ggxf):
+        with tempfile.TemporaryDirectory() as tempdir:
+            yaml_file = os.path.join(tempdir, "test.yaml")
+            YAML.Writer.Write(
+                ggxf, yaml_file, options={YAML.YAML_OPTION_WRITE_CSV_GRIDS: "false"}
+            )
+            self.assertEqual(glob.glob(os.path.join(tempdir, "*.csv")), [])
+            written = YAML.Reader.Read(yaml_file, options={"grid_dtype": "float64"})
+        self.assertEqual(
+            [group.name() for group in written.groups()],
+            [group.name() for group in ggxf.groups()],
+        )
+        grids = list(ggxf.allgrids())
+        wgrids = list(written.allgrids())
+        self.assertEqual([g.name() for g in wgrids], [g.name() for g in grids])
+        for grid, wgrid in zip(grids, wgrids):
+            self.assertEqual(
+                wgrid.metadata()[GRID_ATTR_AFFINE_COEFFS],
+                list(grid.metadata()[GRID_ATTR_AFFINE_COEFFS]),
+            )
+            np.testing.assert_array_equal(wgrid.data(), grid.data())
+
+    def test_InlineGrid(self):
+        self._checkInlineGrids(dummyDeformationModel())
+
+    def test_InlineGridBlocks(self):
+        ggxf = dummyGridModel(23, 31)
+        data = next(ggxf.allgrids()).data()
+        data[0, 0, 0] = 1.0e-5
+        data[1, 2, 1] = -3.0e20
+        data[2, 3, 2] = np.inf
+        blocknodes = YAML.YAML_DATA_BLOCK_NODES
+        YAML.YAML_DATA_BLOCK_NODES = 50
+        try:
+            self._checkInlineGrids(ggxf)
+        finally:
+            YAML.YAML_DATA_BLOCK_NODES = blocknodes
+
+    def test_InlineGridLayout(self):
+        # Inline grid data is laid out exactly as yaml.safe_dump writes an array
+        rng = np.random.default_rng(2)
+        data = rng.normal(size=(13, 11, 3)) * 10.0 ** rng.integers(-8, 8, (13, 11, 3))
+        data[1, 2, 1] = np.nan
+        data[2, 3, 2] = -np.inf
+        data[4, 4, 0] = 1.0e-5
+        yaml.SafeDumper.add_representer(np.ndarray, YAML.Util.dumpNdArray)
+        writer = YAML.Writer()
+        for values in (data, data[:, :, :1], np.round(data[:, :, :2], 2)):
+            ydata = values[:, :, 0] if values.shape[2] == 1 else values
+            for indent in (0, 2):
+                with self.subTest(shape=values.shape, indent=indent):
+                    if indent == 0:
+                        expected = yaml.safe_dump({"data": ydata})
+                    else:
+                        expected = yaml.safe_dump([{"data": ydata}], indent=2)
+                        expected = "  " + expected[2:]
+                    output = io.StringIO()
+                    writer._writeGridData(output, values, indent)
+                    self.assertEqual(output.getvalue(), expected)
+
+
+class YamlReaderTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.ggxf = dummyGridModel(7, 5)
+        data = next(cls.ggxf.allgrids()).data()
+        data[0, 0, 0] = 1.0e-5
+        data[1, 2, 1] = np.nan
+        data[2, 3, 2] = -np.inf
+        yaml_file = os.path.join(cls.tempdir.name, "grid.yaml")
+        YAML.Writer.Write(
+            cls.ggxf, yaml_file, options={YAML.YAML_OPTION_WRITE_CSV_GRIDS: "false"}
+        )
+        with open(yaml_file) as yamlh:
+            cls.yaml_text = yamlh.read()
+        # The same data written as a block sequence of rows
+        header = cls.yaml_text[: cls.yaml_text.index("    data: [")]
+        rows = [
+            yaml.safe_dump(row, default_flow_style=True, width=1000)
+            for row in data.tolist()
+        ]
+        cls.block_text = (
+            header + "    data:\n" + "".join(f"    - {row}" for row in rows)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def _read(self, text, options=None):
+        yaml_file = os.path.join(self.tempdir.name, "test.yaml")
+        with open(yaml_file, "w") as yamlh:
+            yamlh.write(text)
+        options = dict(options or {})
+        options[YAML.YAML_OPTION_GRID_DTYPE] = "float64"
+        return YAML.Reader.Read(yaml_file, options=options)
+
+    def _checkData(self, text):
+        expected = next(self.ggxf.allgrids()).data()
+        for lazy in ("false", "true"):
+            with self.subTest(lazy=lazy):
+                ggxf = self._read(text, {YAML.YAML_OPTION_LAZY_LOAD: lazy})
+                self.assertIsNotNone(ggxf)
+                grid = next(ggxf.allgrids())
+                self.assertEqual(grid._dataLoader is not None, lazy == "true")
+                np.testing.assert_array_equal(grid.data(), expected)
+
+    def test_BlockSequenceData(self):
+        self._checkData(self.block_text)
+
+    def test_FlowSequenceData(self):
+        self._checkData(self.yaml_text)
+
+    def test_YamlParsedData(self):
+        # Comments are not handled by the JSON parser, so the data are parsed as YAML
+        text = self.block_text.replace("    - [[", "    # Row\n    - [[")
+        self.assertNotEqual(text, self.block_text)
+        self._checkData(text)
+
+    def test_ExtractInlineGridData(self):
+        text, griddata = YAML.ExtractInlineGridData(self.yaml_text)
+        self.assertEqual(len(griddata), 1)
+        self.assertIn(f"data: {YAML.YAML_GRID_DATA_TAG} 0\n", text)
+        self.assertNotIn("[[", text)
+        unbalanced = "  data: [[1.0, 2.0]\n"
+        self.assertEqual(YAML.ExtractInlineGridData(unbalanced), (unbalanced, []))
+
+    def test_DataInBlockScalar(self):
+        abstract = "abstract: Deformation model for testing\n"
+        text = self.yaml_text.replace(
+            abstract, "abstract: |-\n  Example\n  data: [1.0, 2.0]\n"
+        )
+        self.assertNotEqual(text, self.yaml_text)
+        ydata = YAML.LoadYamlText(text)
+        self.assertEqual(ydata["abstract"], "Example\ndata: [1.0, 2.0]")
+        ygrid = ydata["ggxfGroups"][0]["grids"][0]
+        self.assertIsInstance(ygrid["data"], YAML.InlineGridData)
+        self._checkData(text)
+
+    def test_DataInOtherMapping(self):
+        extent = "contentApplicabilityExtent:\n"
+        text = self.yaml_text.replace(extent, extent + "  data: [1.0, 2.0]\n")
+        self.assertNotEqual(text, self.yaml_text)
+        ydata = YAML.LoadYamlText(text)
+        self.assertEqual(ydata["contentApplicabilityExtent"]["data"], [1.0, 2.0])
+        ygrid = ydata["ggxfGroups"][0]["grids"][0]
+        self.assertIsInstance(ygrid["data"], YAML.InlineGridData)
+
+    def test_JsonAgreesWithYaml(self):
+        for text in (
+            "[1e3, 2.0]",
+            "[1.0e3, 2.0]",
+            "[1.0e+3, .nan, -.inf, -0]",
+            "[NaN, 1.0]",
+            "[-.nan, 1.0]",
+            "[012, 0x1f, 1_000]",
+            "- [1, 2]\n- [3, 4.5]\n",
+        ):
+            with self.subTest(text=text):
+                expected = np.array(yaml.safe_load(text))
+                data = YAML.InlineGridData(text).array()
+                self.assertEqual(data.dtype, expected.dtype)
+                np.testing.assert_array_equal(data, expected)
+
+    def test_InvalidData(self):
+        text = self.block_text.replace("    - [[", "    - [[1.0, 2.0, 3.0], [", 1)
+        self.assertIsNone(self._read(text))
+        ggxf = self._read(text, {YAML.YAML_OPTION_LAZY_LOAD: "true"})
+        with self.assertRaises(Exception):
+            next(ggxf.allgrids()).data()
+
+    def test_LoadDataSources(self):
+        ggxf = dummyDeformationModel()
+        with tempfile.TemporaryDirectory() as tempdir:
+            yaml_file = os.path.join(tempdir, "deformation.yaml")
+            YAML.Writer.Write(ggxf, yaml_file)
+            cwd = os.getcwd()
+            for threads in ("1", "4"):
+                with self.subTest(threads=threads):
+                    options = {
+                        YAML.YAML_OPTION_GRID_DIRECTORY: tempdir,
+                        YAML.YAML_OPTION_LOAD_THREADS: threads,
+                        YAML.YAML_OPTION_GRID_DTYPE: "float64",
+                    }
+                    loaded = YAML.Reader.Read(yaml_file, options=options)
+                    self.assertEqual(os.getcwd(), cwd)
+                    self.assertIsNotNone(loaded)
+                    grids = list(ggxf.allgrids())
+                    lgrids = list(loaded.allgrids())
+                    self.assertEqual(
+                        [g.name() for g in lgrids], [g.name() for g in grids]
+                    )
+                    for grid, lgrid in zip(grids, lgrids):
+                        np.testing.assert_allclose(
+                            lgrid.data(), grid.data(), rtol=1.0e-11, atol=1.0e-11
+                        )
+            csvfile = sorted(glob.glob(os.path.join(tempdir, "*.csv")))[-1]
+            os.remove(csvfile)
+            reader = YAML.Reader(
+                {
+                    YAML.YAML_OPTION_GRID_DIRECTORY: tempdir,
+                    YAML.YAML_OPTION_LOAD_THREADS: "4",
+                }
+            )
+            self.assertIsNone(reader.read(yaml_file))
+            self.assertEqual(len(reader._errors), 1)
+            self.assertIn(os.path.basename(csvfile), reader._errors[0])
+
+    def test_SourceDataCache(self):
+        ggxf = dummyDeformationModel()
+        with tempfile.TemporaryDirectory() as tempdir:
+            yaml_file = os.path.join(tempdir, "deformation.yaml")
+            YAML.Writer.Write(ggxf, yaml_file)
+            cachedir = os.path.join(tempdir, "cache")
+            options = {
+                YAML.YAML_OPTION_GRID_DIRECTORY: tempdir,
+                YAML.YAML_OPTION_SOURCE_CACHE_DIRECTORY: cachedir,
+                YAML.YAML_OPTION_GRID_DTYPE: "float64",
+            }
+            expected = YAML.Reader.Read(yaml_file, options=options)
+            self.assertIsNotNone(expected)
+            ngrids = len(list(ggxf.allgrids()))
+            self.assertEqual(len(glob.glob(os.path.join(cachedir, "*.npz"))), ngrids)
+
+            def assertSameGrids(loaded):
+                self.assertIsNotNone(loaded)
+                for grid, lgrid in zip(expected.allgrids(), loaded.allgrids()):
+                    self.assertEqual(lgrid.metadata(), grid.metadata())
+                    np.testing.assert_array_equal(lgrid.data(), grid.data())
+
+            with mock.patch.object(
+                ggxf_csv, "LoadGrid", side_effect=AssertionError("Not cached")
+            ):
+                assertSameGrids(YAML.Reader.Read(yaml_file, options=options))
+
+            csvfile = sorted(glob.glob(os.path.join(tempdir, "*.csv")))[0]
+            stat = os.stat(csvfile)
+            os.utime(csvfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            with mock.patch.object(
+                ggxf_csv, "LoadGrid", wraps=ggxf_csv.LoadGrid
+            ) as loadgrid:
+                assertSameGrids(YAML.Reader.Read(yaml_file, options=options))
+                self.assertEqual(loadgrid.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()